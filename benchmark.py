@@ -0,0 +1,354 @@
+"""Benchmarks for the Gnip client library.
+
+Run all benchmarks, or the ones named on the command line:
+
+    % python benchmark.py [--sizes 1000,10000,100000] [--payload-size 1024]
+                          [--json results.json] [name ...]
+
+The import and construct benchmarks measure start up costs, and
+activity_memory the bytes held by each parsed Activity. The others
+parse or serialize synthetic data sets of each size, made by
+gnip.synthetic.ActivityGenerator, and report operations and megabytes per
+second and peak memory. Each of them runs in a fresh interpreter, so the
+memory of one does not affect the next. Save results with --json to
+compare runs across commits.
+
+"""
+
+import os
+import sys
+import gc
+import time
+import json
+import platform
+import types
+import subprocess
+from optparse import OptionParser
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SCRIPT = "import time; started = time.time(); import gnip; print time.time() - started"
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+DEFAULT_PAYLOAD_SIZE = 1024
+
+def format_result(key, value):
+    if isinstance(value, float):
+        return "%s=%.2f" % (key, value)
+    return "%s=%s" % (key, value)
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def max_rss_mb():
+    """Return the peak resident memory of this process in megabytes."""
+
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / (1024.0 * 1024.0)
+    return rss / 1024.0
+
+def bench_import(runs=20):
+    """Time "import gnip" in fresh interpreters.
+
+    @return dictionary with the fastest and median import times in
+        milliseconds, and the number of modules loaded
+    """
+
+    # Make sure compiled modules are up to date before timing
+    subprocess.check_call([sys.executable, "-c", "import gnip"], cwd=BASEDIR)
+
+    times = []
+    for i in range(runs):
+        output = subprocess.Popen([sys.executable, "-c", IMPORT_SCRIPT], cwd=BASEDIR,
+            stdout=subprocess.PIPE).communicate()[0]
+        times.append(float(output) * 1000)
+    modules = subprocess.Popen([sys.executable, "-c", "import sys, gnip; print len(sys.modules)"],
+        cwd=BASEDIR, stdout=subprocess.PIPE).communicate()[0]
+    return {'min_ms': min(times), 'median_ms': median(times), 'modules': int(modules)}
+
+def deep_size(obj, seen=None):
+    """Return the bytes used by an object and everything it refers to.
+
+    Objects referred to more than once, such as interned strings and
+    shared empty tuples, are counted once.
+    """
+
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_size(item, seen)
+    elif not isinstance(obj, basestring):
+        if hasattr(obj, "__dict__"):
+            size += deep_size(obj.__dict__, seen)
+        for cls in type(obj).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if hasattr(obj, name):
+                    size += deep_size(getattr(obj, name), seen)
+    return size
+
+def bench_activity_memory(count=10000, payload_size=DEFAULT_PAYLOAD_SIZE):
+    """Measure the memory held by parsed Activities.
+
+    @return dictionary with the mean bytes per activity, with and without
+        a payload
+    """
+
+    sys.path.insert(0, BASEDIR)
+    from gnip import synthetic, activities
+
+    result = {}
+    for name, size in [("bytes_per_activity", 0), ("bytes_per_activity_with_payload", payload_size)]:
+        xml = synthetic.ActivityGenerator(payload_size=size).activities(count).to_xml()
+        parsed = list(activities.Activities().iter_from_xml(xml))
+        result[name] = deep_size(parsed) / float(count)
+    return result
+
+def bench_construct(runs=1000):
+    """Time constructing Gnip objects, which reuse the process wide Config.
+
+    @return dictionary with the mean construction time in microseconds
+    """
+
+    sys.path.insert(0, BASEDIR)
+    from gnip import Gnip
+
+    Gnip("user", "password")
+    started = time.time()
+    for i in range(runs):
+        Gnip("user", "password")
+    return {'mean_us': (time.time() - started) / runs * 1e6}
+
+# Each data benchmark has a setup function, which builds its input from a
+# generator and a size, and an operation run on that input. Operations
+# return the number of bytes processed.
+
+def setup_activities(generator, size):
+    return generator.activities(size)
+
+def setup_activities_xml(generator, size):
+    return generator.activities(size).to_xml()
+
+def setup_filter(generator, size):
+    from gnip import filter, xml_objects
+    return filter.Filter("benchmark", rules=[xml_objects.Rule("actor", "user%d" % i) for i in xrange(size)])
+
+def setup_filter_xml(generator, size):
+    return setup_filter(generator, size).to_xml()
+
+def setup_raw(generator, size):
+    import random
+    rand = random.Random(generator.seed)
+    return [generator.text(rand, generator.payload_size) for i in xrange(size)]
+
+def setup_payloads(generator, size):
+    # Payloads as parsed from XML, whose raws have not been decoded yet
+    from gnip import payload
+    payloads = []
+    for raw in setup_raw(generator, size):
+        a_payload = payload.Payload()
+        a_payload.from_xml_node(payload.Payload(raw=raw).to_xml_node())
+        payloads.append(a_payload)
+    return payloads
+
+def setup_new_payloads(generator, size):
+    from gnip import payload
+    return [payload.Payload(raw=raw) for raw in setup_raw(generator, size)]
+
+def run_activities_from_xml(xml):
+    from gnip import activities
+    activities.Activities().from_xml(xml)
+    return len(xml)
+
+def run_activities_iter_from_xml(xml):
+    from gnip import activities
+    for an_activity in activities.Activities().iter_from_xml(xml):
+        pass
+    return len(xml)
+
+def run_activities_select(xml, lazy=False):
+    # A selective consumer, which only reads the id and time of each activity
+    from gnip import activities
+    for an_activity in activities.Activities(lazy=lazy).iter_from_xml(xml):
+        an_activity.activity_id, an_activity.at
+    return len(xml)
+
+def run_lazy_activities_select(xml):
+    return run_activities_select(xml, lazy=True)
+
+def run_activities_to_xml(an_activities):
+    return len(an_activities.to_xml())
+
+def run_activity_to_xml(an_activities):
+    size = 0
+    for an_activity in an_activities.items:
+        size += len(an_activity.to_xml())
+    return size
+
+def run_filter_to_xml(a_filter):
+    return len(a_filter.to_xml())
+
+def run_filter_from_xml(xml):
+    from gnip import filter
+    filter.Filter().from_xml(xml)
+    return len(xml)
+
+def run_payload_write_raw(raws):
+    from gnip import payload
+    a_payload = payload.Payload()
+    size = 0
+    for raw in raws:
+        a_payload.write_raw(raw)
+        a_payload.get_encoded_raw()
+        size += len(raw)
+    return size
+
+def run_payloads_encode(payloads):
+    from gnip import payload
+    payload.encode_payloads(payloads)
+    return sum([len(a_payload.read_raw()) for a_payload in payloads])
+
+def run_payloads_decode(payloads):
+    from gnip import payload
+    payload.decode_payloads(payloads)
+    return sum([len(a_payload.read_raw()) for a_payload in payloads])
+
+def run_payload_read_raw(payloads):
+    size = 0
+    for a_payload in payloads:
+        size += len(a_payload.read_raw())
+    return size
+
+DATA_BENCHMARKS = [
+    ("activities_from_xml", setup_activities_xml, run_activities_from_xml),
+    ("activities_iter_from_xml", setup_activities_xml, run_activities_iter_from_xml),
+    ("activities_select", setup_activities_xml, run_activities_select),
+    ("lazy_activities_select", setup_activities_xml, run_lazy_activities_select),
+    ("activities_to_xml", setup_activities, run_activities_to_xml),
+    ("activity_to_xml", setup_activities, run_activity_to_xml),
+    ("filter_to_xml", setup_filter, run_filter_to_xml),
+    ("filter_from_xml", setup_filter_xml, run_filter_from_xml),
+    ("payload_write_raw", setup_raw, run_payload_write_raw),
+    ("payload_read_raw", setup_payloads, run_payload_read_raw),
+    ("payloads_encode", setup_new_payloads, run_payloads_encode),
+    ("payloads_decode", setup_payloads, run_payloads_decode),
+]
+
+def run_case(name, size, payload_size):
+    """Run one data benchmark in this process.
+
+    @return dictionary of the measurements
+    """
+
+    sys.path.insert(0, BASEDIR)
+    from gnip import synthetic
+
+    setup, operation = [(s, o) for n, s, o in DATA_BENCHMARKS if n == name][0]
+    generator = synthetic.ActivityGenerator(seed=size, payload_size=payload_size)
+    data = setup(generator, size)
+    gc.collect()
+    rss_before = max_rss_mb()
+
+    started = time.time()
+    processed = operation(data)
+    elapsed = max(time.time() - started, 1e-9)
+
+    rss_after = max_rss_mb()
+    return {
+        'name': name,
+        'size': size,
+        'seconds': elapsed,
+        'ops_per_sec': size / elapsed,
+        'mb_per_sec': processed / elapsed / (1024 * 1024),
+        'bytes': processed,
+        'peak_rss_mb': rss_after,
+        'peak_delta_mb': max(rss_after - rss_before, 0.0),
+    }
+
+def bench_data(name, sizes, payload_size):
+    """Run a data benchmark at each size, each in a fresh interpreter.
+
+    @return list of dictionaries of measurements
+    """
+
+    results = []
+    for size in sizes:
+        output = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--run-case",
+            "%s,%d,%d" % (name, size, payload_size)], cwd=BASEDIR, stdout=subprocess.PIPE).communicate()[0]
+        results.append(json.loads(output))
+    return results
+
+def get_commit():
+    try:
+        return subprocess.Popen(["git", "rev-parse", "HEAD"], cwd=BASEDIR, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE).communicate()[0].strip() or None
+    except OSError:
+        return None
+
+BENCHMARKS = [
+    ("import", bench_import),
+    ("construct", bench_construct),
+    ("activity_memory", bench_activity_memory),
+]
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options] [benchmark ...]")
+    parser.add_option("--sizes", default=",".join([str(s) for s in DEFAULT_SIZES]),
+        help="comma separated numbers of activities, rules or payloads")
+    parser.add_option("--payload-size", type="int", default=DEFAULT_PAYLOAD_SIZE,
+        help="bytes of raw data in each payload")
+    parser.add_option("--json", help="file to save the results to")
+    parser.add_option("--run-case", help=None)
+    options, names = parser.parse_args(argv)
+
+    if options.run_case:
+        name, size, payload_size = options.run_case.split(",")
+        print json.dumps(run_case(name, int(size), int(payload_size)))
+        return
+
+    sizes = [int(size) for size in options.sizes.split(",")]
+    report = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'payload_size': options.payload_size,
+        'results': [],
+    }
+
+    for name, benchmark in BENCHMARKS:
+        if names and name not in names:
+            continue
+        result = benchmark()
+        print name + ": " + ", ".join([format_result(key, value) for key, value in sorted(result.items())])
+        result['name'] = name
+        report['results'].append(result)
+
+    for name, setup, operation in DATA_BENCHMARKS:
+        if names and name not in names:
+            continue
+        for result in bench_data(name, sizes, options.payload_size):
+            print "%-26s %7d  %12.1f ops/s  %8.2f MB/s  peak %7.1f MB (+%.1f)" % (name, result['size'],
+                result['ops_per_sec'], result['mb_per_sec'], result['peak_rss_mb'], result['peak_delta_mb'])
+            report['results'].append(result)
+
+    if options.json:
+        output = open(options.json, "w")
+        try:
+            json.dump(report, output, indent=2, sort_keys=True)
+        finally:
+            output.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
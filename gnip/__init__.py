@@ -2,27 +2,41 @@ import activities
 import activity
 import filter
 import publisher
+import clock
+import compression
+import imports
+import xml_writer
 import datetime
-import iso8601
 import time
-import gzip
-import StringIO
-import logging
-import httplib2
+import threading
+import collections
+import base64
 from elementtree.ElementTree import *
-from pyjavaproperties import Properties
+from config import Config, get_config
 from xml_objects import *
 from response import *
 
+def _load_request_modules():
+    # connection and retry load httplib, socket and ssl, and logging is
+    # nearly as slow, together taking longer than the rest of import gnip.
+    # So the first Gnip created imports them, and binds them here for the
+    # methods that use them
+    global connection, retry, logging
+    connection = imports.load(__name__ + ".connection")
+    retry = imports.load(__name__ + ".retry")
+    logging = imports.load("logging")
+
 class Gnip:
     """Provides the primary interface to the Gnip service.
     
     Provides an authenticated connection between your code, and the Gnip servers.
-    Gnip's primary functionality is provided through this class.
+    Gnip's primary functionality is provided through this class. An
+    instance may be shared between threads; its requests are made over a
+    pool of persistent connections.
 
     """
 
-    def __init__(self, username, password, gnip_server=None):
+    def __init__(self, username, password, gnip_server=None, config=None, dedup=None, **overrides):
         """Initialize the class.
 
         @type username string
@@ -31,34 +45,124 @@ class Gnip:
         @param password Your Gnip account password
         @type gnip_server string
         @param gnip_server The Gnip server to connect to
+        @type config Config
+        @param config The settings to use, by default those read once per
+            process from gnip.properties and GNIP_* environment variables
+        @type dedup DedupStore
+        @param dedup The store the bucket getters remove duplicate activities
+            with, which can be shared with other Gnip instances or Followers;
+            by default one is created if gnip.dedup.enabled is set
+        @param overrides Individual settings, named without the "gnip."
+            prefix and with underscores for dots, e.g. pool_max_size=20
 
         Initializes a Gnip class by setting up authentication
         information, used to log into the Gnip service.
 
         """
 
-        index = int(__file__.rfind("/"))
-        basedir = __file__[0:index]
-        p = Properties()
-        p.load(open(basedir + '/gnip.properties'))
-        
+        if config is None:
+            config = get_config()
+        if overrides:
+            config = config.override(**overrides)
+        self.config = config
+        _load_request_modules()
+
         # Determine base Gnip URL
         if (gnip_server is None):
-            self.base_url = p['gnip.server']
+            self.base_url = config['gnip.server']
         else:
             self.base_url = gnip_server
-        
-        self.tunnel_over_post = bool(p['gnip.tunnel.over.post=false'])
+
+        self.tunnel_over_post = config.get_bool('gnip.tunnel.over.post')
+
+        # Server clock offset, measured once and reused until it expires
+        self.clock = clock.ClockOffset(ttl=config.get_float('gnip.clock.ttl', clock.DEFAULT_TTL),
+            drift_tolerance=config.get_float('gnip.clock.drift.tolerance', clock.DEFAULT_DRIFT_TOLERANCE))
+
+        # Number of buckets fetched concurrently by the *_range methods
+        self.bucket_workers = config.get_int('gnip.bucket.workers', 8)
 
         # Configure authentication
-        self.client = httplib2.Http(timeout = int(p['gnip.http.timeout']))
-        self.client.add_credentials(username, password)
+        self.username = username
+        self.authorization = "Basic " + base64.b64encode(username + ":" + password)
+
+        # Persistent connections, shared by every thread using this instance
+        self.pool = connection.ConnectionPool(max_size=config.get_int('gnip.pool.max.size', 10),
+            idle_timeout=config.get_float('gnip.pool.idle.timeout', 60),
+            timeout=config.get_int('gnip.http.timeout'))
+
+        # Optional local cache of closed buckets
+        if config['gnip.cache.dir']:
+            cache = imports.load(__name__ + ".cache")
+            self.cache = cache.BucketCache(config['gnip.cache.dir'],
+                max_bytes=config.get_int('gnip.cache.max.bytes', 512 * 1024 * 1024),
+                closed_after=config.get_float('gnip.cache.closed.after', 120))
+        else:
+            self.cache = None
+
+        # Request body compression
+        self.compressor = compression.Compressor(level=config.get_int('gnip.gzip.level', 9),
+            min_size=config.get_int('gnip.gzip.min.size', 0),
+            adaptive=config.get_bool('gnip.gzip.adaptive'),
+            sample_min_size=config.get_int('gnip.gzip.sample.min.size', compression.DEFAULT_SAMPLE_MIN_SIZE))
+
+        # Retries of failed requests, and a circuit breaker per endpoint
+        self.retry_policy = retry.RetryPolicy(max_retries=config.get_int('gnip.retry.max', 3),
+            backoff=config.get_float('gnip.retry.backoff', 0.5),
+            max_backoff=config.get_float('gnip.retry.max.backoff', 30),
+            max_retry_after=config.get_float('gnip.retry.max.after', 120),
+            retry_posts=config.get_bool('gnip.retry.posts'),
+            failure_threshold=config.get_int('gnip.breaker.threshold', 5),
+            reset_timeout=config.get_float('gnip.breaker.reset', 30),
+            server_clock=self.clock)
+
+        # Requests made by sync_filter_rules
+        self.sync_chunk_size = config.get_int('gnip.sync.chunk.size', 1000)
+        self.sync_workers = config.get_int('gnip.sync.workers', 8)
+
+        # Optional removal of activities already returned by any bucket getter;
+        # a store created here is loaded from gnip.dedup.path if set and saved
+        # there by close(), one passed in is left to its owner
+        self.__owns_dedup = dedup is None and config.get_bool('gnip.dedup.enabled')
+        if self.__owns_dedup:
+            self.dedup = self.__create_dedup_store(config)
+        else:
+            self.dedup = dedup
 
+        # Whether bucket getters return LazyActivity objects
+        self.lazy_activities = config.get_bool('gnip.activities.lazy')
+
+        # Per request measurements, created when the first sink is added
+        self.instrumentation = None
+        self.__instrumentation_lock = threading.Lock()
+
+        # Decoding of gzip compressed responses
+        self.decompressor = compression.Decompressor()
+
+        # Headers sent with every request, see __build_headers for the per verb ones
         self.headers = {}
-        self.headers['Accept'] = 'gzip, application/xml'
+        self.headers['Accept'] = 'application/xml'
         self.headers['User-Agent'] = 'Gnip-Client-Python/2.1.0'
-        self.headers['Content-Encoding'] = 'gzip'
-        self.headers['Content-Type'] = 'application/xml'
+
+    def close(self):
+        """Release this instance's resources.
+
+        Closes the pooled connections and, if duplicate removal is enabled
+        with a gnip.dedup.path, saves the DedupStore created for it to that
+        file so that the next instance loads it. Call this before exiting; the instance
+        should not be used afterwards.
+
+        """
+
+        self.pool.close()
+        if self.__owns_dedup and self.dedup.path:
+            self.dedup.save()
+
+    def __create_dedup_store(self, config):
+        dedup = imports.load(__name__ + ".dedup")
+        return dedup.DedupStore(window=config.get_int('gnip.dedup.window', dedup.DEFAULT_WINDOW),
+            bloom_bits=config.get_int('gnip.dedup.bloom.bits', dedup.DEFAULT_BLOOM_BITS),
+            path=config['gnip.dedup.path'] or None)
 
     def sync_clock(self, theTime):
         """Adjust a time so that it corresponds with Gnip time
@@ -67,30 +171,121 @@ class Gnip:
         @param datetime The datetime object to adjust
         @return datetime object representing the corrected time
 
-        This method gets the current time from the Gnip server,
-        gets the current local time and determines the difference 
-        between the two. It then adjusts the passed in time to 
-        account for the difference. This method can be used to ensure
-        your application's time is in sync with Gnip server time in
-        order to prevent clock drift between the two.
+        This method adjusts the passed in time by the difference between
+        the Gnip server clock and the local clock. The difference is measured
+        with a HEAD request the first time it is needed, correcting for the
+        round trip time, and is then reused until it is older than
+        gnip.clock.ttl seconds or a response Date header shows that the
+        clocks have drifted. This method can be used to ensure your
+        application's time is in sync with Gnip server time in order to
+        prevent clock drift between the two.
 
         """
 
-        # Do HTTP HEAD request
-        resp, content = self.__do_http_head()
+        offset = self.clock.get_offset(self.__fetch_server_date)
+        return theTime + datetime.timedelta(seconds=offset)
+
+    def get_clock_stats(self):
+        """Return metrics about the cached server clock offset.
+
+        @return dictionary with the current offset and its age in seconds,
+            the number of measurements, of measurements that got no usable
+            Date header, and of drift triggered re-measurements
+
+        """
 
-        # Get local time, before we do any other processing
-        # so that we can get the two times as close as possible
-        local_time = datetime.datetime.utcnow()
+        return self.clock.get_stats()
+
+    def get_pool_stats(self):
+        """Return statistics for the connection pool.
+
+        @return dictionary with the number of connections in use and idle,
+            and the total number created, reused and discarded
+
+        """
 
-        # Get time from headers and parse into python format
-        gnip_time = datetime.datetime.strptime(resp["date"], "%a, %d %b %Y %H:%M:%S %Z")
+        return self.pool.get_stats()
 
-        # Determine the time difference
-        time_delta = gnip_time - local_time
+    def get_cache_stats(self):
+        """Return statistics for the closed bucket cache.
 
-        # Return the corrected time
-        return theTime + time_delta
+        @return dictionary with hit, miss, bypass and eviction counts, the
+            hit rate and the size of the cache, or None if there is no cache
+
+        """
+
+        if self.cache is None:
+            return None
+        return self.cache.get_stats()
+
+    def get_compression_stats(self):
+        """Return statistics for request body compression.
+
+        @return dictionary with the number of bodies compressed and skipped,
+            bytes before and after compression and the measured upload bandwidth
+
+        """
+
+        return self.compressor.get_stats()
+
+    def get_decompression_stats(self):
+        """Return statistics for response decompression.
+
+        @return dictionary with the number of compressed and plain
+            responses, bytes received and decoded, and the bytes saved
+
+        """
+
+        return self.decompressor.get_stats()
+
+    def get_dedup_stats(self):
+        """Return metrics about activities removed as duplicates.
+
+        @return dictionary of DedupStore counters, or None if duplicates
+            are not being removed
+
+        See Also: dedup.DedupStore.get_stats()
+        """
+
+        if self.dedup is None:
+            return None
+        return self.dedup.get_stats()
+
+    def get_retry_stats(self):
+        """Return statistics for request retries and circuit breakers.
+
+        @return dictionary with the number of retries, requests that failed
+            after their last retry and requests rejected by an open breaker,
+            and the state of the breaker for each endpoint
+
+        """
+
+        return self.retry_policy.get_stats()
+
+    def add_instrumentation_sink(self, sink):
+        """Register a sink to receive a RequestEvent for every request, and
+        a ParseEvent for every response parsed.
+
+        @type sink object
+        @param sink An object with a record(event) method, such as an
+            instrumentation.HistogramSink or instrumentation.StatsdSink
+
+        """
+
+        self.__instrumentation_lock.acquire()
+        try:
+            if self.instrumentation is None:
+                instrumentation = imports.load(__name__ + ".instrumentation")
+                self.instrumentation = instrumentation.Instrumentation()
+            self.instrumentation.add_sink(sink)
+        finally:
+            self.__instrumentation_lock.release()
+
+    def remove_instrumentation_sink(self, sink):
+        """Stop passing events to a sink."""
+
+        if self.instrumentation is not None:
+            self.instrumentation.remove_sink(sink)
 
     def time_to_string(self, time):
         """Convert the time to a Gnip bucket formatted string.
@@ -139,7 +334,7 @@ class Gnip:
         Creates a new filter, specific to your account, on the Gnip service.
         """
         url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters.xml"
-        return self.__parse_response(self.__do_http_post(url_path, filter.to_xml()))
+        return self.__parse_response(self.__do_http_post(url_path, xml_writer.iter_filter_xml(filter)))
 
     def add_rule_to_filter(self, publisher_scope, publisher_name, filter_name, rule):
         """Add a rule to a pre-existing Gnip filter.
@@ -173,11 +368,7 @@ class Gnip:
         """
 
         url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + filter_name + "/rules.xml"
-        rules_xml = "<rules>"
-        for rule in rules:
-            rules_xml+=rule.to_xml()
-        rules_xml+="</rules>"
-        return self.__parse_response(self.__do_http_post(url_path, rules_xml))
+        return self.__parse_response(self.__do_http_post(url_path, xml_writer.iter_rules_xml(rules)))
 
     def remove_rule_from_filter(self, publisher_scope, publisher_name, filter_name, rule):
         """Remove a rule from a Gnip filter.
@@ -221,6 +412,33 @@ class Gnip:
         else:
             return None
 
+    def sync_filter_rules(self, publisher_scope, publisher_name, filter_name, rules, dry_run=False):
+        """Make a Gnip filter's rules match a list of rules.
+
+        @type publisher_scope string
+        @param publisher_scope The scope of the publisher ("my," "public" or "gnip")
+        @type publisher_name string
+        @param publisher_name The publisher of the filter to update
+        @type filter_name string
+        @param filter_name The filter to update
+        @type rules List of Rule objects
+        @param rules The rules the filter should have
+        @type dry_run boolean
+        @param dry_run Only work out the changes, don't make them
+        @return Response containing a SyncSummary of the changes
+
+        Fetches the filter once and compares its rules to the ones given,
+        rather than checking each rule with rule_exists_in_filter. Missing
+        rules are added gnip.sync.chunk.size at a time, and extra rules are
+        removed with gnip.sync.workers requests in flight.
+
+        See Also: rule_sync.sync_filter_rules()
+        """
+
+        rule_sync = imports.load(__name__ + ".rule_sync")
+        return rule_sync.sync_filter_rules(self, publisher_scope, publisher_name, filter_name, rules,
+            dry_run=dry_run, chunk_size=self.sync_chunk_size, max_workers=self.sync_workers)
+
     def delete_filter(self, publisher_scope, publisher_name, name):
         """Delete a Gnip filter.
 
@@ -251,7 +469,7 @@ class Gnip:
         url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + name + ".xml"
         return self.__parse_response(self.__do_http_get(url_path), filter.Filter())
 
-    def get_publisher_activities(self, publisher_scope, publisher_name, date_time=None):
+    def get_publisher_activities(self, publisher_scope, publisher_name, date_time=None, stream=False, dedup=None):
         """Get a Publisher's Activities (as opposed to Notifications).
 
         @type publisher_scope string
@@ -260,6 +478,12 @@ class Gnip:
         @param publisher_name The publisher you want Activities for.
         @type date_time datetime
         @param date_time The datetime for which data should be retrieved
+        @type stream boolean
+        @param stream Return the Activities as an iterator that parses them
+            one at a time as it is consumed
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
         @return List of Activity objects, one for each activity retrieved
 
         Gets all of the Activities for a specific publisher. You can specify a time
@@ -268,18 +492,10 @@ class Gnip:
         
         See Also: get_publisher_notifications()
         """
-        if None == date_time:
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/activity/current.xml"
-        else:
-            corrected_time = self.sync_clock(date_time)
-            time_string = self.time_to_string(corrected_time)
-
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + \
-                "/activity/" + time_string + ".xml"
-
-        return self.__parse_response(self.__do_http_get(url_path), activities.Activities())
+        url_path = self.__bucket_url_path(publisher_scope, publisher_name, None, "activity", date_time)
+        return self.__parse_activities_response(self.__do_http_get(url_path, decode=not stream), stream, dedup)
 
-    def get_filter_activities(self, publisher_scope, publisher_name, name, date_time=None):
+    def get_filter_activities(self, publisher_scope, publisher_name, name, date_time=None, stream=False, dedup=None):
         """Get Activites (as opposed to Notifications) from a Filter.
 
         @type publisher_scope string
@@ -290,6 +506,12 @@ class Gnip:
         @param publisher_name The publisher associated with the filter.
         @type date_time datetime
         @param date_time The time for which data should be retrieved
+        @type stream boolean
+        @param stream Return the Activities as an iterator that parses them
+            one at a time as it is consumed
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
         @return string containing response from the server
 
         Gets all of the Activities for a specific Filter. You can specify a time
@@ -298,18 +520,10 @@ class Gnip:
 
         See Also: get_filter_notifications()
         """
-        if None == date_time:
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + name + "/activity/current.xml"
-        else:
-            corrected_time = self.sync_clock(date_time)
-            time_string = self.time_to_string(corrected_time)
-
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + name + "/activity/" + \
-                time_string + ".xml"
+        url_path = self.__bucket_url_path(publisher_scope, publisher_name, name, "activity", date_time)
+        return self.__parse_activities_response(self.__do_http_get(url_path, decode=not stream), stream, dedup)
 
-        return self.__parse_response(self.__do_http_get(url_path), activities.Activities())
-
-    def get_publisher_notifications(self, publisher_scope, publisher_name, date_time=None):
+    def get_publisher_notifications(self, publisher_scope, publisher_name, date_time=None, stream=False, dedup=None):
         """Get a Publisher's Notifications (as opposed to Activities).
 
         @type publisher_scope string
@@ -318,6 +532,12 @@ class Gnip:
         @param publisher_name The publisher you want Notifications for.
         @type date_time datetime
         @param date_time The datetime for which data should be retrieved
+        @type stream boolean
+        @param stream Return the Activities as an iterator that parses them
+            one at a time as it is consumed
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
         @return List of Activity objects, one for each activity retrieved
 
         Gets all of the Notifications for a specific publisher. You can specify a time
@@ -330,17 +550,10 @@ class Gnip:
         
         See Also: get_publisher_activities()
         """
-        if None == date_time:
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/notification/current.xml"
-        else:
-            corrected_time = self.sync_clock(date_time)
-            time_string = self.time_to_string(corrected_time)
+        url_path = self.__bucket_url_path(publisher_scope, publisher_name, None, "notification", date_time)
+        return self.__parse_activities_response(self.__do_http_get(url_path, decode=not stream), stream, dedup)
 
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/notification/" + time_string + ".xml"
-
-        return self.__parse_response(self.__do_http_get(url_path), activities.Activities())
-
-    def get_filter_notifications(self, publisher_scope, publisher_name, name, date_time=None):
+    def get_filter_notifications(self, publisher_scope, publisher_name, name, date_time=None, stream=False, dedup=None):
         """Get Notifications (as opposed to Activities) from a Filter.
 
         @type publisher_scope string
@@ -351,6 +564,12 @@ class Gnip:
         @param publisher_name The publisher associated with the filter.
         @type date_time datetime
         @param date_time The time for which data should be retrieved
+        @type stream boolean
+        @param stream Return the Activities as an iterator that parses them
+            one at a time as it is consumed
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
         @return string containing response from the server
 
         Gets all of the Notifications for a specific Filter. You can specify a time
@@ -363,15 +582,206 @@ class Gnip:
 
         See Also: get_filter_activities()
         """
-        if None == date_time:
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + name + "/notification/current.xml"
-        else:
-            corrected_time = self.sync_clock(date_time)
-            time_string = self.time_to_string(corrected_time)
+        url_path = self.__bucket_url_path(publisher_scope, publisher_name, name, "notification", date_time)
+        return self.__parse_activities_response(self.__do_http_get(url_path, decode=not stream), stream, dedup)
 
-            url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + name + "/notification/" + time_string + ".xml"
+    def get_publisher_activities_range(self, publisher_scope, publisher_name, start, end, max_workers=None, fail_fast=False, dedup=None):
+        """Get a Publisher's Activities for every bucket in a time range.
 
-        return self.__parse_response(self.__do_http_get(url_path), activities.Activities())
+        @type publisher_scope string
+        @param publisher_scope The scope of the publisher ("my," "public" or "gnip")
+        @type publisher_name string
+        @param publisher_name The publisher you want Activities for.
+        @type start datetime
+        @param start The time (in UTC) of the first bucket to retrieve
+        @type end datetime
+        @param end The time (in UTC) at which to stop; only buckets
+            starting before end are retrieved
+        @type max_workers int
+        @param max_workers The number of buckets to fetch concurrently,
+            defaults to gnip.bucket.workers
+        @type fail_fast boolean
+        @param fail_fast Stop after the first bucket that can't be retrieved
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return iterator of BucketResponse objects, one per bucket, in time order
+
+        Fetches each minute bucket in the range on a pool of worker threads.
+        A bucket that can't be retrieved is returned with its error code and
+        an Error result, or a code of None if the request itself failed.
+        With fail_fast set, iteration stops after the first failed bucket and
+        request exceptions are raised.
+
+        See Also: get_publisher_activities()
+        """
+        return self.__get_bucket_range(publisher_scope, publisher_name, None, "activity",
+            start, end, max_workers, fail_fast, dedup)
+
+    def get_filter_activities_range(self, publisher_scope, publisher_name, name, start, end, max_workers=None, fail_fast=False, dedup=None):
+        """Get Activities from a Filter for every bucket in a time range.
+
+        @type publisher_scope string
+        @param publisher_scope The scope of the publisher (my, public or gnip)
+        @type publisher_name string
+        @param publisher_name The publisher associated with the filter.
+        @type name string
+        @param name The name of the filter you want activities for
+        @type start datetime
+        @param start The time (in UTC) of the first bucket to retrieve
+        @type end datetime
+        @param end The time (in UTC) at which to stop; only buckets
+            starting before end are retrieved
+        @type max_workers int
+        @param max_workers The number of buckets to fetch concurrently
+        @type fail_fast boolean
+        @param fail_fast Stop after the first bucket that can't be retrieved
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return iterator of BucketResponse objects, one per bucket, in time order
+
+        See Also: get_filter_activities(), get_publisher_activities_range()
+        """
+        return self.__get_bucket_range(publisher_scope, publisher_name, name, "activity",
+            start, end, max_workers, fail_fast, dedup)
+
+    def get_publisher_notifications_range(self, publisher_scope, publisher_name, start, end, max_workers=None, fail_fast=False, dedup=None):
+        """Get a Publisher's Notifications for every bucket in a time range.
+
+        @type publisher_scope string
+        @param publisher_scope The scope of the publisher ("my," "public" or "gnip")
+        @type publisher_name string
+        @param publisher_name The publisher you want Notifications for.
+        @type start datetime
+        @param start The time (in UTC) of the first bucket to retrieve
+        @type end datetime
+        @param end The time (in UTC) at which to stop; only buckets
+            starting before end are retrieved
+        @type max_workers int
+        @param max_workers The number of buckets to fetch concurrently
+        @type fail_fast boolean
+        @param fail_fast Stop after the first bucket that can't be retrieved
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return iterator of BucketResponse objects, one per bucket, in time order
+
+        See Also: get_publisher_notifications(), get_publisher_activities_range()
+        """
+        return self.__get_bucket_range(publisher_scope, publisher_name, None, "notification",
+            start, end, max_workers, fail_fast, dedup)
+
+    def get_filter_notifications_range(self, publisher_scope, publisher_name, name, start, end, max_workers=None, fail_fast=False, dedup=None):
+        """Get Notifications from a Filter for every bucket in a time range.
+
+        @type publisher_scope string
+        @param publisher_scope The scope of the publisher (my, public or gnip)
+        @type publisher_name string
+        @param publisher_name The publisher associated with the filter.
+        @type name string
+        @param name The name of the filter you want Notifications for
+        @type start datetime
+        @param start The time (in UTC) of the first bucket to retrieve
+        @type end datetime
+        @param end The time (in UTC) at which to stop; only buckets
+            starting before end are retrieved
+        @type max_workers int
+        @param max_workers The number of buckets to fetch concurrently
+        @type fail_fast boolean
+        @param fail_fast Stop after the first bucket that can't be retrieved
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return iterator of BucketResponse objects, one per bucket, in time order
+
+        See Also: get_filter_notifications(), get_publisher_activities_range()
+        """
+        return self.__get_bucket_range(publisher_scope, publisher_name, name, "notification",
+            start, end, max_workers, fail_fast, dedup)
+
+    def get_filters_activities(self, filters, date_time=None, max_workers=None, dedup=None):
+        """Get Activities from many Filters for the same bucket.
+
+        @type filters list of tuples
+        @param filters (publisher scope, publisher name, filter name) tuples
+        @type date_time datetime
+        @param date_time The time for which data should be retrieved
+        @type max_workers int
+        @param max_workers The number of filters to fetch concurrently,
+            defaults to gnip.bucket.workers
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return dictionary mapping each filter tuple to its FilterResponse
+
+        Waits for every filter; use iter_filters_activities() to handle
+        each response as soon as it arrives.
+
+        See Also: get_filter_activities()
+        """
+        return self.__collect_filter_buckets(self.iter_filters_activities(filters, date_time, max_workers, dedup))
+
+    def iter_filters_activities(self, filters, date_time=None, max_workers=None, dedup=None):
+        """Get Activities from many Filters for the same bucket, as they arrive.
+
+        @type filters list of tuples
+        @param filters (publisher scope, publisher name, filter name) tuples
+        @type date_time datetime
+        @param date_time The time for which data should be retrieved
+        @type max_workers int
+        @param max_workers The number of filters to fetch concurrently,
+            defaults to gnip.bucket.workers
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return iterator of FilterResponse objects in the order they complete
+
+        The filters are fetched on a pool of worker threads, so a slow filter
+        does not delay the responses of the others. The server clock offset
+        is looked up once for the whole batch. A filter that can't be
+        retrieved is returned with its error code and an Error result, or a
+        code of None if the request itself failed.
+
+        See Also: get_filter_activities(), get_filters_activities()
+        """
+        return self.__get_filter_buckets(filters, "activity", date_time, max_workers, dedup)
+
+    def get_filters_notifications(self, filters, date_time=None, max_workers=None, dedup=None):
+        """Get Notifications from many Filters for the same bucket.
+
+        @type filters list of tuples
+        @param filters (publisher scope, publisher name, filter name) tuples
+        @type date_time datetime
+        @param date_time The time for which data should be retrieved
+        @type max_workers int
+        @param max_workers The number of filters to fetch concurrently
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return dictionary mapping each filter tuple to its FilterResponse
+
+        See Also: get_filter_notifications(), get_filters_activities()
+        """
+        return self.__collect_filter_buckets(self.iter_filters_notifications(filters, date_time, max_workers, dedup))
+
+    def iter_filters_notifications(self, filters, date_time=None, max_workers=None, dedup=None):
+        """Get Notifications from many Filters for the same bucket, as they arrive.
+
+        @type filters list of tuples
+        @param filters (publisher scope, publisher name, filter name) tuples
+        @type date_time datetime
+        @param date_time The time for which data should be retrieved
+        @type max_workers int
+        @param max_workers The number of filters to fetch concurrently
+        @type dedup DedupStore
+        @param dedup The store to remove duplicate activities with, False to
+            keep them all, or None for this instance's store
+        @return iterator of FilterResponse objects in the order they complete
+
+        See Also: get_filter_notifications(), iter_filters_activities()
+        """
+        return self.__get_filter_buckets(filters, "notification", date_time, max_workers, dedup)
 
     def update_filter(self, publisher_scope, publisher_name, filter):
         """Update a Gnip filter.
@@ -389,7 +799,7 @@ class Gnip:
 
         """
         url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + filter.name + ".xml"
-        return self.__parse_response(self.__do_http_put(url_path, filter.to_xml()))
+        return self.__parse_response(self.__do_http_put(url_path, xml_writer.iter_filter_xml(filter)))
 
     def create_publisher(self, publisher):
         """Create a Gnip publisher in the "my" scope.
@@ -437,29 +847,167 @@ class Gnip:
         url_path = "/my/publishers/" + publisher.name + ".xml"
         return self.__parse_response(self.__do_http_put(url_path, publisher.to_xml()))
 
-    def __compress_with_gzip(self, string):
-        if (string is None or len(string) is 0):
-            return ""
-        zbuf = StringIO.StringIO()
-        zfile = gzip.GzipFile(mode='wb', fileobj=zbuf, compresslevel=9)
-        zfile.write(string)
-        zfile.close()
-        return zbuf.getvalue()
+    def __bucket_url_path(self, publisher_scope, publisher_name, filter_name, bucket_type, date_time):
+        if date_time is None:
+            time_string = "current"
+        else:
+            time_string = self.time_to_string(self.sync_clock(date_time))
+        return self.__bucket_prefix(publisher_scope, publisher_name, filter_name, bucket_type) + time_string + ".xml"
+
+    def __bucket_prefix(self, publisher_scope, publisher_name, filter_name, bucket_type):
+        url_path = "/" + publisher_scope + "/publishers/" + publisher_name
+        if filter_name is not None:
+            url_path += "/filters/" + filter_name
+        return url_path + "/" + bucket_type + "/"
+
+    def __get_bucket_range(self, publisher_scope, publisher_name, filter_name, bucket_type, start, end, max_workers, fail_fast, dedup):
+        prefix = self.__bucket_prefix(publisher_scope, publisher_name, filter_name, bucket_type)
+
+        # Correct both ends once, rather than once per bucket
+        offset = datetime.timedelta(seconds=self.clock.get_offset(self.__fetch_server_date))
+        bucket_time = (start + offset).replace(second=0, microsecond=0)
+        end = end + offset
+        time_strings = []
+        while bucket_time < end:
+            time_strings.append(self.time_to_string(bucket_time))
+            bucket_time += datetime.timedelta(minutes=1)
+
+        return self.__fetch_buckets(prefix, time_strings, max_workers or self.bucket_workers, fail_fast, dedup)
+
+    def __fetch_buckets(self, prefix, time_strings, max_workers, fail_fast, dedup):
+        workers = imports.load(__name__ + ".workers")
+        pool = workers.WorkerPool(max_workers)
+        pending = collections.deque()
+        time_strings = iter(time_strings)
+        try:
+            # Keep a bounded window of buckets in flight so results can be
+            # returned in order without holding the whole range in memory
+            for time_string in time_strings:
+                pending.append((time_string, pool.submit(self.__fetch_bucket, prefix, time_string, dedup)))
+                if len(pending) >= max_workers * 2:
+                    break
+
+            while pending:
+                time_string, future = pending.popleft()
+                for next_time_string in time_strings:
+                    pending.append((next_time_string, pool.submit(self.__fetch_bucket, prefix, next_time_string, dedup)))
+                    break
+
+                if fail_fast:
+                    bucket_response = future.result()
+                else:
+                    try:
+                        bucket_response = future.result()
+                    except Exception, e:
+                        bucket_response = BucketResponse(None, Error(str(e)), time_string)
+
+                yield bucket_response
+                if fail_fast and bucket_response.code != 200:
+                    return
+        finally:
+            for time_string, future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def __get_filter_buckets(self, filters, bucket_type, date_time, max_workers, dedup):
+        # Resolve the bucket before starting, so the clock offset is looked up once
+        if date_time is None:
+            time_string = "current"
+        else:
+            time_string = self.time_to_string(self.sync_clock(date_time))
+
+        keys = []
+        seen = set()
+        for key in filters:
+            key = tuple(key)
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+        return self.__fetch_filter_buckets(keys, bucket_type, time_string, max_workers or self.bucket_workers, dedup)
+
+    def __fetch_filter_buckets(self, keys, bucket_type, time_string, max_workers, dedup):
+        workers = imports.load(__name__ + ".workers")
+        pool = workers.WorkerPool(min(max_workers, len(keys)) or 1)
+        futures = []
+        try:
+            for key in keys:
+                prefix = self.__bucket_prefix(key[0], key[1], key[2], bucket_type)
+                futures.append(pool.submit(self.__fetch_filter_bucket, prefix, time_string, key, dedup))
+            for future in workers.as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def __fetch_filter_bucket(self, prefix, time_string, key, dedup):
+        try:
+            response = self.__parse_activities_response(self.__do_http_get(prefix + time_string + ".xml"), False, dedup)
+        except Exception, e:
+            return FilterResponse(None, Error(str(e)), time_string, key)
+        return FilterResponse(response.code, response.result, time_string, key)
+
+    def __collect_filter_buckets(self, filter_responses):
+        responses = {}
+        for filter_response in filter_responses:
+            responses[filter_response.filter] = filter_response
+        return responses
+
+    def __fetch_bucket(self, prefix, time_string, dedup):
+        response = self.__parse_activities_response(self.__do_http_get(prefix + time_string + ".xml"), False, dedup)
+        return BucketResponse(response.code, response.result, time_string)
+
+    def __fetch_server_date(self):
+        resp, content = self.__do_http_head()
+        # Missing from the 503 of an open circuit breaker, and from some
+        # proxies' error responses
+        return resp.get("date")
 
     def __do_http_head(self):
-        return self.client.request(self.base_url, "HEAD", headers=self.headers)
+        return self.__do_http_request(self.base_url, "HEAD")
 
-    def __do_http_get(self, url_path, query_string = None):
+    def __do_http_get(self, url_path, query_string = None, decode = True):
         url = self.base_url + url_path
         if query_string is not None:
             url+="?" + query_string
-        return self.client.request(url, "GET", headers=self.headers)
+        if self.cache is not None:
+            return self.__do_cached_http_get(url)
+        return self.__do_http_request(url, "GET", decode=decode)
+
+    def __do_cached_http_get(self, url):
+        server_time = time.time() + (self.clock.offset or 0)
+        if not self.cache.is_cacheable(url, server_time):
+            self.cache.note_bypass()
+            return self.__do_http_request(url, "GET")
+
+        # The cache must never make a request fail, so disk errors are
+        # logged and the request is made over the network
+        key = self.username + " " + url
+        try:
+            content = self.cache.get(key)
+        except (IOError, OSError), e:
+            logging.warning("Unable to read the bucket cache: " + str(e))
+            content = None
+        if content is not None:
+            resp = connection.HttpResponse(200, "OK", {"content-length": str(len(content))})
+            if self.instrumentation is not None and self.instrumentation.sinks:
+                resp.event = self.instrumentation.emit_request(retry.endpoint_template(url), "GET", 200,
+                    uncompressed_in=len(content), cached=True)
+            return resp, content
+
+        resp, content = self.__do_http_request(url, "GET")
+        if resp.status == 200:
+            try:
+                self.cache.put(key, content)
+            except (IOError, OSError), e:
+                logging.warning("Unable to write the bucket cache: " + str(e))
+        return resp, content
 
     def __do_http_post(self, url_path, data, query_string = None):
         url = self.base_url + url_path
         if query_string is not None:
             url+="?" + query_string
-        return self.client.request(url, "POST", headers=self.headers, body=self.__compress_with_gzip(data))
+        return self.__do_http_request(url, "POST", data)
 
     def __do_http_put(self, url_path, data, query_string = None):
         url = self.base_url + url_path
@@ -472,7 +1020,7 @@ class Gnip:
         if query_string is not None:
             url+="?" + query_string
 
-        return self.client.request(url, verb, headers=self.headers, body=self.__compress_with_gzip(data))
+        return self.__do_http_request(url, verb, data)
 
     def __do_http_delete(self, url_path, query_string = None):
         url = self.base_url + url_path
@@ -485,17 +1033,120 @@ class Gnip:
         if query_string is not None:
             url+="?" + query_string
 
-        return self.client.request(url, verb, headers=self.headers, body=self.__compress_with_gzip(" "))
+        return self.__do_http_request(url, verb, " ")
+
+    def __build_headers(self, verb, body, compressed):
+        headers = dict(self.headers)
+        headers['Authorization'] = self.authorization
+        if verb == "GET" or verb == "HEAD":
+            headers['Accept-Encoding'] = 'gzip'
+        if body is not None:
+            headers['Content-Type'] = 'application/xml'
+            if compressed:
+                headers['Content-Encoding'] = 'gzip'
+        return headers
+
+    def __do_http_request(self, url, verb, data=None, decode=True):
+        if data is None:
+            body, compressed, data_size = None, False, 0
+        else:
+            body, compressed, data_size = self.compressor.compress_chunks(data)
+        headers = self.__build_headers(verb, body, compressed)
+
+        def send():
+            sent_at = time.time()
+            resp, content = self.pool.request(url, verb, headers, body)
+            received_at = time.time()
+            if body:
+                self.compressor.observe_upload(len(body), resp.send_time)
+            self.clock.observe(resp.get("date"), sent_at, received_at)
+            return resp, content
+
+        started = time.time()
+        try:
+            resp, content = self.retry_policy.execute(verb, url, send)
+        except Exception, e:
+            # Failures are the requests most worth reporting
+            if self.instrumentation is not None and self.instrumentation.sinks:
+                self.instrumentation.emit_request(retry.endpoint_template(url), verb, None,
+                    bytes_out=len(body or ""), uncompressed_out=data_size, total_time=time.time() - started,
+                    error=e.__class__.__name__)
+            raise
+        wire_size = len(content)
+        if decode or resp.get("content-encoding") != "gzip":
+            content = self.__decode(resp, content)
+            uncompressed_size = len(content)
+        else:
+            uncompressed_size = None
+        if self.instrumentation is not None and self.instrumentation.sinks:
+            resp.event = self.instrumentation.emit_request(retry.endpoint_template(url), verb, resp.status,
+                bytes_out=len(body or ""), uncompressed_out=data_size, bytes_in=wire_size,
+                uncompressed_in=uncompressed_size, ttfb=resp.ttfb, total_time=time.time() - started)
+        return resp, content
+
+    def __decode(self, resp, content):
+        encoding = resp.get("content-encoding")
+        if encoding == "gzip":
+            # The content is no longer encoded once it has been decompressed
+            del resp["content-encoding"]
+        return self.decompressor.decode(content, encoding)
 
     def __parse_response(self, response, data_object=None):
+        parse_started = time.time()
         if (response[0].status == 200):
             if data_object is None:
-                return Response(response[0].status, self.__parse_result(response[1]))
+                parsed = Response(response[0].status, self.__parse_result(response[1]))
             else:
                 data_object.from_xml(response[1])
-                return Response(response[0].status, data_object)
+                parsed = Response(response[0].status, data_object)
         else:
-            return Response(response[0].status, self.__parse_error(response[1]))
+            parsed = Response(response[0].status, self.__parse_error(response[1]))
+        self.__emit_parse_time(response[0], time.time() - parse_started)
+        return parsed
+
+    def __parse_activities_response(self, response, stream, dedup):
+        if dedup is None:
+            dedup = self.dedup
+        elif dedup is False:
+            dedup = None
+        resp, content = response
+        if stream and resp.status == 200:
+            if resp.get("content-encoding") == "gzip":
+                # Decompress as the parser reads, not into one string
+                content = self.decompressor.stream(content)
+            items = activities.Activities(lazy=self.lazy_activities).iter_from_xml(content)
+            if resp.event is not None:
+                items = self.__time_parse(resp, items)
+            if dedup is not None:
+                items = dedup.iter_filter(items)
+            return Response(resp.status, items)
+        if resp.get("content-encoding") == "gzip":
+            content = self.__decode(resp, content)
+        parsed = self.__parse_response((resp, content), activities.Activities(lazy=self.lazy_activities))
+        if dedup is not None and parsed.code == 200:
+            parsed.result.items = dedup.filter(parsed.result.items)
+        return parsed
+
+    def __emit_parse_time(self, resp, parse_time):
+        if resp.event is None:
+            return
+        self.instrumentation.emit_parse(resp.event.endpoint, resp.event.verb, parse_time)
+
+    def __time_parse(self, resp, items):
+        # Only the time spent producing items counts, not the time the
+        # caller spends on each one; reported once the items run out
+        parse_time = 0.0
+        items = iter(items)
+        while True:
+            started = time.time()
+            try:
+                item = items.next()
+            except StopIteration:
+                parse_time += time.time() - started
+                break
+            parse_time += time.time() - started
+            yield item
+        self.__emit_parse_time(resp, parse_time)
 
     def __parse_error(self, error_xml):
         logging.info("Parsing error from XML: " + error_xml)
@@ -507,7 +1158,7 @@ class Gnip:
         result = Result()
         result.from_xml(result_xml)
         return result
-                
+
 if __name__=="__main__":
 
     print "This module was not designed to be called directly."
@@ -1,11 +1,26 @@
 from elementtree.ElementTree import *
+from elementtree.ElementTree import iterparse
+import StringIO
 import activity
+import payload
 
 class Activities(object):
     """A list of Gnip Activities."""
 
-    def __init__(self, activitiyList=[]):
+    def __init__(self, activitiyList=None, lazy=False):
+        """Initialize the class.
+
+        @type activitiyList list of Activity
+        @param activitiyList The Activities
+        @type lazy boolean
+        @param lazy Parse XML into LazyActivity objects, which decode each
+            field only when it is first read
+        """
+
+        if activitiyList is None:
+            activitiyList = []
         self.items = activitiyList
+        self.lazy = lazy
 
     def to_xml(self):
         activity_xml = '<?xml version="1.0" encoding="UTF-8"?><activities>'
@@ -15,11 +30,86 @@ class Activities(object):
         activity_xml += '</activities>'
         return activity_xml
 
+    def read_raws(self, processes=None, chunk_size=None, pool=None):
+        """ Decode the payload raws of all the items at once
+
+        @type processes int
+        @param processes The number of processes to decode with, by
+            default one per CPU
+        @type chunk_size int
+        @param chunk_size The number of raws sent to a process at a time
+        @type pool multiprocessing.Pool
+        @param pool A pool to use instead of starting one
+        @return list of the decoded raws, None for items without one
+
+        The raws are decoded on a process pool, see payload.map_raws(),
+        and remembered by each Payload, so read_raw() then returns them
+        without decoding them again.
+
+        """
+
+        payloads = [an_activity.payload for an_activity in self.items]
+        payload.decode_payloads(payloads, processes, chunk_size, pool)
+        raws = []
+        for a_payload in payloads:
+            if a_payload is None:
+                raws.append(None)
+            else:
+                raws.append(a_payload.read_raw())
+        return raws
+
+    def encode_raws(self, processes=None, chunk_size=None, pool=None):
+        """ Compress and encode the payload raws of all the items at once
+
+        Takes the same arguments as read_raws(). Raws are otherwise
+        encoded one at a time as the items are serialized, so call this
+        before publishing a large batch.
+
+        """
+
+        payload.encode_payloads([an_activity.payload for an_activity in self.items], processes, chunk_size, pool)
+
     def from_xml(self, activities_xml):
         root = fromstring(activities_xml)
         activity_nodes = root.findall("activity")
         self.activities = []
         for node in activity_nodes:
-            an_activity = activity.Activity()
-            an_activity.from_xml_node(node)
-            self.items.append(an_activity)
+            self.items.append(self.__make_activity(node))
+
+    def iter_from_xml(self, activities_xml):
+        """ Parse Activities one at a time from XML
+
+        @type activities_xml string or file
+        @param activities_xml An activities XML document, or a file-like
+            object to read one from
+        @return iterator of Activity objects
+
+        Yields each Activity as soon as its closing tag has been parsed,
+        then discards the parsed element, so a document of any size can
+        be consumed in constant memory. The Activity objects are not
+        added to items. A LazyActivity keeps its own element until all of
+        its fields have been read.
+
+        """
+
+        if isinstance(activities_xml, basestring):
+            activities_xml = StringIO.StringIO(activities_xml)
+
+        root = None
+        for event, node in iterparse(activities_xml, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = node
+            elif node.tag == "activity":
+                an_activity = self.__make_activity(node)
+                if not self.lazy:
+                    node.clear()
+                root.clear()
+                yield an_activity
+
+    def __make_activity(self, node):
+        if self.lazy:
+            return activity.LazyActivity(node)
+        an_activity = activity.Activity()
+        an_activity.from_xml_node(node)
+        return an_activity
@@ -2,15 +2,92 @@ from elementtree.ElementTree import *
 import xml_objects
 import payload
 import place
-import iso8601
-
-class Activity(object):
+import timestamps
+
+# Each field of an Activity is decoded from its activity element by one of
+# these functions, so that LazyActivity can decode them independently
+
+def decode_at(xml_node):
+    return timestamps.parse_time(xml_node.find("at").text)
+
+def decode_action(xml_node):
+    return xml_node.find("action").text
+
+def decode_text(tag):
+    def decode(xml_node):
+        node = xml_node.find(tag)
+        if node is not None:
+            return node.text
+        return None
+    return decode
+
+def decode_all(tag, make):
+    def decode(xml_node):
+        nodes = xml_node.findall(tag)
+        if nodes:
+            return [make(node) for node in nodes]
+        # Absent repeated fields share the empty tuple rather than each
+        # holding an empty list
+        return ()
+    return decode
+
+def make_place(place_node):
+    a_place = place.Place()
+    a_place.from_xml_node(place_node)
+    return a_place
+
+def make_actor(actor_node):
+    return xml_objects.Actor(value=actor_node.text, meta_url=actor_node.get("metaURL"), uid=actor_node.get("uid"))
+
+def make_url(url_node):
+    return xml_objects.URL(value=url_node.text, meta_url=url_node.get("metaURL"))
+
+def make_tag(tag_node):
+    return xml_objects.Tag(value=tag_node.text, meta_url=tag_node.get("metaURL"))
+
+def make_to(to_node):
+    return xml_objects.To(value=to_node.text, meta_url=to_node.get("metaURL"))
+
+def decode_payload(xml_node):
+    payload_node = xml_node.find("payload")
+    if payload_node is not None:
+        a_payload = payload.Payload()
+        a_payload.from_xml_node(payload_node)
+        return a_payload
+    return None
+
+FIELDS = [
+    ("at", decode_at),
+    ("action", decode_action),
+    ("activity_id", decode_text("activityID")),
+    ("url", decode_text("URL")),
+    ("sources", decode_all("source", lambda source_node: source_node.text)),
+    ("places", decode_all("place", make_place)),
+    ("actors", decode_all("actor", make_actor)),
+    ("destination_urls", decode_all("destinationURL", make_url)),
+    ("tags", decode_all("tag", make_tag)),
+    ("tos", decode_all("to", make_to)),
+    ("regarding_urls", decode_all("regardingURL", make_url)),
+    ("payload", decode_payload),
+]
+
+class Activity(xml_objects.SlottedObject):
     """Gnip activity container class
 
     This class provides an abstraction from the Gnip activities XML.
 
+    A repeated field (sources, places, actors, destination_urls, tags, tos
+    or regarding_urls) that is absent from the XML decodes to the shared
+    empty tuple (), where it used to be a new empty list. It can't be
+    appended to: assign a new list instead, e.g.
+    an_activity.tos = list(an_activity.tos) + [a_to]. Fields present in
+    the XML are still lists.
+
     """
 
+    __slots__ = ("at", "action", "activity_id", "url", "sources", "places", "actors", "destination_urls",
+                 "tags", "tos", "regarding_urls", "payload")
+
     def __init__(self, at=None, action=None, activity_id=None, url=None, sources=None, places=None, actors=None,
                  destination_urls=None, tags=None, tos=None, regarding_urls=None, payload=None):
         """Initialize the class.
@@ -67,7 +144,7 @@ class Activity(object):
 
         """
 
-        return self.at.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return timestamps.format_time(self.at)
 
     def set_at_from_string(self, string):
         """ Set 'at' attribute from a formatted string
@@ -79,7 +156,7 @@ class Activity(object):
 
         """
 
-        self.at = iso8601.parse_date(string)
+        self.at = timestamps.parse_time(string)
 
     def from_xml(self, xml):
         """ Populate object from XML
@@ -187,92 +264,8 @@ class Activity(object):
 
 
     def from_xml_node(self, xml_node):
-        at_node = xml_node.find("at")
-        self.set_at_from_string(at_node.text)
-
-        action_node = xml_node.find("action")
-        self.action = action_node.text
-
-        activity_id_node = xml_node.find("activityID")
-        if activity_id_node is not None:
-            self.activity_id = activity_id_node.text
-        else:
-            self.activity_id = None
-
-        url_node = xml_node.find("URL")
-        if url_node is not None:
-            self.url = url_node.text
-        else:
-            self.url = None
-
-        source_nodes = xml_node.findall("source")
-        if source_nodes is not None:
-            self.sources = []
-            for source_node in source_nodes:
-                source = source_node.text
-                self.sources.append(source)
-        else:
-            self.sources = None
-
-        place_nodes = xml_node.findall("place")
-        if place_nodes is not None:
-            self.places = []
-            for place_node in place_nodes:
-                a_place = place.Place()
-                a_place.from_xml_node(place_node)
-                self.places.append(a_place)
-        else:
-            self.places = None
-
-        actor_nodes = xml_node.findall("actor")
-        if actor_nodes is not None:
-            self.actors = []
-            for actor_node in actor_nodes:
-                actor = xml_objects.Actor(value=actor_node.text, meta_url=actor_node.get("metaURL"), uid=actor_node.get("uid"))
-                self.actors.append(actor)
-        else:
-            self.actors = None
-
-        destination_url_nodes = xml_node.findall("destinationURL")
-        if destination_url_nodes is not None:
-            self.destination_urls = []
-            for destination_url_node in destination_url_nodes:
-                destination_url = xml_objects.URL(value=destination_url_node.text, meta_url=destination_url_node.get("metaURL"))
-                self.destination_urls.append(destination_url)
-        else:
-            self.destination_urls = None
-
-        tag_nodes = xml_node.findall("tag")
-        if tag_nodes is not None:
-            self.tags = []
-            for tag_node in tag_nodes:
-                tag = xml_objects.Tag(value=tag_node.text, meta_url=tag_node.get("metaURL"))
-                self.tags.append(tag)
-        else:
-            self.tags = None
-
-        to_nodes = xml_node.findall("to")
-        if to_nodes is not None:
-            self.tos = []
-            for to_node in to_nodes:
-                to = xml_objects.To(value=to_node.text, meta_url=to_node.get("metaURL"))
-                self.tos.append(to)
-        else:
-            self.tos = None
-
-        regarding_url_nodes = xml_node.findall("regardingURL")
-        if regarding_url_nodes is not None:
-            self.regarding_urls = []
-            for regarding_url_node in regarding_url_nodes:
-                regarding_url = xml_objects.URL(value=regarding_url_node.text, meta_url=regarding_url_node.get("metaURL"))
-                self.regarding_urls.append(regarding_url)
-        else:
-            self.regarding_urls = None
-
-        payload_node = xml_node.find("payload")
-        if payload_node is not None:
-            self.payload = payload.Payload()
-            self.payload.from_xml_node(payload_node)
+        for name, decode in FIELDS:
+            setattr(self, name, decode(xml_node))
 
     def __str__(self):
         return "[" + self.get_at_as_string() + \
@@ -288,3 +281,76 @@ class Activity(object):
             ", " + str(self.regarding_urls) + \
             ", " + str(self.payload) + \
             "]"
+
+class LazyActivity(Activity):
+    """An Activity that decodes each field the first time it is read
+
+    A LazyActivity keeps the element it was parsed from, and turns the
+    element's children into the at datetime, Actors, URLs, Payload and
+    so on only when the corresponding attribute is first read. Reading
+    a few fields of each activity, such as activity_id and at, then
+    costs little more than parsing the XML. Assigned fields are never
+    decoded. Until all of its fields have been read, a LazyActivity holds
+    on to its element, so it uses more memory than an Activity.
+
+    """
+
+    __slots__ = ("_node", "_decoded")
+
+    def __init__(self, xml_node=None):
+        """Initialize the class.
+
+        @type xml_node Element
+        @param xml_node The activity element to decode fields from, or
+            None for an empty Activity
+        """
+
+        self._node = None
+        self._decoded = 0
+        Activity.__init__(self)
+        if xml_node is not None:
+            self.from_xml_node(xml_node)
+
+    def from_xml_node(self, xml_node):
+        self._node = xml_node
+        self._decoded = 0
+
+    def __getstate__(self):
+        # Pickled with every field decoded, and without the element
+        state = Activity.__getstate__(self)
+        del state["_node"]
+        del state["_decoded"]
+        return state
+
+    def __setstate__(self, state):
+        self._node = None
+        self._decoded = 0
+        Activity.__setstate__(self, state)
+
+    def _mark_decoded(self, bit):
+        self._decoded |= bit
+        if self._decoded == ALL_DECODED:
+            # Every field has been read or assigned, the element is no longer needed
+            self._node = None
+
+def lazy_field(index, name, decode):
+    slot = getattr(Activity, name)
+    bit = 1 << index
+
+    def get(self):
+        if not self._decoded & bit:
+            slot.__set__(self, decode(self._node))
+            self._mark_decoded(bit)
+        return slot.__get__(self, LazyActivity)
+
+    def set(self, value):
+        slot.__set__(self, value)
+        self._mark_decoded(bit)
+
+    return property(get, set)
+
+ALL_DECODED = (1 << len(FIELDS)) - 1
+
+for index, (name, decode) in enumerate(FIELDS):
+    setattr(LazyActivity, name, lazy_field(index, name, decode))
+del index, name, decode
@@ -0,0 +1,1452 @@
+import os
+import sys
+import time
+import heapq
+import errno
+import fcntl
+import select
+import socket
+import httplib
+import logging
+import datetime
+import threading
+import collections
+import base64
+import urlparse
+import activities
+import filter
+import publisher
+import clock
+import connection
+import compression
+import retry
+import workers
+import xml_writer
+from config import get_config
+from connection import HttpResponse, REDIRECT_CODES, BODY_HEADERS, is_idempotent
+from xml_objects import Error, Result
+from response import Response
+
+# Bytes read from, or written to, a socket at a time
+IO_SIZE = 65536
+
+# The longest response status line and headers accepted
+MAX_HEAD_SIZE = 65536
+
+# Seconds a host's address is used for new connections before it is
+# looked up again
+ADDRESS_TTL = 300
+
+class ResponseReader(object):
+    """Parses an HTTP/1.x response as its bytes arrive.
+
+    feed() is passed each piece read from the connection and returns True
+    once the response is complete; finish() is called instead if the
+    server closes the connection. Bodies may be sized by Content-Length,
+    chunked, or run to the end of the connection.
+
+    """
+
+    def __init__(self, verb):
+        self.verb = verb
+        self.version = None
+        self.status = None
+        self.reason = None
+        self.headers = {}
+        self.head_complete = False
+        self.complete = False
+        self.reusable = False
+        self.__buffer = ""
+        self.__body = []
+        self.__mode = None
+        self.__remaining = 0
+        self.__chunk_state = "size"
+
+    def get_body(self):
+        return "".join(self.__body)
+
+    def feed(self, data):
+        """Consume the next bytes of the response.
+
+        @return boolean True if the response is complete
+        """
+
+        self.__buffer += data
+        while not self.head_complete:
+            end = self.__buffer.find("\r\n\r\n")
+            if end < 0:
+                if len(self.__buffer) > MAX_HEAD_SIZE:
+                    raise httplib.LineTooLong("response headers")
+                return False
+            head = self.__buffer[:end]
+            self.__buffer = self.__buffer[end + 4:]
+            self.__parse_head(head)
+        if self.complete:
+            return True
+        return self.__read_body()
+
+    def finish(self):
+        """Handle the server closing the connection.
+
+        @return boolean True if that completes the response; raises
+            BadStatusLine if nothing was received, IncompleteRead if the
+            body was cut short
+        """
+
+        if not self.head_complete:
+            if not self.__buffer:
+                raise httplib.BadStatusLine("")
+            raise httplib.IncompleteRead(self.__buffer)
+        if self.__mode == "close":
+            self.complete = True
+            return True
+        if not self.complete:
+            raise httplib.IncompleteRead(self.get_body())
+        return True
+
+    def __parse_head(self, head):
+        lines = head.split("\r\n")
+        parts = lines[0].split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise httplib.BadStatusLine(lines[0])
+        try:
+            status = int(parts[1])
+        except ValueError:
+            raise httplib.BadStatusLine(lines[0])
+        if 100 <= status < 200:
+            # Interim responses are followed by the real one
+            return
+
+        self.version = parts[0]
+        self.status = status
+        self.reason = len(parts) > 2 and parts[2] or ""
+        name = None
+        for line in lines[1:]:
+            if line[:1] in (" ", "\t") and name is not None:
+                self.headers[name] += " " + line.strip()
+                continue
+            name, sep, value = line.partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            if name in self.headers:
+                self.headers[name] += ", " + value
+            else:
+                self.headers[name] = value
+        self.head_complete = True
+
+        if self.verb == "HEAD" or status in (204, 304):
+            self.__mode = "none"
+            self.complete = True
+        elif "chunked" in self.headers.get("transfer-encoding", "").lower():
+            self.__mode = "chunked"
+        elif self.headers.get("content-length"):
+            self.__mode = "length"
+            self.__remaining = int(self.headers["content-length"])
+            self.complete = self.__remaining == 0
+        else:
+            self.__mode = "close"
+
+        options = self.headers.get("connection", "").lower()
+        if self.__mode == "close":
+            self.reusable = False
+        elif self.version == "HTTP/1.1":
+            self.reusable = "close" not in options
+        else:
+            self.reusable = "keep-alive" in options
+
+    def __read_body(self):
+        data, self.__buffer = self.__buffer, ""
+        if self.__mode == "close":
+            self.__body.append(data)
+            return False
+        if self.__mode == "length":
+            if len(data) > self.__remaining:
+                # More than the response holds, the connection is out of step
+                self.reusable = False
+                data = data[:self.__remaining]
+            self.__body.append(data)
+            self.__remaining -= len(data)
+            self.complete = self.__remaining == 0
+            return self.complete
+
+        while True:
+            if self.__chunk_state == "data":
+                piece = data[:self.__remaining]
+                self.__body.append(piece)
+                self.__remaining -= len(piece)
+                data = data[len(piece):]
+                if self.__remaining:
+                    return False
+                self.__chunk_state = "data-end"
+            elif self.__chunk_state == "data-end":
+                if len(data) < 2:
+                    self.__buffer = data
+                    return False
+                data = data[2:]
+                self.__chunk_state = "size"
+            else:
+                end = data.find("\r\n")
+                if end < 0:
+                    if len(data) > MAX_HEAD_SIZE:
+                        raise httplib.LineTooLong("chunk size")
+                    self.__buffer = data
+                    return False
+                line, data = data[:end], data[end + 2:]
+                if self.__chunk_state == "trailer":
+                    if not line:
+                        if data:
+                            self.reusable = False
+                        self.complete = True
+                        return True
+                    continue
+                try:
+                    size = int(line.split(";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise httplib.IncompleteRead(self.get_body())
+                if size == 0:
+                    self.__chunk_state = "trailer"
+                else:
+                    self.__remaining = size
+                    self.__chunk_state = "data"
+
+class AsyncConnection(object):
+    """A non-blocking HTTP or HTTPS connection, driven by an EventLoop.
+
+    start() begins a request, after which the loop calls on_writable() or
+    on_readable() as wants_write() and wants_read() ask, until one returns
+    True to say the response is complete. Errors are raised from those
+    calls. The connection can then start another request if reusable.
+    address, a result of socket.getaddrinfo(), saves looking up the host
+    when connecting, which would block.
+
+    """
+
+    def __init__(self, scheme, host, port, timeout=None, address=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.address = address
+        self.sock = None
+        self.deadline = None
+        self.requests = 0
+        self.received = False
+        self.reusable = False
+        self.response = None
+        self.content = None
+        self.__state = "closed"
+        self.__tls_wants = None
+        self.__out = ""
+        self.__sent = 0
+        self.__reader = None
+        self.__verb = None
+        self.__started = None
+        self.__first_byte_at = None
+        self.__send_time = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def start(self, verb, path, headers, body):
+        """Begin sending a request, connecting first if needed.
+
+        @type verb string
+        @param verb The HTTP method
+        @type path string
+        @param path The path and query string to request
+        @type headers dictionary
+        @param headers Request headers
+        @type body string
+        @param body The request body, or None
+
+        """
+
+        lines = [verb + " " + path + " HTTP/1.1", "Host: " + self.__host_header()]
+        for name, value in (headers or {}).items():
+            lines.append(name + ": " + str(value))
+        if body is not None or verb in ("POST", "PUT"):
+            lines.append("Content-Length: " + str(len(body or "")))
+        self.__out = "\r\n".join(lines) + "\r\n\r\n" + (body or "")
+        self.__sent = 0
+        self.__verb = verb
+        self.__reader = ResponseReader(verb)
+        self.__first_byte_at = None
+        self.__send_time = None
+        self.received = False
+        self.response = None
+        self.content = None
+        self.requests += 1
+        self.__started = time.time()
+        self.__touch()
+        if self.sock is None:
+            self.__connect()
+        else:
+            self.__state = "sending"
+
+    def is_idle(self):
+        return self.__state == "idle"
+
+    def wants_read(self):
+        if self.__tls_wants is not None:
+            return self.__tls_wants == "read"
+        return self.__state in ("reading", "idle")
+
+    def wants_write(self):
+        if self.__tls_wants is not None:
+            return self.__tls_wants == "write"
+        return self.__state in ("connecting", "sending")
+
+    def on_writable(self):
+        return self.__step()
+
+    def on_readable(self):
+        return self.__step()
+
+    def close(self):
+        self.__state = "closed"
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+            self.sock = None
+
+    def __host_header(self):
+        default_port = self.scheme == "https" and 443 or 80
+        host = self.host
+        if ":" in host:
+            host = "[" + host + "]"
+        if self.port != default_port:
+            host += ":" + str(self.port)
+        return host
+
+    def __connect(self):
+        if self.address is None:
+            self.address = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0]
+        family, socktype, proto, canonname, address = self.address
+        self.sock = socket.socket(family, socktype, proto)
+        self.sock.setblocking(0)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        error = self.sock.connect_ex(address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            raise socket.error(error, os.strerror(error))
+        self.__state = "connecting"
+
+    def __step(self):
+        self.__tls_wants = None
+        if self.__state == "connecting":
+            error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                raise socket.error(error, os.strerror(error))
+            if self.scheme == "https":
+                import ssl
+                context = ssl.create_default_context()
+                self.sock = context.wrap_socket(self.sock, server_hostname=self.host,
+                    do_handshake_on_connect=False)
+                self.__state = "handshaking"
+            else:
+                self.__state = "sending"
+        if self.__state == "handshaking":
+            if self.__tls(self.__handshake) is None:
+                return False
+            self.__state = "sending"
+        if self.__state == "sending":
+            self.__send()
+        if self.__state == "reading":
+            return self.__receive()
+        if self.__state == "idle":
+            # An idle connection should have nothing to read, if it is
+            # readable the server has closed it
+            raise socket.error(errno.ECONNRESET, "Idle connection closed by the server")
+        return False
+
+    def __handshake(self):
+        self.sock.do_handshake()
+        return True
+
+    def __send(self):
+        started = time.time()
+        while self.__sent < len(self.__out):
+            piece = self.__out[self.__sent:self.__sent + IO_SIZE]
+            sent = self.__tls(self.sock.send, piece)
+            if not sent:
+                return
+            self.__sent += sent
+            self.__touch()
+        # Time the upload alone, without connecting or waiting for the server
+        self.__send_time = (self.__send_time or 0) + time.time() - started
+        self.__state = "reading"
+
+    def __receive(self):
+        while True:
+            data = self.__tls(self.sock.recv, IO_SIZE)
+            if data is None:
+                return False
+            self.__touch()
+            if not data:
+                complete = self.__reader.finish()
+            else:
+                if self.__first_byte_at is None:
+                    self.__first_byte_at = time.time()
+                self.received = True
+                complete = self.__reader.feed(data)
+            if complete:
+                self.__finish(bool(data))
+                return True
+
+    def __finish(self, still_open):
+        reader = self.__reader
+        self.response = HttpResponse(reader.status, reader.reason, reader.headers)
+        self.response.ttfb = self.__first_byte_at - self.__started
+        self.response.send_time = self.__send_time
+        self.response.elapsed = time.time() - self.__started
+        self.content = reader.get_body()
+        self.reusable = still_open and reader.reusable
+        self.__reader = None
+        self.__out = ""
+        self.deadline = None
+        self.__state = "idle"
+
+    def __tls(self, operation, *args):
+        # Runs a socket operation, returning None if it would block
+        try:
+            return operation(*args)
+        except socket.error, e:
+            name = e.__class__.__name__
+            if name == "SSLWantReadError":
+                self.__tls_wants = "read"
+                return None
+            if name == "SSLWantWriteError":
+                self.__tls_wants = "write"
+                return None
+            if e.args and e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return None
+            raise
+
+    def __touch(self):
+        if self.timeout is not None:
+            self.deadline = time.time() + self.timeout
+
+class Exchange(object):
+    """A request handed to an EventLoop, and the callback for its outcome."""
+
+    def __init__(self, url, verb, headers, body, callback):
+        self.url = url
+        self.verb = verb
+        self.headers = headers
+        self.body = body
+        self.callback = callback
+        self.redirects = 0
+        self.fresh_connection = False
+
+class EventLoop(object):
+    """Performs many HTTP requests at once on a single thread.
+
+    Requests are multiplexed with select() over persistent connections,
+    at most max_size to each host; further requests to a host wait in
+    order for one of its connections to be free. Idle connections are
+    reused unless they have been idle for longer than idle_timeout or the
+    server has closed them, and an idempotent request that finds a reused
+    connection closed is sent once more on a new one. Redirects are
+    followed as by ConnectionPool. A host is looked up on a helper thread
+    the first time it is connected to, and its address is reused for
+    ADDRESS_TTL seconds, then looked up again while connections carry on
+    using the old one.
+
+    request(), call_later() and the callbacks run on the loop's thread;
+    call_soon() may be used from any thread to get there.
+
+    """
+
+    def __init__(self, max_size=10, idle_timeout=60, timeout=None, max_redirects=5):
+        """Initialize the class.
+
+        @type max_size int
+        @param max_size The maximum number of connections to each host
+        @type idle_timeout float
+        @param idle_timeout Seconds a connection may sit idle before it is closed
+        @type timeout float
+        @param timeout Seconds a connection may wait for the server to
+            accept, send or receive anything before the request fails
+        @type max_redirects int
+        @param max_redirects The number of redirects followed for a request
+
+        """
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.__lock = threading.Lock()
+        self.__calls = collections.deque()
+        self.__timers = []
+        self.__timer_count = 0
+        self.__waiting = {}
+        self.__open = {}
+        self.__idle = {}
+        self.__busy = {}
+        self.__addresses = {}
+        self.__resolving = set()
+        self.__thread = None
+        self.__closed = False
+        self.__wake_reader, self.__wake_writer = os.pipe()
+        for fd in (self.__wake_reader, self.__wake_writer):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def call_soon(self, function, *args):
+        """Run function(*args) on the loop's thread, starting it if needed.
+
+        Raises ValueError if the loop has been closed.
+        """
+
+        self.__lock.acquire()
+        try:
+            if self.__closed:
+                raise ValueError("EventLoop is closed")
+            self.__calls.append((function, args))
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="gnip-event-loop")
+                self.__thread.setDaemon(True)
+                self.__thread.start()
+            self.__wake()
+        finally:
+            self.__lock.release()
+
+    def call_later(self, delay, function, *args):
+        """Run function(*args) on the loop's thread after delay seconds.
+
+        Must be called on the loop's thread.
+        """
+
+        self.__timer_count += 1
+        heapq.heappush(self.__timers, (time.time() + delay, self.__timer_count, function, args))
+
+    def request(self, url, verb, headers, body, callback):
+        """Start an HTTP request. Must be called on the loop's thread.
+
+        @type url string
+        @param url The absolute URL to request
+        @type verb string
+        @param verb The HTTP method
+        @type headers dictionary
+        @param headers Request headers
+        @type body string
+        @param body The request body, or None
+        @type callback callable
+        @param callback Called on completion as callback(resp, content,
+            exc_info): with the HttpResponse and body of the response,
+            or with the sys.exc_info() of the error that ended the request
+
+        Once the loop is closed the request fails at once.
+        """
+
+        exchange = Exchange(url, verb, headers, body, callback)
+        if self.__closed:
+            self.__cancel(exchange)
+        else:
+            self.__queue(exchange)
+
+    def close(self):
+        """Stop the loop and close every connection.
+
+        Requests still in progress fail with workers.CancelledError.
+        Returns once the loop's thread has exited, unless called on it.
+        """
+
+        self.__lock.acquire()
+        try:
+            if self.__closed:
+                return
+            self.__closed = True
+            thread = self.__thread
+            self.__wake()
+        finally:
+            self.__lock.release()
+        if thread is None:
+            self.__shutdown()
+        elif thread is not threading.currentThread():
+            thread.join()
+
+    def get_stats(self):
+        """Return a dictionary of request and connection counts.
+
+        in_flight, waiting and idle are current numbers of requests and
+        connections, created, reused and discarded are totals over the
+        life of the loop. The counts are read without locking, as they
+        are changed by the loop's thread.
+
+        """
+
+        return {
+            'in_flight': len(self.__busy),
+            'waiting': sum([len(waiting) for waiting in self.__waiting.values()]),
+            'idle': sum([len(idle) for idle in self.__idle.values()]),
+            'created': self.created,
+            'reused': self.reused,
+            'discarded': self.discarded,
+        }
+
+    def __wake(self):
+        try:
+            os.write(self.__wake_writer, "x")
+        except OSError, e:
+            # A full pipe will wake the loop anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def __run(self):
+        while True:
+            self.__lock.acquire()
+            try:
+                calls, self.__calls = self.__calls, collections.deque()
+                closed = self.__closed
+            finally:
+                self.__lock.release()
+            if closed:
+                break
+            for function, args in calls:
+                self.__invoke(function, args)
+
+            now = time.time()
+            while self.__timers and self.__timers[0][0] <= now:
+                when, count, function, args = heapq.heappop(self.__timers)
+                self.__invoke(function, args)
+            if self.__calls:
+                continue
+
+            readers = [self.__wake_reader]
+            writers = []
+            for connection in self.__busy.keys():
+                if connection.wants_read():
+                    readers.append(connection)
+                if connection.wants_write():
+                    writers.append(connection)
+            for idle in self.__idle.values():
+                readers.extend([connection for connection, last_used in idle])
+
+            try:
+                readable, writable = self.__select(readers, writers, self.__next_timeout())
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            if self.__wake_reader in readable:
+                try:
+                    os.read(self.__wake_reader, 4096)
+                except OSError:
+                    pass
+            for connection in writable:
+                if connection in self.__busy:
+                    self.__progress(connection, connection.on_writable)
+            for connection in readable:
+                if connection in self.__busy:
+                    self.__progress(connection, connection.on_readable)
+                elif connection is not self.__wake_reader:
+                    self.__remove_idle(connection)
+            self.__check_deadlines()
+            self.__evict_idle()
+        self.__shutdown()
+
+    def __select(self, readers, writers, timeout):
+        if not hasattr(select, "poll"):
+            readable, writable, errored = select.select(readers, writers, [], timeout)
+            return readable, writable
+
+        # poll() has no limit on descriptor numbers, unlike select()
+        files = {}
+        for item in readers:
+            files[self.__fileno(item)] = [item, select.POLLIN]
+        for item in writers:
+            files.setdefault(self.__fileno(item), [item, 0])[1] |= select.POLLOUT
+        poller = select.poll()
+        for fd, (item, mask) in files.items():
+            poller.register(fd, mask)
+        if timeout is not None:
+            timeout = int(timeout * 1000) + 1
+        readable = []
+        writable = []
+        for fd, events in poller.poll(timeout):
+            item, mask = files[fd]
+            # Errors are found by the read or write they make fail
+            if events & ~select.POLLOUT and mask & select.POLLIN:
+                readable.append(item)
+            if events & ~select.POLLIN and mask & select.POLLOUT:
+                writable.append(item)
+        return readable, writable
+
+    def __fileno(self, item):
+        if isinstance(item, int):
+            return item
+        return item.fileno()
+
+    def __invoke(self, function, args):
+        try:
+            function(*args)
+        except Exception:
+            logging.exception("Unhandled error in a Gnip event loop callback")
+
+    def __next_timeout(self):
+        now = time.time()
+        wake_at = []
+        if self.__timers:
+            wake_at.append(self.__timers[0][0])
+        for connection in self.__busy.keys():
+            if connection.deadline is not None:
+                wake_at.append(connection.deadline)
+        for idle in self.__idle.values():
+            wake_at.extend([last_used + self.idle_timeout for connection, last_used in idle])
+        if not wake_at:
+            return None
+        return max(min(wake_at) - now, 0)
+
+    def __queue(self, exchange, first=False):
+        key = urlparse.urlsplit(exchange.url)[:2]
+        waiting = self.__waiting.setdefault(key, collections.deque())
+        if first:
+            waiting.appendleft(exchange)
+        else:
+            waiting.append(exchange)
+        self.__dispatch(key)
+
+    def __dispatch(self, key):
+        waiting = self.__waiting.get(key)
+        while waiting:
+            connection = None
+            idle = self.__idle.get(key)
+            if idle and not waiting[0].fresh_connection:
+                connection, last_used = idle.pop()
+                self.reused += 1
+            elif self.__open.get(key, 0) < self.max_size:
+                parts = urlparse.urlsplit(waiting[0].url)
+                default_port = parts.scheme == "https" and 443 or 80
+                address = self.__get_address(key, parts.hostname, parts.port or default_port)
+                if address is None:
+                    # Dispatched again once the host has been looked up
+                    return
+                connection = AsyncConnection(parts.scheme, parts.hostname, parts.port or default_port,
+                    self.timeout, address)
+                self.__open[key] = self.__open.get(key, 0) + 1
+                self.created += 1
+            elif idle:
+                # Every connection is taken, close an idle one to make way
+                self.__discard(key, idle.pop()[0])
+                continue
+            else:
+                return
+
+            exchange = waiting.popleft()
+            self.__busy[connection] = (key, exchange)
+            scheme, netloc, path, query, fragment = urlparse.urlsplit(exchange.url)
+            if query:
+                path += "?" + query
+            try:
+                connection.start(exchange.verb, path or "/", exchange.headers, exchange.body)
+            except Exception:
+                self.__fail(connection, sys.exc_info())
+        if waiting is not None and not waiting and self.__waiting.get(key) is waiting:
+            del self.__waiting[key]
+
+    def __get_address(self, key, host, port):
+        address, resolved_at = self.__addresses.get(key, (None, None))
+        if (address is None or time.time() - resolved_at >= ADDRESS_TTL) and key not in self.__resolving:
+            self.__resolving.add(key)
+            thread = threading.Thread(target=self.__resolve, args=(key, host, port), name="gnip-resolver")
+            thread.setDaemon(True)
+            thread.start()
+        return address
+
+    def __resolve(self, key, host, port):
+        # Runs on a helper thread, as getaddrinfo() can take seconds
+        try:
+            address, exc_info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0], None
+        except Exception:
+            address, exc_info = None, sys.exc_info()
+        try:
+            self.call_soon(self.__resolved, key, address, exc_info)
+        except ValueError:
+            # The loop has been closed, and its requests cancelled
+            pass
+
+    def __resolved(self, key, address, exc_info):
+        self.__resolving.discard(key)
+        if exc_info is None:
+            self.__addresses[key] = (address, time.time())
+        elif key in self.__addresses:
+            # Carry on with the old address, and try again later
+            self.__addresses[key] = (self.__addresses[key][0], time.time())
+        else:
+            # There is nothing to connect to, so the waiting requests fail
+            for exchange in self.__waiting.pop(key, ()):
+                self.__invoke(exchange.callback, (None, None, exc_info))
+            return
+        self.__dispatch(key)
+
+    def __progress(self, connection, step):
+        try:
+            complete = step()
+        except Exception:
+            self.__fail(connection, sys.exc_info())
+            return
+        if complete:
+            self.__complete(connection)
+
+    def __complete(self, connection):
+        key, exchange = self.__busy.pop(connection)
+        resp, content = connection.response, connection.content
+        if connection.reusable:
+            self.__idle.setdefault(key, []).append((connection, time.time()))
+        else:
+            self.__discard(key, connection)
+        if not self.__follow_redirect(exchange, resp):
+            self.__invoke(exchange.callback, (resp, content, None))
+        self.__dispatch(key)
+
+    def __fail(self, connection, exc_info):
+        key, exchange = self.__busy.pop(connection)
+        reused = connection.requests > 1
+        received = connection.received
+        self.__discard(key, connection)
+        if reused and not received and not exchange.fresh_connection and \
+                self.__is_stale_error(exc_info[1]) and is_idempotent(exchange.verb, exchange.url):
+            # The server closed the idle connection, try once more on a new one
+            exchange.fresh_connection = True
+            self.__queue(exchange, True)
+            return
+        self.__invoke(exchange.callback, (None, None, exc_info))
+        self.__dispatch(key)
+
+    def __follow_redirect(self, exchange, resp):
+        if resp.status not in REDIRECT_CODES or exchange.redirects >= self.max_redirects or \
+                not resp.get("location"):
+            return False
+        dropped = ()
+        if resp.status == 303:
+            exchange.verb, exchange.body = "GET", None
+            # The GET has no body, so it mustn't be labelled as having one
+            dropped = BODY_HEADERS
+        elif exchange.verb not in ("GET", "HEAD"):
+            return False
+        location = urlparse.urljoin(exchange.url, resp["location"])
+        if urlparse.urlsplit(location)[:2] != urlparse.urlsplit(exchange.url)[:2]:
+            # Don't send the credentials on to another host
+            dropped += ("authorization",)
+        if dropped and exchange.headers:
+            exchange.headers = dict([(name, value) for name, value in exchange.headers.items()
+                if name.lower() not in dropped])
+        exchange.url = location
+        exchange.redirects += 1
+        exchange.fresh_connection = False
+        self.__queue(exchange)
+        return True
+
+    def __is_stale_error(self, e):
+        if isinstance(e, httplib.BadStatusLine):
+            return True
+        return isinstance(e, socket.error) and e.args and e.args[0] in (errno.ECONNRESET, errno.EPIPE)
+
+    def __check_deadlines(self):
+        now = time.time()
+        for connection in self.__busy.keys():
+            if connection.deadline is not None and connection.deadline <= now:
+                try:
+                    raise socket.timeout("timed out")
+                except socket.timeout:
+                    self.__fail(connection, sys.exc_info())
+
+    def __evict_idle(self):
+        now = time.time()
+        for key, idle in self.__idle.items():
+            for connection, last_used in idle[:]:
+                if now - last_used > self.idle_timeout:
+                    idle.remove((connection, last_used))
+                    self.__discard(key, connection)
+
+    def __remove_idle(self, connection):
+        for key, idle in self.__idle.items():
+            for entry in idle:
+                if entry[0] is connection:
+                    idle.remove(entry)
+                    self.__discard(key, connection)
+                    self.__dispatch(key)
+                    return
+
+    def __discard(self, key, connection):
+        self.__open[key] -= 1
+        self.discarded += 1
+        connection.close()
+
+    def __cancel(self, exchange):
+        try:
+            raise workers.CancelledError("The event loop was closed")
+        except workers.CancelledError:
+            self.__invoke(exchange.callback, (None, None, sys.exc_info()))
+
+    def __shutdown(self):
+        for key, idle in self.__idle.items():
+            for connection, last_used in idle:
+                self.__discard(key, connection)
+        self.__idle = {}
+        cancelled = [exchange for key, exchange in self.__busy.values()]
+        for connection, (key, exchange) in self.__busy.items():
+            self.__discard(key, connection)
+        self.__busy = {}
+        for waiting in self.__waiting.values():
+            cancelled.extend(waiting)
+        self.__waiting = {}
+        for exchange in cancelled:
+            self.__cancel(exchange)
+
+        # Calls and retries still waiting to run are run now, so that the
+        # requests they make fail rather than never finishing
+        while self.__calls or self.__timers:
+            self.__lock.acquire()
+            try:
+                calls, self.__calls = self.__calls, collections.deque()
+            finally:
+                self.__lock.release()
+            for function, args in calls:
+                self.__invoke(function, args)
+            timers, self.__timers = self.__timers, []
+            for when, count, function, args in sorted(timers):
+                self.__invoke(function, args)
+
+        self.__lock.acquire()
+        try:
+            os.close(self.__wake_reader)
+            os.close(self.__wake_writer)
+        finally:
+            self.__lock.release()
+
+class PendingRequest(object):
+    """A request made by AsyncGnip, through each of its attempts."""
+
+    def __init__(self, future, url, verb, headers, body, data_size, parse):
+        self.future = future
+        self.url = url
+        self.verb = verb
+        self.headers = headers
+        self.body = body
+        self.data_size = data_size
+        self.parse = parse
+        self.attempt = 0
+        self.breaker = None
+        self.started = None
+
+class AsyncGnip(object):
+    """Makes Gnip requests without a thread per request.
+
+    Has the request methods of Gnip, with the same arguments, but each
+    returns a workers.Future at once. The Future holds the value the Gnip
+    method returns, a Response of Activities, Filter, Publisher, Result or
+    Error, or raises its exception from result(). All the requests are
+    multiplexed by one event loop thread over at most gnip.pool.max.size
+    persistent connections to each host, so a single process can keep
+    hundreds of bucket fetches in flight:
+
+        futures = [gnip.get_filter_activities("gnip", "digg", "f", minute)
+                   for minute in minutes]
+        for future in workers.as_completed(futures):
+            response = future.result()
+
+    Settings, retries, circuit breakers, request compression, gzip
+    responses, clock synchronisation, duplicate removal and instrumentation
+    work as they do for Gnip. The bucket getters don't stream, and there is
+    no bucket cache or sync_filter_rules; the *_range and get_filters_*
+    methods are replaced by submitting each bucket and waiting on the
+    Futures. Responses are decoded and parsed by gnip.bucket.workers
+    threads, leaving the loop's thread free to move bytes. Callbacks added
+    to the Futures run on those threads, or on the loop's thread if the
+    request fails, and must not block.
+
+    """
+
+    def __init__(self, username, password, gnip_server=None, config=None, dedup=None, **overrides):
+        """Initialize the class.
+
+        Takes the same arguments as Gnip.
+        """
+
+        if config is None:
+            config = get_config()
+        if overrides:
+            config = config.override(**overrides)
+        self.config = config
+
+        if gnip_server is None:
+            self.base_url = config['gnip.server']
+        else:
+            self.base_url = gnip_server
+        self.tunnel_over_post = config.get_bool('gnip.tunnel.over.post')
+
+        self.clock = clock.ClockOffset(ttl=config.get_float('gnip.clock.ttl', clock.DEFAULT_TTL),
+            drift_tolerance=config.get_float('gnip.clock.drift.tolerance', clock.DEFAULT_DRIFT_TOLERANCE))
+
+        self.username = username
+        self.authorization = "Basic " + base64.b64encode(username + ":" + password)
+
+        # Every request is made by this loop, on its thread
+        self.loop = EventLoop(max_size=config.get_int('gnip.pool.max.size', 10),
+            idle_timeout=config.get_float('gnip.pool.idle.timeout', 60),
+            timeout=config.get_int('gnip.http.timeout'))
+
+        self.compressor = compression.Compressor(level=config.get_int('gnip.gzip.level', 9),
+            min_size=config.get_int('gnip.gzip.min.size', 0),
+            adaptive=config.get_bool('gnip.gzip.adaptive'),
+            sample_min_size=config.get_int('gnip.gzip.sample.min.size', compression.DEFAULT_SAMPLE_MIN_SIZE))
+
+        # Retries wait on the loop's timers rather than sleeping
+        self.retry_policy = retry.RetryPolicy(max_retries=config.get_int('gnip.retry.max', 3),
+            backoff=config.get_float('gnip.retry.backoff', 0.5),
+            max_backoff=config.get_float('gnip.retry.max.backoff', 30),
+            max_retry_after=config.get_float('gnip.retry.max.after', 120),
+            retry_posts=config.get_bool('gnip.retry.posts'),
+            failure_threshold=config.get_int('gnip.breaker.threshold', 5),
+            reset_timeout=config.get_float('gnip.breaker.reset', 30),
+            server_clock=self.clock)
+
+        self.__owns_dedup = dedup is None and config.get_bool('gnip.dedup.enabled')
+        if self.__owns_dedup:
+            import dedup as dedup_module
+            self.dedup = dedup_module.DedupStore(
+                window=config.get_int('gnip.dedup.window', dedup_module.DEFAULT_WINDOW),
+                bloom_bits=config.get_int('gnip.dedup.bloom.bits', dedup_module.DEFAULT_BLOOM_BITS),
+                path=config['gnip.dedup.path'] or None)
+        else:
+            self.dedup = dedup
+
+        self.lazy_activities = config.get_bool('gnip.activities.lazy')
+
+        self.instrumentation = None
+        self.__instrumentation_lock = threading.Lock()
+
+        self.decompressor = compression.Decompressor()
+
+        # Started with the first response to parse
+        self.parse_workers = config.get_int('gnip.bucket.workers', 8)
+        self.__parse_pool = None
+        self.__parse_lock = threading.Lock()
+        self.__closed = False
+
+        # Requests waiting for the server clock offset to be measured
+        self.__clock_waiters = []
+
+        self.headers = {}
+        self.headers['Accept'] = 'application/xml'
+        self.headers['User-Agent'] = 'Gnip-Client-Python/2.1.0'
+
+    def close(self):
+        """Stop the event loop and release this instance's resources.
+
+        Requests still in progress fail with workers.CancelledError. A
+        DedupStore created for this instance is saved as by Gnip.close().
+        """
+
+        self.loop.close()
+        self.__parse_lock.acquire()
+        try:
+            self.__closed = True
+            if self.__parse_pool is not None:
+                # Responses already handed over are still parsed
+                self.__parse_pool.shutdown(wait=False)
+        finally:
+            self.__parse_lock.release()
+        if self.__owns_dedup and self.dedup.path:
+            self.dedup.save()
+
+    def get_pool_stats(self):
+        """Return the event loop's request and connection counts, see EventLoop.get_stats."""
+
+        return self.loop.get_stats()
+
+    def get_clock_stats(self):
+        """Return metrics about the cached server clock offset."""
+
+        return self.clock.get_stats()
+
+    def get_compression_stats(self):
+        """Return metrics about request body compression."""
+
+        return self.compressor.get_stats()
+
+    def get_decompression_stats(self):
+        """Return metrics about response body decompression."""
+
+        return self.decompressor.get_stats()
+
+    def get_retry_stats(self):
+        """Return counts of retries and circuit breaker activity."""
+
+        return self.retry_policy.get_stats()
+
+    def add_instrumentation_sink(self, sink):
+        """Register a sink to receive a RequestEvent for every request, and
+        a ParseEvent for every response parsed. Sinks are called on the
+        loop's thread for failed requests, otherwise on a parsing thread.
+        """
+
+        self.__instrumentation_lock.acquire()
+        try:
+            if self.instrumentation is None:
+                import instrumentation
+                self.instrumentation = instrumentation.Instrumentation()
+            self.instrumentation.add_sink(sink)
+        finally:
+            self.__instrumentation_lock.release()
+
+    def remove_instrumentation_sink(self, sink):
+        """Stop passing events to a sink."""
+
+        if self.instrumentation is not None:
+            self.instrumentation.remove_sink(sink)
+
+    def publish_activities(self, publisher_name, activities):
+        """Publish activities, see Gnip.publish_activities.
+
+        @return Future of the Response
+        """
+
+        url_path = "/my/publishers/" + publisher_name + "/activity.xml"
+        return self.__request("POST", url_path, activities.to_xml(), self.__parse_response)
+
+    def create_filter(self, publisher_scope, publisher_name, filter):
+        """Create a Filter, see Gnip.create_filter.
+
+        @return Future of the Response
+        """
+
+        url_path = "/" + publisher_scope + "/publishers/" + publisher_name + "/filters.xml"
+        return self.__request("POST", url_path, xml_writer.iter_filter_xml(filter), self.__parse_response)
+
+    def add_rule_to_filter(self, publisher_scope, publisher_name, filter_name, rule):
+        """Add a rule to a Filter, see Gnip.add_rule_to_filter.
+
+        @return Future of the Response
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, filter_name) + "/rules.xml"
+        return self.__request("POST", url_path, rule.to_xml(), self.__parse_response)
+
+    def add_rules_to_filter(self, publisher_scope, publisher_name, filter_name, rules):
+        """Add rules to a Filter in one request, see Gnip.add_rules_to_filter.
+
+        @return Future of the Response
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, filter_name) + "/rules.xml"
+        return self.__request("POST", url_path, xml_writer.iter_rules_xml(rules), self.__parse_response)
+
+    def remove_rule_from_filter(self, publisher_scope, publisher_name, filter_name, rule):
+        """Remove a rule from a Filter, see Gnip.remove_rule_from_filter.
+
+        @return Future of the Response
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, filter_name) + "/rules"
+        return self.__delete(url_path, self.__parse_response, rule.to_delete_query_string())
+
+    def rule_exists_in_filter(self, publisher_scope, publisher_name, filter_name, rule):
+        """Determine whether a rule exists in a Filter, see Gnip.rule_exists_in_filter.
+
+        @return Future of True, False, or None if it can't be determined
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, filter_name) + "/rules?" + \
+            rule.to_delete_query_string()
+        return self.__request("GET", url_path, None, self.__parse_rule_exists)
+
+    def delete_filter(self, publisher_scope, publisher_name, name):
+        """Delete a Filter, see Gnip.delete_filter.
+
+        @return Future of the Response
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, name) + ".xml"
+        return self.__delete(url_path, self.__parse_response)
+
+    def find_filter(self, publisher_scope, publisher_name, name):
+        """Get a Filter, see Gnip.find_filter.
+
+        @return Future of the Response of a Filter
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, name) + ".xml"
+        return self.__request("GET", url_path, None, self.__parser(filter.Filter))
+
+    def update_filter(self, publisher_scope, publisher_name, filter):
+        """Update a Filter, see Gnip.update_filter.
+
+        @return Future of the Response
+        """
+
+        url_path = self.__filter_path(publisher_scope, publisher_name, filter.name) + ".xml"
+        return self.__put(url_path, xml_writer.iter_filter_xml(filter), self.__parse_response)
+
+    def get_publisher_activities(self, publisher_scope, publisher_name, date_time=None, dedup=None):
+        """Get a publisher's activity bucket, see Gnip.get_publisher_activities.
+
+        @return Future of the Response of Activities
+        """
+
+        return self.__get_bucket(publisher_scope, publisher_name, None, "activity", date_time, dedup)
+
+    def get_filter_activities(self, publisher_scope, publisher_name, name, date_time=None, dedup=None):
+        """Get a Filter's activity bucket, see Gnip.get_filter_activities.
+
+        @return Future of the Response of Activities
+        """
+
+        return self.__get_bucket(publisher_scope, publisher_name, name, "activity", date_time, dedup)
+
+    def get_publisher_notifications(self, publisher_scope, publisher_name, date_time=None, dedup=None):
+        """Get a publisher's notification bucket, see Gnip.get_publisher_notifications.
+
+        @return Future of the Response of Activities
+        """
+
+        return self.__get_bucket(publisher_scope, publisher_name, None, "notification", date_time, dedup)
+
+    def get_filter_notifications(self, publisher_scope, publisher_name, name, date_time=None, dedup=None):
+        """Get a Filter's notification bucket, see Gnip.get_filter_notifications.
+
+        @return Future of the Response of Activities
+        """
+
+        return self.__get_bucket(publisher_scope, publisher_name, name, "notification", date_time, dedup)
+
+    def create_publisher(self, publisher):
+        """Create a publisher in the "my" scope, see Gnip.create_publisher.
+
+        @return Future of the Response
+        """
+
+        return self.__request("POST", "/my/publishers", publisher.to_xml(), self.__parse_response)
+
+    def get_publisher(self, scope, name):
+        """Get a publisher, see Gnip.get_publisher.
+
+        @return Future of the Response of a Publisher
+        """
+
+        url_path = "/" + scope + "/publishers/" + name + ".xml"
+        return self.__request("GET", url_path, None, self.__parser(publisher.Publisher))
+
+    def update_publisher(self, publisher):
+        """Update a publisher, see Gnip.update_publisher.
+
+        @return Future of the Response
+        """
+
+        url_path = "/my/publishers/" + publisher.name + ".xml"
+        return self.__put(url_path, publisher.to_xml(), self.__parse_response)
+
+    def __filter_path(self, publisher_scope, publisher_name, filter_name):
+        return "/" + publisher_scope + "/publishers/" + publisher_name + "/filters/" + filter_name
+
+    def __get_bucket(self, publisher_scope, publisher_name, filter_name, bucket_type, date_time, dedup):
+        prefix = "/" + publisher_scope + "/publishers/" + publisher_name
+        if filter_name is not None:
+            prefix += "/filters/" + filter_name
+        prefix += "/" + bucket_type + "/"
+        parse = lambda resp, content: self.__parse_activities_response(resp, content, dedup)
+        if date_time is None:
+            return self.__request("GET", prefix + "current.xml", None, parse)
+
+        future = workers.Future()
+        def fetch(offset):
+            bucket_time = date_time + datetime.timedelta(seconds=offset)
+            self.__request("GET", prefix + bucket_time.strftime("%Y%m%d%H%M") + ".xml", None, parse, future)
+        self.loop.call_soon(self.__with_clock_offset, future, fetch)
+        return future
+
+    def __with_clock_offset(self, future, then):
+        # Runs then(offset) once the offset is known, measuring it with
+        # one HEAD request however many buckets are waiting for it
+        if not self.clock.is_stale():
+            then(self.clock.offset)
+            return
+        self.__clock_waiters.append((future, then))
+        if len(self.__clock_waiters) == 1:
+            self.__request("HEAD", "", None, None, workers.Future()).add_done_callback(self.__clock_measured)
+
+    def __clock_measured(self, head):
+        waiters, self.__clock_waiters = self.__clock_waiters, []
+        try:
+            resp, content = head.result()
+            received_at = time.time()
+            if resp.elapsed is None or clock.parse_http_date(resp.get("date")) is None:
+                # Rejected by the HEAD's circuit breaker, or a proxy's error
+                self.clock.record_failure()
+            else:
+                self.clock.record(resp.get("date"), received_at - resp.elapsed, received_at)
+        except Exception:
+            exc_info = sys.exc_info()
+            for future, then in waiters:
+                future.set_exc_info(exc_info)
+            return
+        offset = self.clock.get_last_offset()
+        for future, then in waiters:
+            try:
+                then(offset)
+            except Exception:
+                future.set_exc_info(sys.exc_info())
+
+    def __put(self, url_path, data, parse):
+        if self.tunnel_over_post:
+            return self.__request("POST", url_path + ";edit", data, parse)
+        return self.__request("PUT", url_path, data, parse)
+
+    def __delete(self, url_path, parse, query_string=None):
+        if self.tunnel_over_post:
+            url_path += ";delete"
+            verb = "POST"
+        else:
+            verb = "DELETE"
+        if query_string is not None:
+            url_path += "?" + query_string
+        return self.__request(verb, url_path, " ", parse)
+
+    def __request(self, verb, url_path, data, parse, future=None):
+        # Prepares the request on the calling thread, then starts it on
+        # the loop's; parse(resp, content) gives the Future's result, or
+        # without a parse function it is the response and content
+        if future is None:
+            future = workers.Future()
+        url = self.base_url + url_path
+        if data is None:
+            body, compressed, data_size = None, False, 0
+        else:
+            body, compressed, data_size = self.compressor.compress_chunks(data)
+        headers = dict(self.headers)
+        headers['Authorization'] = self.authorization
+        if verb == "GET" or verb == "HEAD":
+            headers['Accept-Encoding'] = 'gzip'
+        if body is not None:
+            headers['Content-Type'] = 'application/xml'
+            if compressed:
+                headers['Content-Encoding'] = 'gzip'
+        request = PendingRequest(future, url, verb, headers, body, data_size, parse)
+        self.loop.call_soon(self.__start, request)
+        return future
+
+    def __start(self, request):
+        request.started = time.time()
+        request.breaker = self.retry_policy.get_breaker(request.verb + " " + retry.endpoint_template(request.url))
+        if not request.breaker.allow():
+            resp, content = self.retry_policy.reject(request.verb, request.url)
+            self.__finish(request, resp, content)
+            return
+        self.__attempt(request)
+
+    def __attempt(self, request):
+        self.loop.request(request.url, request.verb, request.headers, request.body,
+            lambda resp, content, exc_info: self.__attempted(request, resp, content, exc_info))
+
+    def __attempted(self, request, resp, content, exc_info):
+        if exc_info is None:
+            if request.body:
+                self.compressor.observe_upload(len(request.body), resp.send_time)
+            received_at = time.time()
+            self.clock.observe(resp.get("date"), received_at - resp.elapsed, received_at)
+            delay = self.retry_policy.next_delay(request.verb, request.url, request.attempt, request.breaker, resp)
+            if delay is None:
+                self.__finish(request, resp, content)
+                return
+        elif issubclass(exc_info[0], (socket.error, httplib.HTTPException)):
+            delay = self.retry_policy.next_delay(request.verb, request.url, request.attempt, request.breaker)
+            if delay is None:
+                self.__fail(request, exc_info)
+                return
+        else:
+            # Ends a half open breaker's trial, which would otherwise run forever
+            request.breaker.record_failure()
+            self.__fail(request, exc_info)
+            return
+        request.attempt += 1
+        self.loop.call_later(delay, self.__attempt, request)
+
+    def __fail(self, request, exc_info):
+        # Failures are the requests most worth reporting
+        if self.instrumentation is not None and self.instrumentation.sinks:
+            self.instrumentation.emit_request(retry.endpoint_template(request.url), request.verb, None,
+                bytes_out=len(request.body or ""), uncompressed_out=request.data_size,
+                total_time=time.time() - request.started, error=exc_info[0].__name__)
+        request.future.set_exc_info(exc_info)
+
+    def __finish(self, request, resp, content):
+        if request.parse is None:
+            # Only the clock's HEAD, which has no body to decode
+            self.__complete(request, resp, content)
+            return
+        self.__parse_lock.acquire()
+        try:
+            if not self.__closed:
+                if self.__parse_pool is None:
+                    self.__parse_pool = workers.WorkerPool(self.parse_workers)
+                self.__parse_pool.submit(self.__complete, request, resp, content)
+                return
+        finally:
+            self.__parse_lock.release()
+        self.__complete(request, resp, content)
+
+    def __complete(self, request, resp, content):
+        try:
+            wire_size = len(content)
+            encoding = resp.get("content-encoding")
+            if encoding == "gzip":
+                # The content is no longer encoded once it has been decompressed
+                del resp["content-encoding"]
+            content = self.decompressor.decode(content, encoding)
+            if self.instrumentation is not None and self.instrumentation.sinks:
+                resp.event = self.instrumentation.emit_request(retry.endpoint_template(request.url),
+                    request.verb, resp.status, bytes_out=len(request.body or ""),
+                    uncompressed_out=request.data_size, bytes_in=wire_size, uncompressed_in=len(content),
+                    ttfb=resp.ttfb, total_time=time.time() - request.started)
+            if request.parse is None:
+                result = (resp, content)
+            else:
+                result = request.parse(resp, content)
+        except Exception:
+            request.future.set_exc_info(sys.exc_info())
+            return
+        request.future.set_result(result)
+
+    def __parser(self, model_class):
+        return lambda resp, content: self.__parse_response(resp, content, model_class())
+
+    def __parse_response(self, resp, content, data_object=None):
+        parse_started = time.time()
+        if resp.status == 200:
+            if data_object is None:
+                data_object = Result()
+            data_object.from_xml(content)
+            parsed = Response(resp.status, data_object)
+        else:
+            logging.info("Parsing error from XML: " + content)
+            error = Error()
+            error.from_xml(content)
+            parsed = Response(resp.status, error)
+        if resp.event is not None:
+            self.instrumentation.emit_parse(resp.event.endpoint, resp.event.verb, time.time() - parse_started)
+        return parsed
+
+    def __parse_activities_response(self, resp, content, dedup):
+        if dedup is None:
+            dedup = self.dedup
+        elif dedup is False:
+            dedup = None
+        parsed = self.__parse_response(resp, content, activities.Activities(lazy=self.lazy_activities))
+        if dedup is not None and parsed.code == 200:
+            parsed.result.items = dedup.filter(parsed.result.items)
+        return parsed
+
+    def __parse_rule_exists(self, resp, content):
+        if resp.status == 200:
+            return True
+        elif resp.status == 404:
+            return False
+        else:
+            return None
@@ -0,0 +1,271 @@
+import time
+import threading
+import Queue
+import workers
+from response import Response
+from xml_objects import Error
+
+class Chunk(object):
+    """A batch of Activities published in a single request.
+
+    activities: list of the Activity objects in the chunk
+    size:       the number of bytes of serialized activity XML
+
+    """
+
+    def __init__(self):
+        self.activities = []
+        self.size = 0
+        self.__xml = []
+
+    def add(self, an_activity, xml):
+        self.activities.append(an_activity)
+        self.__xml.append(xml)
+        self.size += len(xml)
+
+    def __len__(self):
+        return len(self.activities)
+
+    def to_xml(self):
+        return '<?xml version="1.0" encoding="UTF-8"?><activities>' + "".join(self.__xml) + '</activities>'
+
+class BatchPublisher(object):
+    """Publishes Activities to a Publisher in automatically sized batches.
+
+    Activities may be added from any number of threads. They are grouped
+    into chunks of at most max_chunk_bytes of XML and max_chunk_count
+    activities, and up to in_flight chunks are compressed and posted at
+    once on worker threads. When the queue of unsent activities is full,
+    publish() blocks until there is room.
+
+    """
+
+    FLUSH = object()
+    STOP = object()
+
+    def __init__(self, gnip, publisher_name, max_chunk_bytes=1024 * 1024, max_chunk_count=1000,
+                 in_flight=4, queue_size=10000, flush_interval=None, on_success=None, on_failure=None):
+        """Initialize the class.
+
+        @type gnip Gnip
+        @param gnip The Gnip connection to publish with
+        @type publisher_name string
+        @param publisher_name The publisher to receive the activities. You
+            must be the owner of the publisher.
+        @type max_chunk_bytes int
+        @param max_chunk_bytes The most activity XML sent in one request
+        @type max_chunk_count int
+        @param max_chunk_count The most activities sent in one request
+        @type in_flight int
+        @param in_flight The number of requests sent concurrently
+        @type queue_size int
+        @param queue_size The number of activities that may wait to be sent
+        @type flush_interval float
+        @param flush_interval Seconds after which a partial chunk is sent,
+            None to wait until the chunk is full
+        @type on_success callable
+        @param on_success Called with the Chunk and Response of each
+            successful request
+        @type on_failure callable
+        @param on_failure Called with the Chunk and Response of each failed
+            request. The Response code is None if the request raised an
+            exception.
+
+        """
+
+        self.gnip = gnip
+        self.publisher_name = publisher_name
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_chunk_count = max_chunk_count
+        self.flush_interval = flush_interval
+        self.on_success = on_success
+        self.on_failure = on_failure
+
+        self.published = 0
+        self.failed = 0
+        self.chunks_sent = 0
+        self.chunks_failed = 0
+
+        self.__queue = Queue.Queue(queue_size)
+        self.__senders = workers.WorkerPool(in_flight)
+        self.__slots = threading.Semaphore(in_flight)
+        self.__outstanding = 0
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__putting = 0
+        self.__chunker = threading.Thread(target=self.__run)
+        self.__chunker.setDaemon(True)
+        self.__chunker.start()
+
+    def publish(self, an_activity, block=True, timeout=None):
+        """Queue an Activity to be published.
+
+        @type an_activity Activity
+        @param an_activity The activity to publish
+        @type block boolean
+        @param block Whether to wait for room in the queue
+        @type timeout float
+        @param timeout Seconds to wait for room, None to wait forever
+
+        Raises Queue.Full if there is no room in the queue, and ValueError
+        if the BatchPublisher has been closed.
+        """
+
+        self.__start_put()
+        try:
+            self.__queue.put((an_activity, an_activity.to_xml()), block, timeout)
+        finally:
+            self.__end_put()
+
+    def flush(self):
+        """Send any queued activities and wait until every request has completed.
+
+        Raises ValueError if the BatchPublisher has been closed.
+        """
+
+        self.__start_put()
+        try:
+            flushed = self.__put_flush()
+        finally:
+            self.__end_put()
+        self.__wait_for_flush(flushed)
+
+    def close(self):
+        """Flush the queued activities and stop the worker threads."""
+
+        # Once closed is set no more items are queued, and any being queued
+        # are waited for, so nothing can be queued after STOP
+        self.__condition.acquire()
+        try:
+            if self.__closed:
+                return
+            self.__closed = True
+            while self.__putting > 0:
+                self.__condition.wait()
+        finally:
+            self.__condition.release()
+
+        self.__wait_for_flush(self.__put_flush())
+        self.__queue.put((self.STOP, None))
+        self.__chunker.join()
+        self.__senders.shutdown()
+
+    def get_stats(self):
+        """Return a dictionary of activity and chunk counters."""
+
+        return {
+            'queued': self.__queue.qsize(),
+            'outstanding': self.__outstanding,
+            'published': self.published,
+            'failed': self.failed,
+            'chunks_sent': self.chunks_sent,
+            'chunks_failed': self.chunks_failed,
+        }
+
+    def __start_put(self):
+        self.__condition.acquire()
+        try:
+            if self.__closed:
+                raise ValueError("BatchPublisher is closed")
+            self.__putting += 1
+        finally:
+            self.__condition.release()
+
+    def __end_put(self):
+        self.__condition.acquire()
+        try:
+            self.__putting -= 1
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+    def __put_flush(self):
+        flushed = threading.Event()
+        self.__queue.put((self.FLUSH, flushed))
+        return flushed
+
+    def __wait_for_flush(self, flushed):
+        flushed.wait()
+        self.__condition.acquire()
+        try:
+            while self.__outstanding > 0:
+                self.__condition.wait()
+        finally:
+            self.__condition.release()
+
+    def __run(self):
+        chunk = Chunk()
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.time(), 0)
+            try:
+                item, xml = self.__queue.get(True, timeout)
+            except Queue.Empty:
+                item, xml = self.FLUSH, None
+
+            if item is self.FLUSH or item is self.STOP:
+                if len(chunk) > 0:
+                    self.__send(chunk)
+                    chunk = Chunk()
+                deadline = None
+                if xml is not None:
+                    xml.set()
+                if item is self.STOP:
+                    return
+                continue
+
+            if len(chunk) > 0 and chunk.size + len(xml) > self.max_chunk_bytes:
+                self.__send(chunk)
+                chunk = Chunk()
+            if len(chunk) == 0 and self.flush_interval is not None:
+                deadline = time.time() + self.flush_interval
+            chunk.add(item, xml)
+            if len(chunk) >= self.max_chunk_count:
+                self.__send(chunk)
+                chunk = Chunk()
+                deadline = None
+
+    def __send(self, chunk):
+        # Wait for a free slot, so a slow server holds up the producers
+        self.__slots.acquire()
+        self.__condition.acquire()
+        try:
+            self.__outstanding += 1
+        finally:
+            self.__condition.release()
+        self.__senders.submit(self.__post, chunk)
+
+    def __post(self, chunk):
+        try:
+            try:
+                response = self.gnip.publish_activities(self.publisher_name, chunk)
+            except Exception, e:
+                response = Response(None, Error(str(e)))
+
+            self.__condition.acquire()
+            try:
+                if response.code == 200:
+                    self.chunks_sent += 1
+                    self.published += len(chunk)
+                else:
+                    self.chunks_failed += 1
+                    self.failed += len(chunk)
+            finally:
+                self.__condition.release()
+
+            if response.code == 200:
+                callback = self.on_success
+            else:
+                callback = self.on_failure
+            if callback is not None:
+                callback(chunk, response)
+        finally:
+            self.__slots.release()
+            self.__condition.acquire()
+            try:
+                self.__outstanding -= 1
+                self.__condition.notifyAll()
+            finally:
+                self.__condition.release()
@@ -0,0 +1,212 @@
+import os
+import re
+import threading
+import collections
+import gzip
+import hashlib
+import calendar
+import tempfile
+
+BUCKET_PATTERN = re.compile(r"/(activity|notification)/(\d{12})\.xml$")
+
+class BucketCache(object):
+    """A size bounded on-disk cache of closed activity and notification buckets.
+
+    Once a minute bucket is in the past its content no longer changes, so
+    it can be kept locally and served without a request. Each bucket is
+    stored gzip compressed in its own file, named after a hash of its URL.
+    When the total size passes max_bytes the least recently used buckets
+    are deleted. current.xml, and buckets that closed less than
+    closed_after seconds ago, are never cached.
+
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, closed_after=120):
+        """Initialize the class.
+
+        @type directory string
+        @param directory The directory to keep cached buckets in
+        @type max_bytes int
+        @param max_bytes The maximum total size of the cached files
+        @type closed_after float
+        @param closed_after Seconds after the end of a bucket before it is cached
+
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.closed_after = closed_after
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        self.__index = None
+        self.__size = 0
+
+    def is_cacheable(self, url, server_time):
+        """Determine whether a URL is a bucket that has closed.
+
+        @type url string
+        @param url The bucket URL
+        @type server_time float
+        @param server_time The current server time in seconds since the epoch
+        @return boolean
+        """
+
+        match = BUCKET_PATTERN.search(url)
+        if match is None:
+            return False
+        stamp = match.group(2)
+        bucket_start = calendar.timegm((int(stamp[0:4]), int(stamp[4:6]), int(stamp[6:8]),
+            int(stamp[8:10]), int(stamp[10:12]), 0, 0, 0, 0))
+        return bucket_start + 60 + self.closed_after <= server_time
+
+    def get(self, key):
+        """Return the cached content for a key, or None.
+
+        @type key string
+        @param key The cache key, typically the bucket URL
+        """
+
+        self.__lock.acquire()
+        try:
+            self.__load_index()
+            name = self.__file_name(key)
+            if name not in self.__index:
+                self.misses += 1
+                return None
+            self.__index[name] = self.__index.pop(name)
+        finally:
+            self.__lock.release()
+
+        path = os.path.join(self.directory, name)
+        try:
+            zfile = gzip.open(path, "rb")
+            try:
+                content = zfile.read()
+            finally:
+                zfile.close()
+            os.utime(path, None)
+        except (IOError, OSError):
+            self.__lock.acquire()
+            try:
+                self.misses += 1
+                self.__forget(name)
+            finally:
+                self.__lock.release()
+            return None
+
+        self.__lock.acquire()
+        try:
+            self.hits += 1
+        finally:
+            self.__lock.release()
+        return content
+
+    def put(self, key, content):
+        """Store content for a key, evicting old entries if needed.
+
+        @type key string
+        @param key The cache key, typically the bucket URL
+        @type content string
+        @param content The uncompressed bucket content
+        """
+
+        name = self.__file_name(key)
+        path = os.path.join(self.directory, name)
+
+        self.__lock.acquire()
+        try:
+            self.__load_index()
+        finally:
+            self.__lock.release()
+
+        # Write to a temporary file and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            fileobj = os.fdopen(fd, "wb")
+            try:
+                zfile = gzip.GzipFile(filename=name, mode="wb", fileobj=fileobj)
+                zfile.write(content)
+                zfile.close()
+            finally:
+                fileobj.close()
+            os.rename(temp_path, path)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self.__lock.acquire()
+        try:
+            self.__forget(name, False)
+            size = os.path.getsize(path)
+            self.__index[name] = size
+            self.__size += size
+            while self.__size > self.max_bytes and len(self.__index) > 1:
+                oldest = iter(self.__index).next()
+                self.__forget(oldest)
+                self.evictions += 1
+        finally:
+            self.__lock.release()
+
+    def note_bypass(self):
+        """Count a request that was not eligible for caching."""
+
+        self.__lock.acquire()
+        try:
+            self.bypasses += 1
+        finally:
+            self.__lock.release()
+
+    def get_stats(self):
+        """Return a dictionary of cache counters, size and hit rate."""
+
+        self.__lock.acquire()
+        try:
+            lookups = self.hits + self.misses
+            if lookups:
+                hit_rate = float(self.hits) / lookups
+            else:
+                hit_rate = None
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'hit_rate': hit_rate,
+                'bytes': self.__size,
+            }
+        finally:
+            self.__lock.release()
+
+    def __file_name(self, key):
+        return hashlib.sha1(key).hexdigest() + ".xml.gz"
+
+    def __load_index(self):
+        if self.__index is not None:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".xml.gz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+        self.__index = collections.OrderedDict()
+        self.__size = 0
+        for mtime, name, size in entries:
+            self.__index[name] = size
+            self.__size += size
+
+    def __forget(self, name, remove_file=True):
+        size = self.__index.pop(name, None)
+        if size is not None:
+            self.__size -= size
+        if remove_file:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,190 @@
+import time
+import calendar
+import threading
+from rfc822 import parsedate
+
+DEFAULT_TTL = 300
+DEFAULT_DRIFT_TOLERANCE = 2.0
+
+def parse_http_date(date_header):
+    """Convert an HTTP Date header into seconds since the epoch.
+
+    @type date_header string
+    @param date_header The value of an HTTP Date header
+    @return float seconds since the epoch, None if the header can't be parsed
+
+    The Date header only has one second resolution, so half a second is
+    added to return the expected value of the server's actual clock.
+
+    """
+
+    if not date_header:
+        return None
+    parsed = parsedate(date_header)
+    if parsed is None:
+        return None
+    return calendar.timegm(parsed) + 0.5
+
+class ClockOffset(object):
+    """Tracks the difference between the local clock and the Gnip server clock.
+
+    The offset is measured once and reused until it is older than the
+    configured TTL, or until a Date header seen on a normal response
+    disagrees with the offset by more than the drift tolerance.
+
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, drift_tolerance=DEFAULT_DRIFT_TOLERANCE, timer=time.time):
+        """Initialize the class.
+
+        @type ttl float
+        @param ttl Seconds a measured offset stays valid
+        @type drift_tolerance float
+        @param drift_tolerance Seconds of disagreement allowed between the
+            offset and an observed Date header before re-measuring
+        @type timer callable
+        @param timer Returns the current local time in seconds
+
+        """
+
+        self.ttl = ttl
+        self.drift_tolerance = drift_tolerance
+        self.timer = timer
+        self.offset = None
+        self.measured_at = None
+        self.measurements = 0
+        self.failed_measurements = 0
+        self.drift_resyncs = 0
+        self.__stale = True
+        self.__lock = threading.Lock()
+
+    def get_offset(self, fetch_date):
+        """Return the server clock offset in seconds.
+
+        @type fetch_date callable
+        @param fetch_date Performs a request against the server and
+            returns the value of its Date header, or None if it has none
+        @return float seconds to add to local time to get server time
+
+        Measures the offset by calling fetch_date if there is no current
+        measurement, otherwise returns the cached value. If the response
+        has no usable Date header, as when a circuit breaker rejects the
+        request or a proxy answers it, the last offset measured is
+        returned, or 0 if there is none, and the next call measures again.
+
+        """
+
+        if self.is_stale():
+            self.__lock.acquire()
+            try:
+                if self.is_stale():
+                    self.__measure(fetch_date)
+            finally:
+                self.__lock.release()
+        return self.get_last_offset()
+
+    def get_last_offset(self):
+        """Return the last offset measured, stale or not, or 0 if there is none."""
+
+        if self.offset is None:
+            return 0.0
+        return self.offset
+
+    def is_stale(self):
+        """Return True if the offset needs to be measured again."""
+
+        if self.__stale or self.offset is None:
+            return True
+        return self.timer() - self.measured_at > self.ttl
+
+    def invalidate(self):
+        """Force the next call to get_offset to measure the offset again."""
+
+        self.__stale = True
+
+    def observe(self, date_header, sent_at, received_at):
+        """Check an observed server Date header against the current offset.
+
+        @type date_header string
+        @param date_header The Date header of a response
+        @type sent_at float
+        @param sent_at Local time the request was sent
+        @type received_at float
+        @param received_at Local time the response was received
+
+        Marks the offset stale if the server time implied by the header
+        is further from the expected value than the drift tolerance allows.
+
+        """
+
+        if self.offset is None:
+            return
+        server_time = parse_http_date(date_header)
+        if server_time is None:
+            return
+        expected = (sent_at + received_at) / 2.0 + self.offset
+        allowed = self.drift_tolerance + (received_at - sent_at) / 2.0
+        if abs(server_time - expected) > allowed:
+            self.drift_resyncs += 1
+            self.__stale = True
+
+    def get_age(self):
+        """Return the number of seconds since the offset was measured, or None."""
+
+        if self.measured_at is None:
+            return None
+        return self.timer() - self.measured_at
+
+    def get_stats(self):
+        """Return a dictionary of the current offset, its age and counters."""
+
+        return {
+            'offset': self.offset,
+            'age': self.get_age(),
+            'measurements': self.measurements,
+            'failed_measurements': self.failed_measurements,
+            'drift_resyncs': self.drift_resyncs,
+        }
+
+    def record(self, date_header, sent_at, received_at):
+        """Set the offset from the Date header of a request made to measure it.
+
+        @type date_header string
+        @param date_header The Date header of the response
+        @type sent_at float
+        @param sent_at Local time the request was sent
+        @type received_at float
+        @param received_at Local time the response was received
+
+        For callers that make the request themselves rather than through
+        get_offset(), such as AsyncGnip. Raises ValueError if the header
+        can't be parsed.
+
+        """
+
+        server_time = parse_http_date(date_header)
+        if server_time is None:
+            raise ValueError("Unable to parse server date: " + str(date_header))
+
+        # Assume the server stamped the response half way through the round trip
+        self.offset = server_time - (sent_at + received_at) / 2.0
+        self.measured_at = received_at
+        self.measurements += 1
+        self.__stale = False
+
+    def record_failure(self):
+        """Count a request made to measure the offset that got no usable Date.
+
+        The offset is left stale, so it is measured again next time.
+        """
+
+        self.failed_measurements += 1
+
+    def __measure(self, fetch_date):
+        sent_at = self.timer()
+        date_header = fetch_date()
+        received_at = self.timer()
+        if parse_http_date(date_header) is None:
+            self.record_failure()
+            return
+        self.record(date_header, sent_at, received_at)
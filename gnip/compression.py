@@ -0,0 +1,395 @@
+import time
+import zlib
+import threading
+import imports
+import StringIO
+
+ADAPTIVE_LEVELS = (1, 3, 6, 9)
+
+# Uploads smaller than this are not used to estimate bandwidth, as they fit
+# in the socket's send buffer and take no measurable time to send
+DEFAULT_SAMPLE_MIN_SIZE = 64 * 1024
+
+class Compressor(object):
+    """Gzip compresses request bodies.
+
+    Bodies shorter than min_size are sent as they are. In adaptive mode
+    the compression level is chosen per body to minimise the estimated
+    time to compress and upload it, using the measured speed and ratio of
+    each level and the measured upload bandwidth.
+
+    A Compressor may be shared between threads.
+
+    """
+
+    def __init__(self, level=9, min_size=0, adaptive=False, timer=time.time,
+                 sample_min_size=DEFAULT_SAMPLE_MIN_SIZE):
+        """Initialize the class.
+
+        @type level int
+        @param level The gzip compression level, 1 to 9
+        @type min_size int
+        @param min_size Bodies shorter than this many bytes are not compressed
+        @type adaptive boolean
+        @param adaptive Choose the level from measured compress and upload speeds
+        @type timer callable
+        @param timer Returns the current time in seconds
+        @type sample_min_size int
+        @param sample_min_size Uploads smaller than this many bytes are not
+            used to estimate the bandwidth
+
+        """
+
+        self.level = level
+        self.min_size = min_size
+        self.adaptive = adaptive
+        self.timer = timer
+        self.sample_min_size = sample_min_size
+        self.bandwidth = None
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.__speeds = {}
+        self.__ratios = {}
+        self.__lock = threading.Lock()
+
+    def compress(self, string):
+        """Compress a request body if it is large enough.
+
+        @type string string
+        @param string The body to compress
+        @return tuple of the body to send and whether it was compressed
+
+        """
+
+        if string is None or len(string) == 0:
+            return "", False
+        if len(string) < self.min_size:
+            self.__skip()
+            return string, False
+
+        level = self.choose_level(len(string))
+        started = self.timer()
+        zbuf = StringIO.StringIO()
+        zfile = imports.load("gzip").GzipFile(mode='wb', fileobj=zbuf, compresslevel=level)
+        zfile.write(string)
+        zfile.close()
+        compressed = zbuf.getvalue()
+        elapsed = self.timer() - started
+
+        self.__record(level, len(string), len(compressed), elapsed)
+        return compressed, True
+
+    def compress_chunks(self, chunks):
+        """Compress a request body given as a string or a series of strings.
+
+        @type chunks string or iterable of strings
+        @param chunks The body, or the pieces of it in order
+        @return tuple of the body to send, whether it was compressed and
+            the uncompressed size
+
+        Each piece is compressed as soon as it is produced, so the whole
+        uncompressed body is never held in memory unless it is shorter
+        than min_size.
+
+        """
+
+        if chunks is None or isinstance(chunks, basestring):
+            body, compressed = self.compress(chunks)
+            return body, compressed, len(chunks or "")
+        chunks = iter(chunks)
+
+        # Read up to min_size bytes to decide whether to compress
+        head = []
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size and size >= self.min_size:
+                break
+        else:
+            if size:
+                self.__skip()
+            return "".join(head), False, size
+
+        level = self.choose_level(size)
+        zbuf = StringIO.StringIO()
+        zfile = imports.load("gzip").GzipFile(mode='wb', fileobj=zbuf, compresslevel=level)
+        started = self.timer()
+        for chunk in head:
+            zfile.write(chunk)
+        elapsed = self.timer() - started
+
+        # Only time the compression, not the production of each piece
+        for chunk in chunks:
+            size += len(chunk)
+            started = self.timer()
+            zfile.write(chunk)
+            elapsed += self.timer() - started
+
+        started = self.timer()
+        zfile.close()
+        compressed = zbuf.getvalue()
+        elapsed += self.timer() - started
+
+        self.__record(level, size, len(compressed), elapsed)
+        return compressed, True, size
+
+    def choose_level(self, size):
+        """Return the compression level to use for a body of the given size.
+
+        @type size int
+        @param size The uncompressed body size in bytes
+        @return int compression level
+        """
+
+        if not self.adaptive:
+            return self.level
+
+        self.__lock.acquire()
+        try:
+            # Try each level once before relying on the measurements
+            for level in ADAPTIVE_LEVELS:
+                if level not in self.__speeds:
+                    return level
+            if not self.bandwidth:
+                return self.level
+
+            best_level = self.level
+            best_cost = None
+            for level in ADAPTIVE_LEVELS:
+                cost = size / self.__speeds[level] + size * self.__ratios[level] / self.bandwidth
+                if best_cost is None or cost < best_cost:
+                    best_level = level
+                    best_cost = cost
+            return best_level
+        finally:
+            self.__lock.release()
+
+    def observe_upload(self, size, elapsed):
+        """Record the time taken to upload a request body.
+
+        @type size int
+        @param size The number of bytes sent
+        @type elapsed float
+        @param elapsed Seconds taken to send the request, not including
+            the wait for the response
+
+        Uploads smaller than sample_min_size are ignored.
+
+        """
+
+        if size < max(self.sample_min_size, 1) or elapsed <= 0:
+            return
+        bandwidth = size / elapsed
+        self.__lock.acquire()
+        try:
+            if self.bandwidth is None:
+                self.bandwidth = bandwidth
+            else:
+                self.bandwidth = 0.8 * self.bandwidth + 0.2 * bandwidth
+        finally:
+            self.__lock.release()
+
+    def get_stats(self):
+        """Return a dictionary of compression counters and measurements."""
+
+        self.__lock.acquire()
+        try:
+            return {
+                'compressed': self.compressed,
+                'skipped': self.skipped,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'bandwidth': self.bandwidth,
+                'speeds': dict(self.__speeds),
+                'ratios': dict(self.__ratios),
+            }
+        finally:
+            self.__lock.release()
+
+    def __skip(self):
+        self.__lock.acquire()
+        try:
+            self.skipped += 1
+        finally:
+            self.__lock.release()
+
+    def __record(self, level, size_in, size_out, elapsed):
+        self.__lock.acquire()
+        try:
+            self.compressed += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+            if not self.adaptive:
+                return
+            speed = size_in / max(elapsed, 1e-6)
+            ratio = float(size_out) / size_in
+            if level in self.__speeds:
+                self.__speeds[level] = 0.8 * self.__speeds[level] + 0.2 * speed
+                self.__ratios[level] = 0.8 * self.__ratios[level] + 0.2 * ratio
+            else:
+                self.__speeds[level] = speed
+                self.__ratios[level] = ratio
+        finally:
+            self.__lock.release()
+
+class GzipStream(object):
+    """A file-like object that decompresses gzip data as it is read.
+
+    Only chunk_size bytes of compressed data are decompressed at a time,
+    so the whole decompressed document is never held in memory. Reading
+    raises IOError if the data ends before the end of the gzip stream, as
+    a truncated response does.
+
+    """
+
+    def __init__(self, data, chunk_size=64 * 1024, on_read=None):
+        """Initialize the class.
+
+        @type data string
+        @param data The gzip compressed data
+        @type chunk_size int
+        @param chunk_size Bytes of compressed data to decompress at a time
+        @type on_read callable
+        @param on_read Called with the number of decompressed bytes each
+            time data is read
+
+        """
+
+        self.chunk_size = chunk_size
+        self.on_read = on_read
+        self.__data = data
+        self.__offset = 0
+        self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.__buffer = ""
+        self.__finished = False
+
+    def read(self, size=-1):
+        pieces = [self.__buffer]
+        available = len(self.__buffer)
+        while (size < 0 or available < size) and not self.__finished:
+            piece = self.__inflate()
+            pieces.append(piece)
+            available += len(piece)
+        data = "".join(pieces)
+        if size < 0:
+            self.__buffer = ""
+        else:
+            data, self.__buffer = data[:size], data[size:]
+        if self.on_read is not None and data:
+            self.on_read(len(data))
+        return data
+
+    def close(self):
+        self.__data = ""
+        self.__buffer = ""
+        self.__finished = True
+
+    def __inflate(self):
+        if self.__offset >= len(self.__data):
+            self.__finished = True
+            if self.__data and not self.__at_end():
+                raise IOError("Truncated gzip data, the stream ended before its trailer")
+            return self.__decompressor.flush()
+        chunk = self.__data[self.__offset:self.__offset + self.chunk_size]
+        self.__offset += len(chunk)
+        piece = self.__decompressor.decompress(chunk)
+        unused = self.__decompressor.unused_data
+        if unused:
+            # Concatenated gzip members, start again on the next one
+            piece += self.__decompressor.flush()
+            self.__data = unused + self.__data[self.__offset:]
+            self.__offset = 0
+            self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return piece
+
+    def __at_end(self):
+        # zlib leaves any bytes after the end of a stream in unused_data,
+        # so a byte fed in after the trailer is left there, while one fed
+        # into an unfinished stream is consumed or rejected
+        try:
+            self.__decompressor.decompress("\0")
+        except zlib.error:
+            return False
+        return self.__decompressor.unused_data == "\0"
+
+class Decompressor(object):
+    """Decodes gzip compressed responses and counts the bytes saved.
+
+    A Decompressor may be shared between threads.
+
+    """
+
+    def __init__(self):
+        self.compressed = 0
+        self.plain = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.__lock = threading.Lock()
+
+    def decode(self, content, content_encoding):
+        """Return the decompressed content of a response.
+
+        @type content string
+        @param content The response body as received
+        @type content_encoding string
+        @param content_encoding The Content-Encoding header of the response
+        @return string
+        """
+
+        if content_encoding != "gzip":
+            self.observe_plain(content)
+            return content
+        return self.stream(content).read()
+
+    def stream(self, content):
+        """Return a GzipStream over a gzip compressed response body.
+
+        @type content string
+        @param content The response body as received
+        @return GzipStream
+        """
+
+        self.__lock.acquire()
+        try:
+            self.compressed += 1
+            self.bytes_in += len(content)
+        finally:
+            self.__lock.release()
+        return GzipStream(content, on_read=self.__count)
+
+    def observe_plain(self, content):
+        """Count a response that was not compressed."""
+
+        self.__lock.acquire()
+        try:
+            self.plain += 1
+            self.bytes_in += len(content)
+            self.bytes_out += len(content)
+        finally:
+            self.__lock.release()
+
+    def get_stats(self):
+        """Return a dictionary of response counts and bytes saved."""
+
+        self.__lock.acquire()
+        try:
+            return {
+                'compressed': self.compressed,
+                'plain': self.plain,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_out - self.bytes_in,
+            }
+        finally:
+            self.__lock.release()
+
+    def __count(self, size):
+        self.__lock.acquire()
+        try:
+            self.bytes_out += size
+        finally:
+            self.__lock.release()
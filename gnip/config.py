@@ -0,0 +1,170 @@
+import os
+import threading
+
+PROPERTIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gnip.properties")
+ENVIRONMENT_PREFIX = "GNIP_"
+
+class Config(object):
+    """An immutable set of Gnip settings.
+
+    Settings are named as in gnip.properties, e.g. "gnip.pool.max.size".
+    Looking up a setting that is not defined returns an empty string, as
+    pyjavaproperties does. Use override() to derive a Config with some
+    settings changed.
+
+    """
+
+    def __init__(self, settings=None):
+        """Initialize the class.
+
+        @type settings dict
+        @param settings The settings, keyed by property name
+
+        """
+
+        object.__setattr__(self, "_Config__settings", dict(settings or {}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config is immutable, use override()")
+
+    def __getitem__(self, name):
+        return self.__settings.get(name, "")
+
+    def __contains__(self, name):
+        return name in self.__settings
+
+    def __eq__(self, other):
+        return isinstance(other, Config) and self.items() == other.items()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Config(%r)" % self.__settings
+
+    def items(self):
+        """Return a sorted list of (name, value) pairs."""
+
+        return sorted(self.__settings.items())
+
+    def get(self, name, default=None):
+        """Return a setting as a string, or default if it is empty."""
+
+        value = self.__settings.get(name, "")
+        if value == "":
+            return default
+        return value
+
+    def get_int(self, name, default=None):
+        """Return a setting as an int, or default if it is empty."""
+
+        value = self.get(name)
+        if value is None:
+            return default
+        return int(value)
+
+    def get_float(self, name, default=None):
+        """Return a setting as a float, or default if it is empty."""
+
+        value = self.get(name)
+        if value is None:
+            return default
+        return float(value)
+
+    def get_bool(self, name, default=False):
+        """Return a setting as a boolean, or default if it is empty."""
+
+        value = self.get(name)
+        if value is None:
+            return default
+        return value.strip().lower() in ("true", "yes", "1")
+
+    def override(self, settings=None, **keywords):
+        """Return a new Config with some settings replaced.
+
+        @type settings dict
+        @param settings Settings keyed by property name
+        @param keywords Settings named without the "gnip." prefix and with
+            underscores for dots, e.g. pool_max_size=20 for gnip.pool.max.size
+        @return Config
+
+        Raises TypeError for a keyword that doesn't name a setting of this
+        Config, such as a misspelt one.
+
+        """
+
+        merged = dict(self.__settings)
+        if settings:
+            for name, value in settings.items():
+                merged[name] = to_property(value)
+        for keyword, value in keywords.items():
+            name = "gnip." + keyword.replace("_", ".")
+            if name not in self.__settings:
+                raise TypeError("unknown setting %r, no %s in gnip.properties" % (keyword, name))
+            merged[name] = to_property(value)
+        return Config(merged)
+
+def to_property(value):
+    """Convert a value to the string form used in gnip.properties."""
+
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+def load_config(path=PROPERTIES_FILE, environ=None):
+    """Read a Config from a properties file and the environment.
+
+    @type path string
+    @param path The properties file to read
+    @type environ dict
+    @param environ The environment, os.environ if None
+    @return Config
+
+    Environment variables starting with GNIP_ override the file, with
+    underscores standing for dots: GNIP_POOL_MAX_SIZE sets gnip.pool.max.size.
+    """
+
+    from pyjavaproperties import Properties
+
+    properties = Properties()
+    properties_file = open(path)
+    try:
+        properties.load(properties_file)
+    finally:
+        properties_file.close()
+    settings = dict(properties.getPropertyDict())
+
+    if environ is None:
+        environ = os.environ
+    for name, value in environ.items():
+        if name.startswith(ENVIRONMENT_PREFIX):
+            settings["gnip." + name[len(ENVIRONMENT_PREFIX):].lower().replace("_", ".")] = value
+    return Config(settings)
+
+_default = None
+_lock = threading.Lock()
+
+def get_config():
+    """Return the process wide Config, loading it on first use.
+
+    gnip.properties and the environment are read once per process; forked
+    children inherit the parsed Config.
+    """
+
+    global _default
+    if _default is None:
+        _lock.acquire()
+        try:
+            if _default is None:
+                _default = load_config()
+        finally:
+            _lock.release()
+    return _default
+
+def reset_config():
+    """Discard the process wide Config, so the next Gnip reloads it."""
+
+    global _default
+    _default = None
@@ -0,0 +1,319 @@
+import time
+import errno
+import select
+import threading
+import socket
+import httplib
+import urlparse
+
+# Requests that can be sent again without changing their effect
+IDEMPOTENT_VERBS = ("GET", "HEAD", "PUT", "DELETE")
+
+# Redirects followed for GET and HEAD requests; a 303 is followed for any
+# request, as a GET
+REDIRECT_CODES = (301, 302, 303, 307)
+
+# Headers describing a request body, lower cased
+BODY_HEADERS = ("content-type", "content-encoding", "content-length")
+
+def is_idempotent(verb, url):
+    """Determine whether a request can be sent again without changing its effect.
+
+    @type verb string
+    @param verb The HTTP method
+    @type url string
+    @param url The URL or path requested
+    @return boolean True for GET, HEAD, PUT and DELETE, and for a PUT or
+        DELETE tunnelled over POST with ;edit or ;delete
+    """
+
+    if verb in IDEMPOTENT_VERBS:
+        return True
+    path = urlparse.urlsplit(url)[2]
+    return path.endswith(";edit") or path.endswith(";delete")
+
+class HttpResponse(dict):
+    """Status and headers of an HTTP response.
+
+    status:  integer representing the response code
+    reason:  string representing the reason phrase
+    ttfb:    seconds from sending the request to receiving the response
+             headers, or None if the response did not come from the network
+    send_time: seconds taken to write the request and its body to the
+             connection, once connected, or None
+    elapsed: seconds from sending the request to reading the whole body,
+             or None
+    event:   the instrumentation.RequestEvent describing the request, if
+             any sinks are registered
+
+    Header values are available by their lower cased names.
+
+    """
+
+    ttfb = None
+    send_time = None
+    elapsed = None
+    event = None
+
+    def __init__(self, status, reason, headers):
+        dict.__init__(self, headers)
+        self.status = status
+        self.reason = reason
+
+class ConnectionPool(object):
+    """A thread safe pool of persistent HTTP and HTTPS connections.
+
+    Keeps up to max_size connections per host. Idle connections are
+    reused for later requests, unless they have been idle for longer than
+    idle_timeout or the server has closed them, in which case they are
+    discarded. If the server closes a reused connection just as a request
+    is sent, an idempotent request is sent once more on a new connection;
+    any other request raises the error, as the server may have acted on it.
+
+    Redirects of GET and HEAD requests are followed, up to max_redirects
+    in a row; other requests are redirected only by a 303, which is
+    followed with a GET. Any other redirect is returned as the response.
+
+    """
+
+    def __init__(self, max_size=10, idle_timeout=60, timeout=None, max_redirects=5):
+        """Initialize the class.
+
+        @type max_size int
+        @param max_size The maximum number of connections to each host
+        @type idle_timeout float
+        @param idle_timeout Seconds a connection may sit idle before it is closed
+        @type timeout float
+        @param timeout Socket timeout in seconds for each connection
+        @type max_redirects int
+        @param max_redirects The number of redirects followed for a request,
+            0 to return every redirect
+
+        """
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.__condition = threading.Condition()
+        self.__idle = {}
+        self.__in_use = {}
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def request(self, url, verb, headers=None, body=None):
+        """Perform an HTTP request on a pooled connection.
+
+        @type url string
+        @param url The absolute URL to request
+        @type verb string
+        @param verb The HTTP method
+        @type headers dictionary
+        @param headers Request headers
+        @type body string
+        @param body The request body, or None
+        @return tuple of HttpResponse and the response body
+
+        """
+
+        resp, content = self.__request(url, verb, headers, body)
+        redirects = 0
+        while resp.status in REDIRECT_CODES and redirects < self.max_redirects and resp.get("location"):
+            dropped = ()
+            if resp.status == 303:
+                verb, body = "GET", None
+                # The GET has no body, so it mustn't be labelled as having one
+                dropped = BODY_HEADERS
+            elif verb not in ("GET", "HEAD"):
+                break
+            location = urlparse.urljoin(url, resp["location"])
+            if urlparse.urlsplit(location)[:2] != urlparse.urlsplit(url)[:2]:
+                # Don't send the credentials on to another host
+                dropped += ("authorization",)
+            if dropped and headers:
+                headers = dict([(name, value) for name, value in headers.items()
+                    if name.lower() not in dropped])
+            url = location
+            redirects += 1
+            resp, content = self.__request(url, verb, headers, body)
+        return resp, content
+
+    def __request(self, url, verb, headers, body):
+        scheme, netloc, path, query, fragment = urlparse.urlsplit(url)
+        if query:
+            path += "?" + query
+        key = (scheme, netloc)
+
+        connection, reused = self.acquire(key)
+        try:
+            try:
+                started = time.time()
+                response, send_time = self.__send(connection, verb, path or "/", headers, body)
+            except (httplib.BadStatusLine, socket.error), e:
+                if not reused or not self.__is_stale_error(e) or not is_idempotent(verb, url):
+                    raise
+                # The server closed the idle connection, try once more on a new one
+                self.release(key, connection, False)
+                connection, reused = self.acquire(key, False)
+                started = time.time()
+                response, send_time = self.__send(connection, verb, path or "/", headers, body)
+            first_byte_at = time.time()
+            content = response.read()
+        except:
+            self.release(key, connection, False)
+            raise
+
+        self.release(key, connection, not response.will_close)
+        resp = HttpResponse(response.status, response.reason, response.getheaders())
+        resp.ttfb = first_byte_at - started
+        resp.send_time = send_time
+        resp.elapsed = time.time() - started
+        return resp, content
+
+    def acquire(self, key, allow_reuse=True):
+        """Check out a connection to a host, blocking while the host is at max_size.
+
+        @type key tuple
+        @param key The (scheme, host) to connect to
+        @type allow_reuse boolean
+        @param allow_reuse Whether an idle connection may be returned
+        @return tuple of the connection and whether it was reused
+
+        """
+
+        self.__condition.acquire()
+        try:
+            while True:
+                idle = allow_reuse and self.__idle.get(key) or []
+                while idle:
+                    connection, last_used = idle.pop()
+                    if self.__is_healthy(connection, last_used):
+                        self.__in_use[key] = self.__in_use.get(key, 0) + 1
+                        self.reused += 1
+                        return connection, True
+                    self.__discard(connection)
+                if self.__in_use.get(key, 0) < self.max_size:
+                    break
+                self.__condition.wait()
+
+            self.__in_use[key] = self.__in_use.get(key, 0) + 1
+            self.created += 1
+        finally:
+            self.__condition.release()
+
+        scheme, netloc = key
+        if scheme == "https":
+            return httplib.HTTPSConnection(netloc, timeout=self.timeout), False
+        else:
+            return httplib.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def release(self, key, connection, reusable=True):
+        """Return a connection to the pool.
+
+        @type key tuple
+        @param key The (scheme, host) the connection was acquired for
+        @type connection HTTPConnection
+        @param connection The connection to return
+        @type reusable boolean
+        @param reusable False if the connection must be closed
+
+        """
+
+        self.__condition.acquire()
+        try:
+            self.__in_use[key] -= 1
+            if reusable:
+                self.__idle.setdefault(key, []).append((connection, time.time()))
+            else:
+                self.__discard(connection)
+            self.__evict_idle()
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+    def evict_idle(self):
+        """Close every idle connection that has passed the idle timeout."""
+
+        self.__condition.acquire()
+        try:
+            self.__evict_idle()
+        finally:
+            self.__condition.release()
+
+    def close(self):
+        """Close every idle connection."""
+
+        self.__condition.acquire()
+        try:
+            for idle in self.__idle.values():
+                for connection, last_used in idle:
+                    self.__discard(connection)
+            self.__idle = {}
+        finally:
+            self.__condition.release()
+
+    def get_stats(self):
+        """Return a dictionary of connection counts.
+
+        in_use and idle are the current number of connections, created,
+        reused and discarded are totals over the life of the pool.
+
+        """
+
+        self.__condition.acquire()
+        try:
+            return {
+                'in_use': sum(self.__in_use.values()),
+                'idle': sum([len(idle) for idle in self.__idle.values()]),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+            }
+        finally:
+            self.__condition.release()
+
+    def __send(self, connection, verb, path, headers, body):
+        if connection.sock is None:
+            connection.connect()
+        # Time the upload alone, without connecting or waiting for the server
+        started = time.time()
+        connection.request(verb, path, body, headers or {})
+        send_time = time.time() - started
+        return connection.getresponse(), send_time
+
+    def __is_healthy(self, connection, last_used):
+        if time.time() - last_used > self.idle_timeout:
+            return False
+        if connection.sock is None:
+            return True
+        # An idle connection should have nothing to read, if it is
+        # readable the server has closed it
+        try:
+            readable, writable, errored = select.select([connection.sock], [], [], 0)
+        except (select.error, socket.error, ValueError):
+            return False
+        return not readable
+
+    def __is_stale_error(self, e):
+        if isinstance(e, httplib.BadStatusLine):
+            return True
+        return e.args and e.args[0] in (errno.ECONNRESET, errno.EPIPE)
+
+    def __evict_idle(self):
+        now = time.time()
+        for key, idle in self.__idle.items():
+            fresh = []
+            for connection, last_used in idle:
+                if now - last_used > self.idle_timeout:
+                    self.__discard(connection)
+                else:
+                    fresh.append((connection, last_used))
+            self.__idle[key] = fresh
+
+    def __discard(self, connection):
+        self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
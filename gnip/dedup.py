@@ -0,0 +1,288 @@
+import os
+import struct
+import threading
+import collections
+import cPickle
+import hashlib
+import tempfile
+
+DEFAULT_WINDOW = 100000
+DEFAULT_BLOOM_BITS = 8 * 1024 * 1024
+DEFAULT_BLOOM_HASHES = 7
+
+FORMAT_VERSION = 1
+
+def activity_key(an_activity):
+    """Return the key an Activity is recognised by.
+
+    @type an_activity Activity
+    @param an_activity The Activity
+    @return string, the activity_id, or a fingerprint of the activity's XML
+        if it has no id
+    """
+
+    if an_activity.activity_id is not None:
+        return an_activity.activity_id
+    return "sha1:" + hashlib.sha1(an_activity.to_xml()).hexdigest()
+
+class BloomFilter(object):
+    """A fixed size set of strings that may report false positives."""
+
+    def __init__(self, bits=DEFAULT_BLOOM_BITS, hashes=DEFAULT_BLOOM_HASHES, data=None):
+        """Initialize the class.
+
+        @type bits int
+        @param bits The size of the filter in bits
+        @type hashes int
+        @param hashes The number of bits set for each string
+        @type data string
+        @param data The bits of a saved filter, see get_data()
+        """
+
+        self.bits = bits
+        self.hashes = hashes
+        self.count = 0
+        if data is None:
+            self.__array = bytearray((bits + 7) // 8)
+        else:
+            self.__array = bytearray(data)
+
+    def add(self, key):
+        array = self.__array
+        for position in self.__positions(key):
+            array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        array = self.__array
+        for position in self.__positions(key):
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def get_data(self):
+        return str(self.__array)
+
+    def __positions(self, key):
+        if isinstance(key, unicode):
+            key = key.encode("utf-8")
+        # Double hashing: position i is first + i * second
+        first, second = struct.unpack("<QQ", hashlib.md5(key).digest())
+        second |= 1
+        return [(first + i * second) % self.bits for i in xrange(self.hashes)]
+
+class DedupStore(object):
+    """Remembers which Activities have already been seen, in fixed memory.
+
+    The most recent window keys are remembered exactly, in least recently
+    used order. Older keys are remembered by two Bloom filters of
+    bloom_bits bits each: keys are added to the newer one, and once it
+    holds bloom_capacity keys the older one is discarded and a new one
+    started. So memory stays fixed at about 2 * bloom_bits / 8 bytes plus
+    the window, keys are remembered for at least bloom_capacity further
+    keys, and a new key is mistaken for a duplicate with a probability of
+    under 1% at the default sizes.
+
+    A store can be shared by any number of threads and Gnip instances, and
+    saved to a file to survive restarts. Nothing is saved automatically:
+    call save(), or Gnip.close() for the store Gnip creates when
+    gnip.dedup.path is set.
+
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, bloom_bits=DEFAULT_BLOOM_BITS, bloom_hashes=DEFAULT_BLOOM_HASHES,
+                 bloom_capacity=None, path=None):
+        """Initialize the class.
+
+        @type window int
+        @param window The number of recent keys remembered exactly
+        @type bloom_bits int
+        @param bloom_bits The size of each Bloom filter in bits, 0 to only
+            remember the window
+        @type bloom_hashes int
+        @param bloom_hashes The number of hashes per key
+        @type bloom_capacity int
+        @param bloom_capacity The number of keys added to a Bloom filter
+            before it is rotated, by default one per 12 bits
+        @type path string
+        @param path The file used by save(), loaded now if it exists
+
+        """
+
+        self.window = window
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self.bloom_capacity = bloom_capacity or bloom_bits // 12
+        self.path = path
+        self.checked = 0
+        self.duplicates = 0
+        self.bloom_duplicates = 0
+        self.rotations = 0
+        self.__lock = threading.Lock()
+        self.__recent = collections.OrderedDict()
+        self.__blooms = []
+        if bloom_bits:
+            self.__blooms = [BloomFilter(bloom_bits, bloom_hashes)]
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def add(self, key):
+        """Record a key as seen.
+
+        @type key string
+        @param key The key of an Activity, see activity_key()
+        @return boolean True if the key had not been seen before
+        """
+
+        self.__lock.acquire()
+        try:
+            self.checked += 1
+            if key in self.__recent:
+                self.__recent[key] = self.__recent.pop(key)
+                self.duplicates += 1
+                return False
+
+            self.__recent[key] = True
+            if len(self.__recent) > self.window:
+                self.__recent.popitem(last=False)
+
+            for bloom in self.__blooms:
+                if key in bloom:
+                    self.duplicates += 1
+                    self.bloom_duplicates += 1
+                    return False
+            if self.__blooms:
+                self.__add_to_bloom(key)
+            return True
+        finally:
+            self.__lock.release()
+
+    def is_new(self, an_activity):
+        """Record an Activity as seen.
+
+        @return boolean True if the Activity had not been seen before
+        """
+
+        return self.add(activity_key(an_activity))
+
+    def filter(self, activities):
+        """Return the Activities that have not been seen before, recording them as seen.
+
+        @type activities iterable of Activity
+        @param activities The Activities to check
+        @return list of Activity objects
+        """
+
+        return [an_activity for an_activity in activities if self.is_new(an_activity)]
+
+    def iter_filter(self, activities):
+        """Like filter(), but checks each Activity as it is consumed."""
+
+        for an_activity in activities:
+            if self.is_new(an_activity):
+                yield an_activity
+
+    def __contains__(self, key):
+        self.__lock.acquire()
+        try:
+            if key in self.__recent:
+                return True
+            for bloom in self.__blooms:
+                if key in bloom:
+                    return True
+            return False
+        finally:
+            self.__lock.release()
+
+    def save(self, path=None):
+        """Write the store to a file, replacing it atomically.
+
+        @type path string
+        @param path The file to write, by default the path given to the
+            constructor
+        """
+
+        path = path or self.path
+        self.__lock.acquire()
+        try:
+            state = {
+                'version': FORMAT_VERSION,
+                'recent': list(self.__recent),
+                'bloom_bits': self.bloom_bits,
+                'bloom_hashes': self.bloom_hashes,
+                'blooms': [(bloom.count, bloom.get_data()) for bloom in self.__blooms],
+            }
+        finally:
+            self.__lock.release()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            fileobj = os.fdopen(fd, "wb")
+            try:
+                cPickle.dump(state, fileobj, 2)
+            finally:
+                fileobj.close()
+            os.rename(temp_path, path)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def load(self, path=None):
+        """Replace the remembered keys with those saved in a file.
+
+        @type path string
+        @param path The file to read, by default the path given to the
+            constructor
+
+        Saved Bloom filters of a different size are discarded.
+
+        """
+
+        fileobj = open(path or self.path, "rb")
+        try:
+            state = cPickle.load(fileobj)
+        finally:
+            fileobj.close()
+        if state.get('version') != FORMAT_VERSION:
+            return
+
+        self.__lock.acquire()
+        try:
+            self.__recent = collections.OrderedDict()
+            if self.window:
+                for key in state['recent'][-self.window:]:
+                    self.__recent[key] = True
+            if state['bloom_bits'] == self.bloom_bits and state['bloom_hashes'] == self.bloom_hashes and self.bloom_bits:
+                self.__blooms = []
+                for count, data in state['blooms']:
+                    bloom = BloomFilter(self.bloom_bits, self.bloom_hashes, data)
+                    bloom.count = count
+                    self.__blooms.append(bloom)
+        finally:
+            self.__lock.release()
+
+    def get_stats(self):
+        """Return a dictionary of counters and the number of keys remembered."""
+
+        self.__lock.acquire()
+        try:
+            return {
+                'checked': self.checked,
+                'duplicates': self.duplicates,
+                'bloom_duplicates': self.bloom_duplicates,
+                'rotations': self.rotations,
+                'recent': len(self.__recent),
+                'bloom_keys': sum([bloom.count for bloom in self.__blooms]),
+            }
+        finally:
+            self.__lock.release()
+
+    def __add_to_bloom(self, key):
+        newest = self.__blooms[-1]
+        if newest.count >= self.bloom_capacity:
+            newest = BloomFilter(self.bloom_bits, self.bloom_hashes)
+            self.__blooms = self.__blooms[-1:] + [newest]
+            self.rotations += 1
+        newest.add(key)
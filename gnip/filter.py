@@ -1,6 +1,57 @@
-import iso8601
 from elementtree.ElementTree import *
+import imports
 from xml_objects import Rule
+import xml_writer
+
+def _encode(text):
+    if text is None:
+        return "-"
+    if isinstance(text, unicode):
+        text = text.encode("utf-8")
+    return "%d:%s" % (len(text), text)
+
+class RuleList(list):
+    """A list of Rules that caches its fingerprint until the list is changed.
+
+    Rules are immutable, so only adding, removing or replacing Rules can
+    change the fingerprint.
+
+    """
+
+    def __init__(self, rules=()):
+        list.__init__(self, rules)
+        self.__fingerprint = None
+
+    def fingerprint(self):
+        """Return a digest of the rules, ignoring their order.
+
+        @return string which is the same for any lists holding the same rules
+        """
+
+        if self.__fingerprint is None:
+            digest = imports.load("hashlib").sha1()
+            for rule_type, value in sorted([rule.key() for rule in self]):
+                digest.update(_encode(rule_type))
+                digest.update(_encode(value))
+            self.__fingerprint = digest.hexdigest()
+        return self.__fingerprint
+
+    def changed(self):
+        """Clear the cached fingerprint."""
+
+        self.__fingerprint = None
+
+def _changing(name):
+    list_method = getattr(list, name)
+    def method(self, *args):
+        self.changed()
+        return list_method(self, *args)
+    method.__name__ = name
+    return method
+
+for _name in ["append", "extend", "insert", "remove", "pop", "__setitem__", "__delitem__",
+              "__setslice__", "__delslice__", "__iadd__", "__imul__"]:
+    setattr(RuleList, _name, _changing(_name))
 
 class Filter(object):
     """Gnip filter container class
@@ -9,7 +60,7 @@ class Filter(object):
 
     """
     
-    def __init__(self, name="", full_data=True, post_url=None, rules=[]):
+    def __init__(self, name="", full_data=True, post_url=None, rules=None):
         """Initialize the class.
 
         @type name string
@@ -39,30 +90,7 @@ class Filter(object):
 
         """
 
-        filter_node = Element("filter")
-        
-        post_url_node = None
-        if self.post_url is not None:
-            post_url_node = Element("postURL")
-            post_url_node.text = self.post_url
-
-        rule_nodes = None
-        if self.rules is not None and len(self.rules) > 0:
-            rule_nodes = []
-            for rule in self.rules:
-                rule_node = Element("rule")
-                rule_node.text = rule.value
-                rule_node.set("type", rule.type)
-                rule_nodes.append(rule_node)
-                
-        filter_node.set("name", self.name)
-        filter_node.set("fullData", str(self.full_data).lower())
-        if post_url_node is not None:
-            filter_node.append(post_url_node)
-        for rule_node in rule_nodes:
-            filter_node.append(rule_node)
-
-        return tostring(filter_node)
+        return "".join(xml_writer.iter_filter_xml(self))
     
     def from_xml(self, xml):     
         """ Populate object from XML
@@ -90,10 +118,32 @@ class Filter(object):
             self.post_url = None
 
         rule_nodes = filter_node.findall("rule")
-        self.rules = []
-        for rule_node in rule_nodes:
-            rule = Rule(type=rule_node.get("type"), value=rule_node.text)
-            self.rules.append(rule)
+        self.rules = RuleList([Rule(type=rule_node.get("type"), value=rule_node.text) for rule_node in rule_nodes])
+
+    def get_rules(self):
+        return self.__rules
+
+    def set_rules(self, rules):
+        """Set the rules, copying them into a RuleList unless they are one already."""
+
+        if not isinstance(rules, RuleList):
+            rules = RuleList(rules or ())
+        self.__rules = rules
+
+    rules = property(get_rules, set_rules)
+
+    def fingerprint(self):
+        """Return a digest of the rules, ignoring their order.
+
+        @return string which is the same for any Filters with the same rules
+
+        The digest is cached until the rules are changed, so comparing
+        Filters, or checking whether one has changed, doesn't look at every
+        rule each time.
+
+        """
+
+        return self.__rules.fingerprint()
 
     def __str__(self):
         return "[" + self.name + ", " + str(self.post_url) + ", " + str(self.rules) + "]"
@@ -105,8 +155,18 @@ class Filter(object):
                 ret = cmp(self.post_url, other.post_url)
                 if ret is 0:
                     ret = cmp(self.full_data, other.full_data)
-                    if ret is 0:
+                    if ret is 0 and self.fingerprint() != other.fingerprint():
                         ret = cmp(sorted(self.rules), sorted(other.rules))
         else:
             ret = 1
         return ret
+
+    def __eq__(self, other):
+        return isinstance(other, Filter) and self.name == other.name and self.post_url == other.post_url \
+            and self.full_data == other.full_data and self.fingerprint() == other.fingerprint()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    # Equal Filters must hash alike, and a Filter can change, so it can't be hashed
+    __hash__ = None
@@ -0,0 +1,188 @@
+import time
+import datetime
+import logging
+import httplib
+import dedup
+
+ONE_MINUTE = datetime.timedelta(minutes=1)
+
+class Follower(object):
+    """Follows the current bucket of a Publisher or Filter.
+
+    Polls current.xml and yields each Activity the first time it is seen.
+    Activities are recognised by activity_id, over a window of the most
+    recent ids, or by a DedupStore which may be shared with other
+    Followers. When the minute rolls over, the bucket that was current
+    at the previous poll is fetched once more, along with any buckets
+    that closed between the two polls, so activities added after the
+    previous poll are not missed however long it has been. A closed
+    bucket that can't be fetched, because of an error response or a
+    connection that fails, is tried again on each following poll, up to
+    max_bucket_retries times.
+
+    The time between polls adapts to the rate at which new activities
+    arrive, aiming for target_batch new activities per poll, between
+    min_interval and max_interval seconds.
+
+    """
+
+    def __init__(self, gnip, publisher_scope, publisher_name, filter_name=None, notifications=False,
+                 window=10000, min_interval=1.0, max_interval=60.0, target_batch=50,
+                 sleep=time.sleep, timer=time.time, dedup_store=None, max_bucket_retries=10):
+        """Initialize the class.
+
+        @type gnip Gnip
+        @param gnip The Gnip connection to poll with
+        @type publisher_scope string
+        @param publisher_scope The scope of the publisher ("my," "public" or "gnip")
+        @type publisher_name string
+        @param publisher_name The publisher to follow
+        @type filter_name string
+        @param filter_name The filter to follow, None to follow the publisher
+        @type notifications boolean
+        @param notifications Follow Notifications rather than Activities
+        @type window int
+        @param window The number of activity ids remembered for de-duplication
+        @type min_interval float
+        @param min_interval The shortest time between polls, in seconds
+        @type max_interval float
+        @param max_interval The longest time between polls, in seconds
+        @type target_batch int
+        @param target_batch The number of new activities to aim for per poll
+        @type dedup_store DedupStore
+        @param dedup_store Remembers the activities seen, by default one
+            holding just the last window activity ids; it may be shared with
+            other Followers or be the store of a Gnip instance
+        @param sleep Called with the number of seconds to wait between polls
+        @param timer Returns the current time in seconds since the epoch
+        @type max_bucket_retries int
+        @param max_bucket_retries The number of later polls on which a
+            closed bucket that couldn't be fetched is tried again
+
+        """
+
+        self.gnip = gnip
+        self.publisher_scope = publisher_scope
+        self.publisher_name = publisher_name
+        self.filter_name = filter_name
+        self.notifications = notifications
+        self.window = window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_batch = target_batch
+        self.max_bucket_retries = max_bucket_retries
+        self.sleep = sleep
+        self.timer = timer
+
+        self.interval = min_interval
+        self.rate = 0.0
+        self.polls = 0
+        self.duplicates = 0
+        self.stopped = False
+        if dedup_store is None:
+            dedup_store = dedup.DedupStore(window=window, bloom_bits=0)
+        self.dedup = dedup_store
+        self.__last_poll_at = None
+        self.__last_bucket = None
+        self.__last_poll_time = None
+        self.__failed_buckets = []
+
+    def __iter__(self):
+        return self.follow()
+
+    def follow(self):
+        """Yield new activities as they arrive, until stop() is called.
+
+        @return iterator of Activity objects
+        """
+
+        while not self.stopped:
+            for an_activity in self.poll():
+                yield an_activity
+            if not self.stopped:
+                self.sleep(self.interval)
+
+    def stop(self):
+        """Stop following once the current poll completes."""
+
+        self.stopped = True
+
+    def poll(self):
+        """Poll once and return the activities that have not been seen before.
+
+        @return list of Activity objects
+        """
+
+        now = datetime.datetime.utcfromtimestamp(self.timer())
+        bucket = self.gnip.time_to_string(self.gnip.sync_clock(now))
+
+        # Closed buckets that couldn't be fetched before, with their failures so far
+        closed_buckets = self.__failed_buckets
+        self.__failed_buckets = []
+        if self.__last_bucket is not None and bucket != self.__last_bucket:
+            # The buckets from the one current at the last poll up to this
+            # one have closed; pick up their stragglers, one per minute
+            bucket_time = self.__last_poll_at
+            while self.gnip.time_to_string(self.gnip.sync_clock(bucket_time)) < bucket:
+                closed_buckets.append((bucket_time, 0))
+                bucket_time += ONE_MINUTE
+
+        fetched = []
+        for bucket_time, failures in closed_buckets:
+            activities = self.__fetch(bucket_time)
+            if activities is not None:
+                fetched.extend(activities)
+            elif failures < self.max_bucket_retries:
+                self.__failed_buckets.append((bucket_time, failures + 1))
+            else:
+                logging.warning("Giving up on a bucket of " + self.publisher_name + " at " + str(bucket_time))
+        fetched.extend(self.__fetch(None) or [])
+
+        # Activities are only recorded as seen once they are about to be
+        # returned, so none are lost if a fetch fails partway through a poll
+        new_activities = self.dedup.filter(fetched)
+        self.duplicates += len(fetched) - len(new_activities)
+
+        self.polls += 1
+        self.__last_poll_at = now
+        self.__last_bucket = bucket
+        self.__adapt(len(new_activities))
+        return new_activities
+
+    def __fetch(self, date_time):
+        # Duplicates are removed by poll() with this follower's store, which
+        # may be the Gnip instance's own, so the getter must not remove them
+        try:
+            if self.filter_name is None:
+                if self.notifications:
+                    response = self.gnip.get_publisher_notifications(self.publisher_scope, self.publisher_name, date_time, dedup=False)
+                else:
+                    response = self.gnip.get_publisher_activities(self.publisher_scope, self.publisher_name, date_time, dedup=False)
+            else:
+                if self.notifications:
+                    response = self.gnip.get_filter_notifications(self.publisher_scope, self.publisher_name, self.filter_name, date_time, dedup=False)
+                else:
+                    response = self.gnip.get_filter_activities(self.publisher_scope, self.publisher_name, self.filter_name, date_time, dedup=False)
+        except (IOError, httplib.HTTPException), e:
+            # socket.error is an IOError; a failed fetch is retried like a non-200
+            logging.info("Unable to poll " + self.publisher_name + ": " + str(e))
+            return None
+
+        if response.code != 200:
+            logging.info("Unable to poll " + self.publisher_name + ": " + str(response.code))
+            return None
+
+        return response.result.items
+
+    def __adapt(self, count):
+        now = self.timer()
+        if self.__last_poll_time is not None:
+            elapsed = max(now - self.__last_poll_time, 0.001)
+            self.rate = 0.5 * self.rate + 0.5 * (count / elapsed)
+        self.__last_poll_time = now
+
+        if self.rate > 0 and count > 0:
+            interval = self.target_batch / self.rate
+        else:
+            interval = self.interval * 2
+        self.interval = min(self.max_interval, max(self.min_interval, interval))
@@ -0,0 +1,33 @@
+import sys
+import threading
+
+_lock = threading.Lock()
+
+def load(name):
+    """Return a module, importing it the first time it is needed.
+
+    @type name string
+    @param name The absolute name of the module, e.g. "urllib" or
+        "gnip.connection"
+    @return module
+
+    For modules that would slow down import gnip, such as those that load
+    httplib. Once the module has been imported this is a lookup in
+    sys.modules: an import statement in a function would take Python 2's
+    global import lock on every call, serialising the threads making
+    requests. The first import is made under a lock of its own, so threads
+    needing the module at the same time import it once.
+
+    """
+
+    module = sys.modules.get(name)
+    if module is None:
+        _lock.acquire()
+        try:
+            module = sys.modules.get(name)
+            if module is None:
+                __import__(name)
+                module = sys.modules[name]
+        finally:
+            _lock.release()
+    return module
@@ -0,0 +1,329 @@
+import math
+import threading
+import socket
+import logging
+
+METRICS = ("ttfb_ms", "total_ms", "parse_ms", "bytes_in", "bytes_out", "uncompressed_in", "uncompressed_out")
+
+class RequestEvent(object):
+    """Measurements of a single Gnip request.
+
+    endpoint:         the endpoint template, see retry.endpoint_template
+    verb:             the HTTP method
+    status:           the response code, None if the request failed
+    bytes_out:        bytes of request body sent, after compression
+    uncompressed_out: bytes of request body before compression
+    bytes_in:         bytes of response body received, before decompression
+    uncompressed_in:  bytes of response body after decompression, None if
+                      it was streamed to the parser still compressed
+    ttfb:             seconds until the response headers arrived, None for
+                      responses that did not come from the network
+    total_time:       seconds taken by the request, including any retries
+    cached:           True if the response came from the bucket cache
+    error:            the name of the exception that made the request
+                      fail, such as "timeout", None if there was a response
+
+    The time taken to parse the response is reported by a ParseEvent.
+
+    """
+
+    def __init__(self, endpoint, verb, status=None, bytes_out=0, uncompressed_out=0, bytes_in=0,
+                 uncompressed_in=0, ttfb=None, total_time=None, cached=False, error=None):
+        self.endpoint = endpoint
+        self.verb = verb
+        self.status = status
+        self.bytes_out = bytes_out
+        self.uncompressed_out = uncompressed_out
+        self.bytes_in = bytes_in
+        self.uncompressed_in = uncompressed_in
+        self.ttfb = ttfb
+        self.total_time = total_time
+        self.cached = cached
+        self.error = error
+
+    def get_key(self):
+        return self.verb + " " + self.endpoint
+
+    def get_metrics(self):
+        """Return a dictionary of the measured values, in ms and bytes."""
+
+        metrics = {'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+            'uncompressed_out': self.uncompressed_out}
+        if self.uncompressed_in is not None:
+            metrics['uncompressed_in'] = self.uncompressed_in
+        if self.ttfb is not None:
+            metrics['ttfb_ms'] = self.ttfb * 1000
+        if self.total_time is not None:
+            metrics['total_ms'] = self.total_time * 1000
+        return metrics
+
+    def __repr__(self):
+        return "RequestEvent(%s %s %s)" % (self.verb, self.endpoint, self.error or self.status)
+
+class ParseEvent(object):
+    """The time taken to parse the response to a Gnip request.
+
+    endpoint:   the endpoint template of the request
+    verb:       the HTTP method of the request
+    parse_time: seconds spent parsing; for a streamed response, the time
+                spent producing its items, reported once it is exhausted
+
+    Emitted after the RequestEvent of the same request.
+
+    """
+
+    def __init__(self, endpoint, verb, parse_time):
+        self.endpoint = endpoint
+        self.verb = verb
+        self.parse_time = parse_time
+
+    def get_key(self):
+        return self.verb + " " + self.endpoint
+
+    def get_metrics(self):
+        """Return a dictionary of the measured values, in ms."""
+
+        return {'parse_ms': self.parse_time * 1000}
+
+    def __repr__(self):
+        return "ParseEvent(%s %s %.3f)" % (self.verb, self.endpoint, self.parse_time)
+
+class Instrumentation(object):
+    """Passes a RequestEvent for each request, and a ParseEvent for each
+    parsed response, to the registered sinks.
+
+    A sink is any object with a record(event) method. When no sinks are
+    registered no events are created, so instrumentation costs nothing.
+
+    """
+
+    def __init__(self):
+        self.sinks = ()
+        self.__lock = threading.Lock()
+
+    def add_sink(self, sink):
+        self.__lock.acquire()
+        try:
+            self.sinks = self.sinks + (sink,)
+        finally:
+            self.__lock.release()
+
+    def remove_sink(self, sink):
+        self.__lock.acquire()
+        try:
+            self.sinks = tuple([s for s in self.sinks if s is not sink])
+        finally:
+            self.__lock.release()
+
+    def emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink.record(event)
+            except Exception:
+                logging.exception("Instrumentation sink failed")
+
+    def emit_request(self, endpoint, verb, status=None, **measurements):
+        """Emit a RequestEvent, see RequestEvent for the measurements.
+
+        @return the RequestEvent
+        """
+
+        event = RequestEvent(endpoint, verb, status, **measurements)
+        self.emit(event)
+        return event
+
+    def emit_parse(self, endpoint, verb, parse_time):
+        """Emit a ParseEvent."""
+
+        self.emit(ParseEvent(endpoint, verb, parse_time))
+
+class Histogram(object):
+    """Counts values in power of two buckets.
+
+    Percentiles are estimated as the upper bound of the bucket they fall
+    in, so they are accurate to within a factor of two.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value > 0:
+            bucket = math.frexp(value)[1]
+        else:
+            bucket = None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """Estimate the value below which percent of the values fall."""
+
+        if self.count == 0:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                if bucket is None:
+                    return 0
+                return min(math.ldexp(1, bucket), self.max)
+        return self.max
+
+    def get_stats(self):
+        return {
+            'count': self.count,
+            'mean': self.mean(),
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+class HistogramSink(object):
+    """Keeps histograms of each metric, and counts of each status, per endpoint.
+
+    A request that failed without a response is counted under the name of
+    its error rather than a status.
+
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.statuses = {}
+        self.__lock = threading.Lock()
+
+    def record(self, event):
+        key = event.get_key()
+        self.__lock.acquire()
+        try:
+            if isinstance(event, RequestEvent):
+                statuses = self.statuses.setdefault(key, {})
+                status = event.status
+                if event.error is not None:
+                    status = event.error
+                statuses[status] = statuses.get(status, 0) + 1
+            for metric, value in event.get_metrics().items():
+                histogram = self.histograms.get((key, metric))
+                if histogram is None:
+                    histogram = self.histograms[(key, metric)] = Histogram()
+                histogram.add(value)
+        finally:
+            self.__lock.release()
+
+    def get_histogram(self, key, metric):
+        """Return the Histogram of a metric for an endpoint, or None.
+
+        @type key string
+        @param key The verb and endpoint template, e.g. "GET /{scope}/publishers/{publisher}.xml"
+        @type metric string
+        @param metric One of METRICS
+        """
+
+        return self.histograms.get((key, metric))
+
+    def get_stats(self):
+        """Return a dictionary of the statuses and metric summaries of each endpoint."""
+
+        self.__lock.acquire()
+        try:
+            stats = {}
+            for key, statuses in self.statuses.items():
+                stats[key] = {'statuses': dict(statuses)}
+            for (key, metric), histogram in self.histograms.items():
+                stats.setdefault(key, {'statuses': {}})[metric] = histogram.get_stats()
+            return stats
+        finally:
+            self.__lock.release()
+
+class StatsdSink(object):
+    """Sends each event as StatsD timer and counter lines.
+
+    For an activity bucket fetch the lines look like:
+
+        gnip.scope.publishers.publisher.activity.bucket.get.ttfb:12.5|ms
+        gnip.scope.publishers.publisher.activity.bucket.get.status.200:1|c
+
+    A request that failed without a response is counted as, for example:
+
+        gnip.scope.publishers.publisher.activity.bucket.get.error.timeout:1|c
+
+    """
+
+    def __init__(self, host="localhost", port=8125, prefix="gnip", send=None):
+        """Initialize the class.
+
+        @type host string
+        @param host The StatsD server
+        @type port int
+        @param port The StatsD UDP port
+        @type prefix string
+        @param prefix Prepended to every metric name
+        @type send callable
+        @param send Called with each packet of lines instead of sending it
+            to host and port
+
+        """
+
+        self.address = (host, port)
+        self.prefix = prefix
+        self.send = send
+        self.__socket = None
+
+    def record(self, event):
+        packet = "\n".join(self.format(event))
+        if self.send is not None:
+            self.send(packet)
+            return
+        if self.__socket is None:
+            self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.__socket.sendto(packet, self.address)
+        except EnvironmentError:
+            pass
+
+    def format(self, event):
+        """Return the StatsD lines for an event."""
+
+        name = self.prefix + "." + metric_name(event.endpoint) + "." + event.verb.lower()
+        if isinstance(event, ParseEvent):
+            return ["%s.parse:%.3f|ms" % (name, event.parse_time * 1000)]
+        if event.error is not None:
+            lines = [name + ".error." + event.error + ":1|c"]
+        else:
+            lines = [name + ".status." + str(event.status) + ":1|c"]
+        if event.ttfb is not None:
+            lines.append("%s.ttfb:%.3f|ms" % (name, event.ttfb * 1000))
+        if event.total_time is not None:
+            lines.append("%s.total:%.3f|ms" % (name, event.total_time * 1000))
+        lines.append("%s.bytes_in:%d|c" % (name, event.bytes_in))
+        lines.append("%s.bytes_out:%d|c" % (name, event.bytes_out))
+        if event.uncompressed_in is not None:
+            lines.append("%s.uncompressed_in:%d|c" % (name, event.uncompressed_in))
+        lines.append("%s.uncompressed_out:%d|c" % (name, event.uncompressed_out))
+        if event.cached:
+            lines.append(name + ".cached:1|c")
+        return lines
+
+def metric_name(endpoint):
+    """Convert an endpoint template to a dotted StatsD name."""
+
+    name = endpoint.replace(".xml", "").replace("{", "").replace("}", "")
+    name = name.replace("/", ".").replace(";", ".").strip(".")
+    return name or "root"
@@ -0,0 +1,389 @@
+import re
+import sys
+import time
+import gzip
+import zlib
+import random
+import base64
+import urlparse
+import datetime
+import threading
+import StringIO
+import BaseHTTPServer
+import SocketServer
+import activities
+import filter
+import publisher
+import synthetic
+from xml_objects import Rule
+from elementtree.ElementTree import fromstring
+from xml.parsers.expat import ExpatError
+
+PUBLISHER_PATH = re.compile(r"^/(\w+)/publishers/([^/;.]+)\.xml$")
+PUBLISHERS_PATH = re.compile(r"^/(\w+)/publishers/?$")
+PUBLISH_PATH = re.compile(r"^/(\w+)/publishers/([^/;.]+)/activity\.xml$")
+FILTERS_PATH = re.compile(r"^/(\w+)/publishers/([^/;.]+)/filters\.xml$")
+FILTER_PATH = re.compile(r"^/(\w+)/publishers/([^/;.]+)/filters/([^/;.]+)\.xml$")
+RULES_PATH = re.compile(r"^/(\w+)/publishers/([^/;.]+)/filters/([^/;.]+)/rules(\.xml)?$")
+BUCKET_PATH = re.compile(r"^/(\w+)/publishers/([^/;.]+)(?:/filters/([^/;.]+))?/(activity|notification)/(current|\d{12})\.xml$")
+
+class LocalGnipServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """A stand-in for the Gnip service, for testing and benchmarking offline.
+
+    Implements the publisher, filter, rule, activity and notification
+    endpoints used by Gnip, including gzip request and response bodies and
+    the ;edit and ;delete forms of tunnelling over POST. Every minute
+    bucket holds activities_per_bucket synthetic activities, followed by
+    any activities published to it.
+
+    Latency, errors and limited bandwidth can be injected to see how the
+    client behaves under load.
+
+        server = LocalGnipServer(latency=0.05, error_rate=0.01).start()
+        gnip = Gnip("user", "password", server.url)
+        ...
+        server.stop()
+
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0, error_rate=0.0, error_status=503,
+                 bandwidth=None, activities_per_bucket=10, generator=None, username=None, password=None,
+                 seed=0):
+        """Initialize the class.
+
+        @type address tuple
+        @param address The (host, port) to listen on, port 0 for any free port
+        @type latency float
+        @param latency Seconds to wait before answering each request
+        @type error_rate float
+        @param error_rate The fraction of requests answered with error_status
+        @type error_status int
+        @param error_status The response code of injected errors
+        @type bandwidth int
+        @param bandwidth Bytes per second that responses are sent at, None for no limit
+        @type activities_per_bucket int
+        @param activities_per_bucket Synthetic activities in each minute bucket
+        @type generator synthetic.ActivityGenerator
+        @param generator Makes the synthetic activities
+        @type username string
+        @param username If set, requests must authenticate with this username
+        @type password string
+        @param password The password for username
+        @type seed int
+        @param seed Seeds the choice of requests that fail
+
+        """
+
+        BaseHTTPServer.HTTPServer.__init__(self, address, LocalGnipHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bandwidth = bandwidth
+        self.activities_per_bucket = activities_per_bucket
+        self.generator = generator or synthetic.ActivityGenerator()
+        if username is None:
+            self.authorization = None
+        else:
+            self.authorization = "Basic " + base64.b64encode(username + ":" + password)
+
+        self.publishers = {}
+        self.filters = {}
+        self.published = {}
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.__thread = None
+
+    def get_url(self):
+        """Return the base URL to pass to Gnip."""
+
+        return "http://%s:%d" % self.server_address
+
+    url = property(get_url)
+
+    def start(self):
+        """Serve requests on a background thread.
+
+        @return this server
+        """
+
+        self.__thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05})
+        self.__thread.setDaemon(True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+
+        if self.__thread is not None:
+            self.shutdown()
+            self.__thread.join()
+            self.__thread = None
+        self.server_close()
+
+    def add_publisher(self, name, rule_types=("actor", "tag", "to", "regarding", "source")):
+        """Create a publisher, as if by Gnip.create_publisher."""
+
+        self.lock.acquire()
+        try:
+            self.publishers[name] = publisher.Publisher(name, list(rule_types))
+        finally:
+            self.lock.release()
+
+    def should_fail(self):
+        self.lock.acquire()
+        try:
+            self.requests += 1
+            if self.error_rate and self.__random.random() < self.error_rate:
+                self.errors += 1
+                return True
+            return False
+        finally:
+            self.lock.release()
+
+    def get_bucket(self, publisher_name, filter_name, bucket_type, bucket_time):
+        """Return the Activities of a bucket, synthetic ones first."""
+
+        generator = self.generator
+        if filter_name is not None:
+            generator = synthetic.ActivityGenerator(hash((generator.seed, filter_name)) & 0xffff,
+                generator.payload_size, generator.places, generator.actors, generator.tags,
+                generator.tos, generator.regarding_urls, generator.start)
+        bucket = generator.bucket(bucket_time, self.activities_per_bucket)
+        self.lock.acquire()
+        try:
+            bucket.items.extend(self.published.get((publisher_name, bucket_time), []))
+        finally:
+            self.lock.release()
+        if bucket_type == "notification":
+            for an_activity in bucket.items:
+                an_activity.payload = None
+        return bucket
+
+class LocalGnipHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers requests for a LocalGnipServer."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.__handle("HEAD")
+
+    def do_GET(self):
+        self.__handle("GET")
+
+    def do_POST(self):
+        self.__handle("POST")
+
+    def do_PUT(self):
+        self.__handle("PUT")
+
+    def do_DELETE(self):
+        self.__handle("DELETE")
+
+    def __handle(self, verb):
+        server = self.server
+        body = self.__read_body()
+        path, query = urlparse.urlsplit(self.path)[2:4]
+        if verb == "POST" and path.endswith(";edit"):
+            verb, path = "PUT", path[:-5]
+        elif verb == "POST" and path.endswith(";delete"):
+            verb, path = "DELETE", path[:-7]
+
+        if server.latency:
+            time.sleep(server.latency)
+        if server.authorization is not None and self.headers.get("Authorization") != server.authorization:
+            return self.__send(401, "<error>Authentication required</error>", verb)
+        if server.should_fail():
+            return self.__send(server.error_status, "<error>Injected failure</error>", verb)
+        if verb == "HEAD":
+            return self.__send(200, "", verb)
+
+        try:
+            code, response = self.__route(verb, path, query, body)
+        except (SyntaxError, ExpatError), e:
+            code, response = 400, "<error>Malformed XML: " + str(e) + "</error>"
+        self.__send(code, response, verb)
+
+    def __route(self, verb, path, query, body):
+        server = self.server
+        params = dict(urlparse.parse_qsl(query))
+
+        match = BUCKET_PATH.match(path)
+        if match and verb == "GET":
+            scope, publisher_name, filter_name, bucket_type, stamp = match.groups()
+            if publisher_name not in server.publishers:
+                return 404, "<error>No such publisher</error>"
+            if filter_name is not None and (publisher_name, filter_name) not in server.filters:
+                return 404, "<error>No such filter</error>"
+            if stamp == "current":
+                bucket_time = minute(datetime.datetime.utcnow())
+            else:
+                # strptime is not thread safe on first use in Python 2
+                bucket_time = datetime.datetime(int(stamp[0:4]), int(stamp[4:6]), int(stamp[6:8]),
+                    int(stamp[8:10]), int(stamp[10:12]))
+            return 200, server.get_bucket(publisher_name, filter_name, bucket_type, bucket_time).to_xml()
+
+        match = PUBLISH_PATH.match(path)
+        if match and verb == "POST":
+            publisher_name = match.group(2)
+            if publisher_name not in server.publishers:
+                return 404, "<error>No such publisher</error>"
+            published = activities.Activities()
+            published.from_xml(body)
+            bucket_time = minute(datetime.datetime.utcnow())
+            server.lock.acquire()
+            try:
+                server.published.setdefault((publisher_name, bucket_time), []).extend(published.items)
+            finally:
+                server.lock.release()
+            return 200, "<result>Success</result>"
+
+        match = PUBLISHERS_PATH.match(path)
+        if match and verb == "POST":
+            a_publisher = publisher.Publisher()
+            a_publisher.from_xml(body)
+            server.add_publisher(a_publisher.name, a_publisher.rule_types)
+            return 200, "<result>Success</result>"
+
+        match = PUBLISHER_PATH.match(path)
+        if match:
+            publisher_name = match.group(2)
+            if verb == "GET":
+                if publisher_name not in server.publishers:
+                    return 404, "<error>No such publisher</error>"
+                return 200, server.publishers[publisher_name].to_xml()
+            if verb == "PUT":
+                a_publisher = publisher.Publisher()
+                a_publisher.from_xml(body)
+                server.add_publisher(publisher_name, a_publisher.rule_types)
+                return 200, "<result>Success</result>"
+
+        match = FILTERS_PATH.match(path)
+        if match and verb == "POST":
+            publisher_name = match.group(2)
+            if publisher_name not in server.publishers:
+                return 404, "<error>No such publisher</error>"
+            a_filter = filter.Filter()
+            a_filter.from_xml(body)
+            server.filters[(publisher_name, a_filter.name)] = a_filter
+            return 200, "<result>Success</result>"
+
+        match = FILTER_PATH.match(path)
+        if match:
+            key = (match.group(2), match.group(3))
+            if key not in server.filters:
+                return 404, "<error>No such filter</error>"
+            if verb == "GET":
+                return 200, server.filters[key].to_xml()
+            if verb == "PUT":
+                a_filter = filter.Filter()
+                a_filter.from_xml(body)
+                server.filters[key] = a_filter
+                return 200, "<result>Success</result>"
+            if verb == "DELETE":
+                del server.filters[key]
+                return 200, "<result>Success</result>"
+
+        match = RULES_PATH.match(path)
+        if match:
+            key = (match.group(2), match.group(3))
+            if key not in server.filters:
+                return 404, "<error>No such filter</error>"
+            a_filter = server.filters[key]
+            if verb == "POST":
+                node = fromstring(body)
+                if node.tag == "rule":
+                    nodes = [node]
+                else:
+                    nodes = node.findall("rule")
+                server.lock.acquire()
+                try:
+                    a_filter.rules = list(a_filter.rules) + [Rule(n.get("type"), n.text) for n in nodes]
+                finally:
+                    server.lock.release()
+                return 200, "<result>Success</result>"
+            rule = Rule(params.get("type"), params.get("value"))
+            if verb == "GET":
+                if rule in a_filter.rules:
+                    return 200, rule.to_xml()
+                return 404, "<error>No such rule</error>"
+            if verb == "DELETE":
+                server.lock.acquire()
+                try:
+                    a_filter.rules = [r for r in a_filter.rules if r != rule]
+                finally:
+                    server.lock.release()
+                return 200, "<result>Success</result>"
+
+        return 404, "<error>Not found</error>"
+
+    def __read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return ""
+        body = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        return body
+
+    def __send(self, code, body, verb):
+        compress = body and "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if compress:
+            zbuf = StringIO.StringIO()
+            zfile = gzip.GzipFile(mode="wb", fileobj=zbuf)
+            zfile.write(body)
+            zfile.close()
+            body = zbuf.getvalue()
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if verb != "HEAD":
+            self.__write(body)
+
+    def __write(self, body):
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        # Send in slices, pausing so the average rate matches the bandwidth
+        slice_size = max(int(bandwidth / 20), 1)
+        for offset in xrange(0, len(body), slice_size):
+            piece = body[offset:offset + slice_size]
+            self.wfile.write(piece)
+            time.sleep(len(piece) / float(bandwidth))
+
+def minute(date_time):
+    return date_time.replace(second=0, microsecond=0)
+
+def main(argv):
+    """Run a LocalGnipServer in the foreground.
+
+        % python -m gnip.local_server [port] [latency] [error_rate]
+    """
+
+    port = len(argv) > 0 and int(argv[0]) or 8080
+    latency = len(argv) > 1 and float(argv[1]) or 0.0
+    error_rate = len(argv) > 2 and float(argv[2]) or 0.0
+    server = LocalGnipServer(("127.0.0.1", port), latency=latency, error_rate=error_rate)
+    for name in ("gnip-test-publisher", "test"):
+        server.add_publisher(name)
+    print "Serving a local Gnip on " + server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,202 @@
+import collections
+from activities import Activities
+
+# Rule types matched by exact value, and the Activity field each one is matched against
+INDEXED_TYPES = {
+    "actor": lambda an_activity: [actor.value for actor in an_activity.actors or ()],
+    "tag": lambda an_activity: [tag.value for tag in an_activity.tags or ()],
+    "to": lambda an_activity: [to.value for to in an_activity.tos or ()],
+    "regarding": lambda an_activity: [url.value for url in an_activity.regarding_urls or ()],
+    "source": lambda an_activity: an_activity.sources or (),
+}
+
+KEYWORD = "keyword"
+
+def is_word_character(character):
+    return character.isalnum() or character == "_"
+
+class KeywordAutomaton(object):
+    """Finds every occurrence of a set of keywords in a text in one pass.
+
+    An Aho-Corasick automaton: the time taken to scan a text depends on the
+    length of the text and the number of matches, not on the number of
+    keywords. Keywords match case insensitively, and only as whole words,
+    so "cat" matches "Cat!" but not "concatenate".
+
+    """
+
+    def __init__(self, keywords):
+        """Initialize the class.
+
+        @type keywords list of strings
+        @param keywords The keywords to find, each may be several words
+        """
+
+        self.__goto = [{}]
+        self.__fail = [0]
+        self.__output = [[]]
+        self.keywords = []
+        for keyword in keywords:
+            self.__add(keyword)
+        self.__link()
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def find(self, text):
+        """Return the keywords that occur in a text.
+
+        @type text string
+        @param text The text to search
+        @return set of the keywords found, as given to the constructor
+        """
+
+        found = set()
+        if not text or not self.keywords:
+            return found
+        lowered = text.lower()
+        goto = self.__goto
+        fail = self.__fail
+        output = self.__output
+        state = 0
+        for end, character in enumerate(lowered):
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+            for index in output[state]:
+                keyword = self.keywords[index]
+                start = end - len(keyword) + 1
+                if (start == 0 or not is_word_character(lowered[start - 1])) and \
+                   (end + 1 == len(lowered) or not is_word_character(lowered[end + 1])):
+                    found.add(keyword)
+        return found
+
+    def __add(self, keyword):
+        state = 0
+        for character in keyword.lower():
+            if character not in self.__goto[state]:
+                self.__goto.append({})
+                self.__fail.append(0)
+                self.__output.append([])
+                self.__goto[state][character] = len(self.__goto) - 1
+            state = self.__goto[state][character]
+        self.__output[state].append(len(self.keywords))
+        self.keywords.append(keyword)
+
+    def __link(self):
+        # Breadth first, so each state's failure state is linked before its children
+        queue = collections.deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, child in self.__goto[state].items():
+                queue.append(child)
+                fallback = self.__fail[state]
+                while fallback and character not in self.__goto[fallback]:
+                    fallback = self.__fail[fallback]
+                self.__fail[child] = self.__goto[fallback].get(character, 0)
+                self.__output[child] = self.__output[child] + self.__output[self.__fail[child]]
+
+class Matcher(object):
+    """Evaluates a Filter's rules against Activities locally.
+
+    The rules are compiled once: actor, tag, to, regarding and source rules
+    into one dictionary per type keyed by value, and keyword rules into a
+    KeywordAutomaton run over the payload title and body. Evaluating an
+    Activity takes one lookup per value in the activity plus one scan of
+    its payload text, however many rules there are.
+
+    Rules of other types can't be evaluated locally; they are listed in
+    unsupported and never match.
+
+    """
+
+    def __init__(self, rules):
+        """Initialize the class.
+
+        @type rules list of Rule
+        @param rules The rules to match, such as Filter.rules
+        """
+
+        self.rules = list(rules)
+        self.unsupported = []
+        self.activities = 0
+        self.matched = 0
+        self.__hits = {}
+        self.__positions = {}
+        self.__indexes = {}
+        self.__keywords = {}
+
+        keywords = []
+        for position, rule in enumerate(self.rules):
+            if rule in self.__positions:
+                continue
+            self.__positions[rule] = position
+            if rule.type in INDEXED_TYPES:
+                self.__indexes.setdefault(rule.type, {})[rule.value] = rule
+            elif rule.type == KEYWORD and rule.value:
+                self.__keywords.setdefault(rule.value.lower(), []).append(rule)
+                keywords.append(rule.value)
+            else:
+                self.unsupported.append(rule)
+        self.__automaton = KeywordAutomaton(keywords)
+
+    def match(self, an_activity):
+        """Return the rules an Activity matches.
+
+        @type an_activity Activity
+        @param an_activity The Activity to evaluate
+        @return list of the matching Rules, in the order they were given
+        """
+
+        matched = []
+        for rule_type, index in self.__indexes.items():
+            for value in INDEXED_TYPES[rule_type](an_activity):
+                rule = index.get(value)
+                if rule is not None:
+                    matched.append(rule)
+
+        if self.__automaton.keywords and an_activity.payload is not None:
+            found = self.__automaton.find(an_activity.payload.title) | self.__automaton.find(an_activity.payload.body)
+            for keyword in found:
+                matched.extend(self.__keywords[keyword.lower()])
+
+        if len(matched) > 1:
+            matched = sorted(set(matched), key=self.__positions.get)
+
+        self.activities += 1
+        if matched:
+            self.matched += 1
+            for rule in matched:
+                self.__hits[rule] = self.__hits.get(rule, 0) + 1
+        return matched
+
+    def matches(self, an_activity):
+        """Return True if an Activity matches any of the rules."""
+
+        return len(self.match(an_activity)) > 0
+
+    def iter_matches(self, activities):
+        """Evaluate many Activities, yielding the ones that match.
+
+        @type activities Activities or iterable of Activity
+        @param activities The Activities to evaluate, such as the items of
+            a bucket or the iterator returned by a streamed request
+        @return iterator of (Activity, list of Rule) tuples
+        """
+
+        if isinstance(activities, Activities):
+            activities = activities.items
+        for an_activity in activities:
+            matched = self.match(an_activity)
+            if matched:
+                yield an_activity, matched
+
+    def get_stats(self):
+        """Return a dictionary of the activities evaluated and matched, and the matches per rule."""
+
+        return {
+            'activities': self.activities,
+            'matched': self.matched,
+            'rule_hits': dict(self.__hits),
+            'unsupported': len(self.unsupported),
+        }
@@ -1,15 +1,113 @@
 import xml_objects
+import zlib
 import base64
 import StringIO
-import gzip
+import compression
 from elementtree.ElementTree import *
 
-class Payload(object):
+def encode_raw(raw):
+    """Compress a raw with gzip and encode it with base64, as it is sent in XML.
+
+    @type raw string
+    @param raw The raw text of an activity
+    @return string
+    """
+
+    # A gzip header, as written by GzipFile, but without a time stamp, so
+    # the same raw always encodes the same way
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return base64.b64encode(compressor.compress(raw) + compressor.flush())
+
+def decode_raw(encoded_raw):
+    """Reverse encode_raw().
+
+    @type encoded_raw string
+    @param encoded_raw A raw as it is sent in XML
+    @return string
+    """
+
+    return open_encoded_raw(encoded_raw).read()
+
+def open_encoded_raw(encoded_raw):
+    return compression.GzipStream(base64.b64decode(encoded_raw))
+
+def map_raws(function, values, processes=None, chunk_size=None, pool=None):
+    """Apply encode_raw() or decode_raw() to many values on a process pool.
+
+    @type function callable
+    @param function encode_raw or decode_raw
+    @type values list of strings
+    @param values The raws to encode or decode
+    @type processes int
+    @param processes The number of processes, by default one per CPU; 1
+        to work in this process
+    @type chunk_size int
+    @param chunk_size The number of values sent to a process at a time,
+        by default enough for about four chunks per process
+    @type pool multiprocessing.Pool
+    @param pool A pool to use instead of starting one
+    @return list of strings, in the order of values
+
+    Processes are used rather than threads because base64 coding holds
+    the interpreter lock. Starting them takes a few milliseconds, so they
+    are worth it for many or large raws.
+
+    """
+
+    # Imported on first use, as it is slow to import and most callers never need it
+    import multiprocessing
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if pool is None and (processes <= 1 or len(values) <= 1):
+        return [function(value) for value in values]
+
+    if chunk_size is None:
+        chunk_size = max(1, len(values) // (processes * 4))
+    if pool is not None:
+        return pool.map(function, values, chunk_size)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(function, values, chunk_size)
+    finally:
+        pool.terminate()
+        pool.join()
+
+def decode_payloads(payloads, processes=None, chunk_size=None, pool=None):
+    """Decode the raws of many Payloads at once, see map_raws().
+
+    @type payloads list of Payload
+    @param payloads The Payloads, whose read_raw() will then return the
+        decoded raw without decoding it again; None entries are skipped
+    """
+
+    pending = [a_payload for a_payload in payloads if a_payload is not None and a_payload.needs_decoding()]
+    decoded = map_raws(decode_raw, [a_payload.get_encoded_raw() for a_payload in pending], processes, chunk_size, pool)
+    for a_payload, raw in zip(pending, decoded):
+        a_payload.write_raw(raw, encoded_raw=a_payload.get_encoded_raw())
+
+def encode_payloads(payloads, processes=None, chunk_size=None, pool=None):
+    """Encode the raws of many Payloads at once, see map_raws().
+
+    @type payloads list of Payload
+    @param payloads The Payloads, which will then be serialized without
+        encoding their raws again; None entries are skipped
+    """
+
+    pending = [a_payload for a_payload in payloads if a_payload is not None and a_payload.needs_encoding()]
+    encoded = map_raws(encode_raw, [a_payload.read_raw() for a_payload in pending], processes, chunk_size, pool)
+    for a_payload, encoded_raw in zip(pending, encoded):
+        a_payload.write_raw(a_payload.read_raw(), encoded_raw=encoded_raw)
+
+class Payload(xml_objects.SlottedObject):
     """Gnip Payload container class
     
     A Payload represents the payload information in a Gnip Activity.
     """
 
+    __slots__ = ("title", "body", "media_urls", "__raw", "__decoded")
+
     def __init__(self, title=None, body=None, media_urls=None, raw=None):
         """Initialize the class.
 
@@ -29,27 +127,64 @@ class Payload(object):
         self.media_urls = media_urls
         self.write_raw(raw)
 
-    def read_raw(self):
+    def read_raw(self, stream=False):
         """Return the decoded and uncompressed raw value from a payload
-        
-        @return string
+
+        @type stream boolean
+        @param stream Return a file-like object that decompresses the raw
+            as it is read, rather than the whole raw
+        @return string, or a file-like object if stream is True
+
+        The decoded raw is remembered, so only the first call decodes it,
+        unless stream is True.
         """
+
+        if self.__decoded is not None:
+            if stream:
+                return StringIO.StringIO(self.__decoded)
+            return self.__decoded
         if self.__raw is None:
             return None
-        else:
-            return self.__decompress_with_gzip(self.__decode(self.__raw))
+        if stream:
+            return open_encoded_raw(self.__raw)
+        self.__decoded = decode_raw(self.__raw)
+        return self.__decoded
 
-    def write_raw(self, raw):
+    def write_raw(self, raw, encoded_raw=None):
         """Set the raw for the payload.
-        
+
            @type raw string
            @param raw string will be compressed and encoded.
+           @type encoded_raw string
+           @param encoded_raw The raw already compressed and encoded, if
+               it is known
+
+           The raw is compressed and encoded when the payload is first
+           serialized, or by encode_payloads().
         """
-        
+
+        self.__decoded = raw
         if raw is None:
             self.__raw = None
         else:
-            self.__raw = self.__encode(self.__compress_with_gzip(raw))
+            self.__raw = encoded_raw
+
+    def get_encoded_raw(self):
+        """Return the raw as it is sent in XML, compressing and encoding it if needed."""
+
+        if self.__raw is None and self.__decoded is not None:
+            self.__raw = encode_raw(self.__decoded)
+        return self.__raw
+
+    def needs_decoding(self):
+        """Return True if the raw has been read from XML but not decoded yet."""
+
+        return self.__decoded is None and self.__raw is not None
+
+    def needs_encoding(self):
+        """Return True if the raw has been written but not encoded yet."""
+
+        return self.__raw is None and self.__decoded is not None
 
     def from_xml_node(self, payload_xml_node):
         """ Populates payload from a payload xml node
@@ -76,16 +211,17 @@ class Payload(object):
 
             media_url_nodes = payload_xml_node.findall("mediaURL")
 
-            if media_url_nodes is not None:
+            if media_url_nodes:
                 self.media_urls = []
                 for media_url_node in media_url_nodes:
                     media_url = xml_objects.URL(value=media_url_node.text, meta_url=media_url_node.get("metaURL"))
                     self.media_urls.append(media_url)
             else:
-                self.media_urls = None
+                self.media_urls = ()
 
             raw_node = payload_xml_node.find("raw")
             self.__raw = raw_node.text
+            self.__decoded = None
 
     def to_xml_node(self):
         """ Return a XML representation of this object
@@ -116,31 +252,14 @@ class Payload(object):
                     media_url_node.set("metaURL", media_url.meta_url)
                 payload_node.append(media_url_node)
 
-        if self.__raw is not None:
+        encoded_raw = self.get_encoded_raw()
+        if encoded_raw is not None:
             raw_node = Element("raw")
-            raw_node.text = self.__raw
+            raw_node.text = encoded_raw
             payload_node.append(raw_node)
 
         return payload_node
 
-    def __encode(self, string):
-        return base64.b64encode(string)
-
-    def __decode(self, string):
-        return base64.b64decode(string)
-
-    def __compress_with_gzip(self, string):
-        zbuf = StringIO.StringIO()
-        zfile = gzip.GzipFile(mode='wb', fileobj=zbuf, compresslevel=9)
-        zfile.write(string)
-        zfile.close()
-        return zbuf.getvalue()
-
-    def __decompress_with_gzip(self, compresseddata):
-        zbuf = StringIO.StringIO(compresseddata)
-        zfile = gzip.GzipFile(fileobj=zbuf)
-        return zfile.read()
-        
     def __str__(self):
         return "[" + str(self.title) + \
             ", " + str(self.body) + \
@@ -1,12 +1,14 @@
 from elementtree.ElementTree import *
 import xml_objects
 
-class Place(object):
+class Place(xml_objects.SlottedObject):
     """Gnip Place container class.
     
     A Place represents the geo information in a Gnip Activity.
     """
 
+    __slots__ = ("point", "elev", "floor", "feature_type_tag", "feature_name", "relationship_tag")
+
     def __init__(self, point=None, elev=None, floor=None, feature_type_tag=None, feature_name=None, relationship_tag=None):
         """Initialize the class.
 
@@ -1,4 +1,3 @@
-from xml.dom.minidom import parseString
 
 class Publisher(object):
     """Gnip Publisher container class
@@ -41,6 +40,7 @@ class Publisher(object):
         @param xml the Publisher XML
         
         """
+        from xml.dom.minidom import parseString
         root = parseString(xml).documentElement
         self.name = root.getAttribute("name")
         
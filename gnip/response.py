@@ -7,4 +7,29 @@ class Response(object):
     """
     def __init__(self, code, result):
         self.code = code
-        self.result = result
\ No newline at end of file
+        self.result = result
+
+class BucketResponse(Response):
+    """Gnip server response for a single time bucket.
+
+    code:   integer representing the response code, None if the request failed
+    result: the Activities in the bucket, or an Error
+    bucket: string representing the bucket, in YYYYMMDDHHMM form
+
+    """
+    def __init__(self, code, result, bucket):
+        Response.__init__(self, code, result)
+        self.bucket = bucket
+
+class FilterResponse(BucketResponse):
+    """Gnip server response for one Filter's time bucket.
+
+    code:   integer representing the response code, None if the request failed
+    result: the Activities in the bucket, or an Error
+    bucket: string representing the bucket, in YYYYMMDDHHMM form, or "current"
+    filter: tuple of the publisher scope, publisher name and filter name
+
+    """
+    def __init__(self, code, result, bucket, filter):
+        BucketResponse.__init__(self, code, result, bucket)
+        self.filter = filter
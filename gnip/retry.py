@@ -0,0 +1,310 @@
+import re
+import time
+import threading
+import socket
+import random
+import httplib
+import urlparse
+import clock
+import connection
+from connection import HttpResponse
+
+ENDPOINT_PATTERNS = [
+    (re.compile(r"^/[^/]+/publishers"), "/{scope}/publishers"),
+    (re.compile(r"/publishers/[^/;.]+"), "/publishers/{publisher}"),
+    (re.compile(r"/filters/[^/;.]+"), "/filters/{filter}"),
+    (re.compile(r"/(activity|notification)/(\d{12}|current)\.xml"), r"/\1/{bucket}.xml"),
+]
+
+def endpoint_template(url):
+    """Reduce a Gnip URL to the template of the endpoint it belongs to.
+
+    @type url string
+    @param url The request URL
+    @return string such as "/{scope}/publishers/{publisher}/activity/{bucket}.xml"
+
+    """
+
+    path = urlparse.urlsplit(url)[2] or "/"
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path, 1)
+    return path
+
+class CircuitBreaker(object):
+    """Stops requests to an endpoint that keeps failing.
+
+    After failure_threshold consecutive failures the breaker opens and
+    requests fail immediately. Once reset_timeout seconds have passed a
+    single trial request is allowed; if it succeeds the breaker closes,
+    otherwise it opens again.
+
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, timer=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timer = timer
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.__trial_running = False
+        self.__lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be made now."""
+
+        self.__lock.acquire()
+        try:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.timer() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.__trial_running = False
+            if self.state == self.HALF_OPEN and not self.__trial_running:
+                self.__trial_running = True
+                return True
+            return False
+        finally:
+            self.__lock.release()
+
+    def record_success(self):
+        self.__lock.acquire()
+        try:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.__trial_running = False
+        finally:
+            self.__lock.release()
+
+    def record_failure(self):
+        self.__lock.acquire()
+        try:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.timer()
+            self.__trial_running = False
+        finally:
+            self.__lock.release()
+
+class RetryPolicy(object):
+    """Retries failed Gnip requests and tracks a circuit breaker per endpoint.
+
+    Requests that raise a network error, or return one of retry_statuses,
+    are retried up to max_retries times if they are idempotent. The wait
+    before each retry is the response's Retry-After value if it has one,
+    otherwise a random time up to backoff * 2^attempt seconds, capped at
+    max_backoff. A response asking for a wait longer than max_retry_after
+    is returned rather than retried early. POSTs are only retried when they tunnel a PUT or DELETE,
+    or if retry_posts is set.
+
+    Each request counts once towards its endpoint's breaker: as a success
+    if any attempt succeeds, or as one failure once its retries run out.
+
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30, retry_statuses=(500, 502, 503, 504),
+                 retry_posts=False, failure_threshold=5, reset_timeout=30, sleep=time.sleep, timer=time.time,
+                 server_clock=None, max_retry_after=120):
+        """Initialize the class.
+
+        @type max_retries int
+        @param max_retries The number of times a request is retried
+        @type backoff float
+        @param backoff The base wait between retries, in seconds
+        @type max_backoff float
+        @param max_backoff The longest wait between retries, in seconds
+        @type retry_statuses tuple of int
+        @param retry_statuses The response codes that are retried
+        @type retry_posts boolean
+        @param retry_posts Whether plain POST requests may be retried
+        @type failure_threshold int
+        @param failure_threshold Consecutive failures that open an endpoint's breaker
+        @type reset_timeout float
+        @param reset_timeout Seconds an open breaker waits before a trial request
+        @type server_clock ClockOffset
+        @param server_clock The server clock offset, used to turn a
+            Retry-After date into a delay; None to assume the clocks agree
+        @type max_retry_after float
+        @param max_retry_after The longest Retry-After wait, in seconds,
+            before a retry; responses asking for longer are returned
+
+        """
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.retry_posts = retry_posts
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.sleep = sleep
+        self.timer = timer
+        self.server_clock = server_clock
+        self.max_retry_after = max_retry_after
+        self.retries = 0
+        self.exhausted = 0
+        self.rejected = 0
+        self.__breakers = {}
+        self.__lock = threading.Lock()
+
+    def execute(self, verb, url, send):
+        """Perform a request, retrying it as the policy allows.
+
+        @type verb string
+        @param verb The HTTP method
+        @type url string
+        @param url The request URL
+        @type send callable
+        @param send Performs the request and returns a tuple of the
+            response and its content
+        @return tuple of the response and its content
+
+        If the endpoint's breaker is open a 503 response is returned
+        without making a request. Any other exception raised by send is
+        recorded as a failure on the breaker and raised without a retry.
+        """
+
+        breaker = self.get_breaker(verb + " " + endpoint_template(url))
+        if not breaker.allow():
+            return self.reject(verb, url)
+
+        attempt = 0
+        while True:
+            try:
+                resp, content = send()
+            except (socket.error, httplib.HTTPException):
+                delay = self.next_delay(verb, url, attempt, breaker)
+                if delay is None:
+                    raise
+            except:
+                # Not retried, but recorded so that a half open breaker's
+                # trial is over and the endpoint isn't rejected forever
+                breaker.record_failure()
+                raise
+            else:
+                delay = self.next_delay(verb, url, attempt, breaker, resp)
+                if delay is None:
+                    return resp, content
+            self.sleep(delay)
+            attempt += 1
+
+    def reject(self, verb, url):
+        """Count a request refused by its endpoint's open breaker.
+
+        @return tuple of the 503 response and content to return for it
+        """
+
+        self.__count("rejected")
+        return HttpResponse(503, "Service Unavailable", {}), \
+            "<error>Circuit open for " + verb + " " + endpoint_template(url) + "</error>"
+
+    def next_delay(self, verb, url, attempt, breaker, resp=None):
+        """Decide whether a request is retried after an attempt.
+
+        @type verb string
+        @param verb The HTTP method
+        @type url string
+        @param url The request URL
+        @type attempt int
+        @param attempt The number of retries already made
+        @type breaker CircuitBreaker
+        @param breaker The endpoint's breaker, see get_breaker()
+        @type resp HttpResponse
+        @param resp The response to the attempt, None if it raised a
+            network error
+        @return float seconds to wait before retrying, or None if the
+            request is over, having succeeded or run out of retries
+
+        The outcome of a request that is over is recorded on the breaker.
+        execute() is built on this, and a caller that can't block, such as
+        AsyncGnip, waits for the delay itself.
+        """
+
+        if resp is not None and resp.status not in self.retry_statuses:
+            breaker.record_success()
+            return None
+
+        if resp is None:
+            delay = self.get_delay(attempt)
+            too_long = False
+        else:
+            delay = self.get_delay(attempt, resp.get("retry-after"))
+            too_long = delay > self.max_retry_after
+        if too_long or attempt >= self.max_retries or not self.is_idempotent(verb, url):
+            self.__count("exhausted")
+            breaker.record_failure()
+            return None
+        self.__count("retries")
+        return delay
+
+    def is_idempotent(self, verb, url):
+        """Determine whether a request may safely be sent more than once."""
+
+        return self.retry_posts or connection.is_idempotent(verb, url)
+
+    def get_delay(self, attempt, retry_after=None):
+        """Return the number of seconds to wait before a retry.
+
+        @type attempt int
+        @param attempt The number of retries already made
+        @type retry_after string
+        @param retry_after The Retry-After header of the failed response
+        @return float seconds; the full Retry-After wait if there is one
+        """
+
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                server_time = clock.parse_http_date(retry_after)
+                if server_time is None:
+                    delay = None
+                else:
+                    # The date is in server time, so compare it with the
+                    # local time corrected by the measured offset
+                    now = self.timer()
+                    if self.server_clock is not None:
+                        now += self.server_clock.offset or 0
+                    delay = server_time - now
+            if delay is not None:
+                return max(delay, 0)
+        return random.random() * min(self.max_backoff, self.backoff * (2 ** attempt))
+
+    def get_breaker(self, endpoint):
+        """Return the circuit breaker for an endpoint, creating it if needed."""
+
+        self.__lock.acquire()
+        try:
+            breaker = self.__breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.timer)
+                self.__breakers[endpoint] = breaker
+            return breaker
+        finally:
+            self.__lock.release()
+
+    def get_stats(self):
+        """Return a dictionary of retry counters and the state of each breaker."""
+
+        self.__lock.acquire()
+        try:
+            return {
+                'retries': self.retries,
+                'exhausted': self.exhausted,
+                'rejected': self.rejected,
+                'breakers': dict([(endpoint, breaker.state) for endpoint, breaker in self.__breakers.items()]),
+            }
+        finally:
+            self.__lock.release()
+
+    def __count(self, counter):
+        self.__lock.acquire()
+        try:
+            setattr(self, counter, getattr(self, counter) + 1)
+        finally:
+            self.__lock.release()
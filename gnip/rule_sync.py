@@ -0,0 +1,138 @@
+import workers
+from response import Response
+from xml_objects import Error
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def diff_rules(current_rules, desired_rules):
+    """Compare a Filter's rules to the rules it should have.
+
+    @type current_rules list of Rule
+    @param current_rules The rules the Filter has now
+    @type desired_rules list of Rule
+    @param desired_rules The rules the Filter should have
+    @return tuple of the rules to add, the rules to remove and the number
+        of rules left unchanged
+
+    Rules are matched by type and value, so duplicates count once. Runs in
+    time proportional to the number of rules. Additions keep the order of
+    desired_rules and removals the order of current_rules.
+
+    """
+
+    current = set(current_rules)
+
+    additions = []
+    wanted = set()
+    for rule in desired_rules:
+        if rule in wanted:
+            continue
+        wanted.add(rule)
+        if rule not in current:
+            additions.append(rule)
+
+    removals = []
+    for rule in current_rules:
+        if rule not in wanted and rule in current:
+            current.remove(rule)
+            removals.append(rule)
+
+    return additions, removals, len(wanted) - len(additions)
+
+class SyncSummary(object):
+    """The changes made, or that would be made, to bring a Filter's rules up to date.
+
+    filter:    tuple of the publisher scope, publisher name and filter name
+    added:     list of the Rules added, or to add on a dry run
+    removed:   list of the Rules removed, or to remove on a dry run
+    unchanged: the number of rules the Filter already had
+    dry_run:   True if the changes were only computed, not sent
+    failures:  list of (list of Rule, Response) pairs for the requests
+               that failed; the Response code is None if the request
+               raised an exception
+    requests:  the number of requests sent to make the changes
+
+    """
+
+    def __init__(self, filter, added, removed, unchanged, dry_run):
+        self.filter = filter
+        self.added = added
+        self.removed = removed
+        self.unchanged = unchanged
+        self.dry_run = dry_run
+        self.failures = []
+        self.requests = 0
+
+    def __str__(self):
+        summary = "/".join(self.filter) + ": +%d -%d =%d" % (len(self.added), len(self.removed), self.unchanged)
+        if self.dry_run:
+            summary += " (dry run)"
+        if self.failures:
+            summary += " (%d failed)" % len(self.failures)
+        return summary
+
+def sync_filter_rules(gnip, publisher_scope, publisher_name, filter_name, desired_rules, dry_run=False,
+                      chunk_size=DEFAULT_CHUNK_SIZE, max_workers=8):
+    """Change a Filter's rules to match a desired set.
+
+    @type gnip Gnip
+    @param gnip The Gnip connection to use
+    @type publisher_scope string
+    @param publisher_scope The scope of the publisher (my, public or gnip)
+    @type publisher_name string
+    @param publisher_name The publisher of the filter
+    @type filter_name string
+    @param filter_name The filter to update
+    @type desired_rules list of Rule
+    @param desired_rules The rules the Filter should have
+    @type dry_run boolean
+    @param dry_run Only work out the changes, don't send them
+    @type chunk_size int
+    @param chunk_size The most rules added in one request
+    @type max_workers int
+    @param max_workers The number of requests sent concurrently
+    @return Response containing a SyncSummary, or the Response of
+        find_filter if the Filter couldn't be retrieved
+
+    Fetches the Filter once, then sends the additions in chunks and the
+    removals one rule per request, all on a pool of worker threads. The
+    Response code is 200 if every change was made, otherwise the code of
+    the first failed request.
+
+    """
+
+    response = gnip.find_filter(publisher_scope, publisher_name, filter_name)
+    if response.code != 200:
+        return response
+
+    additions, removals, unchanged = diff_rules(response.result.rules, desired_rules)
+    summary = SyncSummary((publisher_scope, publisher_name, filter_name), additions, removals, unchanged, dry_run)
+    if dry_run or not (additions or removals):
+        return Response(200, summary)
+
+    # Each change is the rules it affects, the Gnip method and its last argument
+    changes = []
+    for start in range(0, len(additions), chunk_size):
+        chunk = additions[start:start + chunk_size]
+        changes.append((chunk, gnip.add_rules_to_filter, chunk))
+    for rule in removals:
+        changes.append(([rule], gnip.remove_rule_from_filter, rule))
+
+    pool = workers.WorkerPool(min(max_workers, len(changes)))
+    try:
+        futures = [(rules, pool.submit(method, publisher_scope, publisher_name, filter_name, argument))
+                   for rules, method, argument in changes]
+        for rules, future in futures:
+            try:
+                change_response = future.result()
+            except Exception, e:
+                change_response = Response(None, Error(str(e)))
+            if change_response.code != 200:
+                summary.failures.append((rules, change_response))
+    finally:
+        pool.shutdown(wait=False)
+
+    summary.requests = len(changes)
+    if summary.failures:
+        return Response(summary.failures[0][1].code, summary)
+    return Response(200, summary)
@@ -0,0 +1,132 @@
+import random
+import datetime
+import activity
+import activities
+import place
+import payload
+import xml_objects
+
+WORDS = ("gnip", "activity", "update", "photo", "video", "link", "post", "comment", "friend", "status",
+         "music", "travel", "coffee", "weekend", "code", "python", "release", "meeting", "lunch", "launch")
+
+ACTIONS = ("update", "post", "upload", "share", "comment", "favorite")
+
+class ActivityGenerator(object):
+    """Generates deterministic synthetic Activities.
+
+    The same seed and index always produce the same Activity, so data sets
+    can be recreated exactly when comparing runs. Repeated fields are
+    filled with the number of entries given to the constructor, and a raw
+    payload of payload_size bytes is attached if payload_size is not zero.
+
+    """
+
+    def __init__(self, seed=0, payload_size=0, places=1, actors=1, tags=2, tos=1, regarding_urls=1,
+                 start=datetime.datetime(2008, 7, 1)):
+        """Initialize the class.
+
+        @type seed int
+        @param seed Selects the data set
+        @type payload_size int
+        @param payload_size Bytes of raw payload per activity, 0 for no payload
+        @type places int
+        @param places Places per activity
+        @type actors int
+        @param actors Actors per activity
+        @type tags int
+        @param tags Tags per activity
+        @type tos int
+        @param tos Tos per activity
+        @type regarding_urls int
+        @param regarding_urls Regarding URLs per activity
+        @type start datetime
+        @param start The time of the first activity; later ones follow a second apart
+
+        """
+
+        self.seed = seed
+        self.payload_size = payload_size
+        self.places = places
+        self.actors = actors
+        self.tags = tags
+        self.tos = tos
+        self.regarding_urls = regarding_urls
+        self.start = start
+
+    def activity(self, index, at=None):
+        """Return the Activity at an index of the data set.
+
+        @type index int
+        @param index The position of the activity in the data set
+        @type at datetime
+        @param at The time of the activity, by default start plus index seconds
+        @return Activity
+        """
+
+        rand = random.Random(self.seed * 1000003 + index)
+        if at is None:
+            at = self.start + datetime.timedelta(seconds=index)
+        user = "user%d" % rand.randint(0, 9999)
+
+        places = [place.Place(point=xml_objects.Point(round(rand.uniform(-90, 90), 4), round(rand.uniform(-180, 180), 4)),
+                              elev=float(rand.randint(0, 3000)), floor=rand.randint(0, 20),
+                              feature_type_tag="city", feature_name="Place %d" % rand.randint(0, 999),
+                              relationship_tag="is-located-at")
+                  for i in range(self.places)]
+        actors = [xml_objects.Actor(value=user, uid=str(rand.randint(0, 999999)),
+                                    meta_url="http://example.com/people/" + user)
+                  for i in range(self.actors)]
+        tags = [xml_objects.Tag(value=rand.choice(WORDS), meta_url="http://example.com/tags/" + str(i))
+                for i in range(self.tags)]
+        tos = [xml_objects.To(value="user%d" % rand.randint(0, 9999), meta_url="http://example.com/people/")
+               for i in range(self.tos)]
+        regarding_urls = [xml_objects.URL(value="http://example.com/posts/%d" % rand.randint(0, 999999))
+                          for i in range(self.regarding_urls)]
+
+        a_payload = None
+        if self.payload_size:
+            a_payload = payload.Payload(title=self.text(rand, 40), body=self.text(rand, 200),
+                                        raw=self.text(rand, self.payload_size))
+
+        return activity.Activity(at=at, action=rand.choice(ACTIONS), activity_id="%d-%d" % (self.seed, index),
+                                 url="http://example.com/activity/%d" % index, sources=["web"],
+                                 places=places, actors=actors, tags=tags, tos=tos,
+                                 regarding_urls=regarding_urls, payload=a_payload)
+
+    def activities(self, count, first=0):
+        """Return Activities holding count activities from the data set.
+
+        @type count int
+        @param count The number of activities
+        @type first int
+        @param first The index of the first activity
+        @return Activities
+        """
+
+        return activities.Activities([self.activity(index) for index in xrange(first, first + count)])
+
+    def bucket(self, bucket_time, count):
+        """Return the activities of a one minute bucket.
+
+        @type bucket_time datetime
+        @param bucket_time The start of the minute
+        @type count int
+        @param count The number of activities in the bucket
+        @return Activities with activity times spread across the minute
+        """
+
+        first = int((bucket_time - self.start).days * 1440 + (bucket_time - self.start).seconds // 60) * count
+        return activities.Activities([
+            self.activity(first + i, bucket_time + datetime.timedelta(seconds=60.0 * i / max(count, 1)))
+            for i in xrange(count)])
+
+    def text(self, rand, size):
+        """Return size bytes of words chosen by rand."""
+
+        words = []
+        length = 0
+        while length < size:
+            word = rand.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[:size]
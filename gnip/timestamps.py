@@ -0,0 +1,113 @@
+import re
+import datetime
+
+# Parsed times are remembered for this many distinct strings; the cache is
+# emptied when it is full
+CACHE_SIZE = 4096
+
+FORMAT = "%04d-%02d-%02dT%02d:%02d:%02d.000Z"
+
+# The forms of time Gnip uses, which parse_time() handles without iso8601
+GNIP_TIME_REGEX = re.compile(r"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[-+]\d\d:\d\d)$")
+
+_parsed = {}
+_tzinfos = {}
+_last_formatted = (None, None)
+
+def parse_time(string):
+    """Convert an ISO 8601 time into a datetime.
+
+    @type string string
+    @param string The time, such as "2008-07-02T11:16:16.000Z"
+    @return datetime with a tzinfo, the same as iso8601.parse_date()
+
+    Times in the forms Gnip uses, YYYY-MM-DDTHH:MM:SS with optional
+    fractional seconds and a Z or +HH:MM offset, are parsed directly;
+    anything else is handed to iso8601.parse_date(), which raises
+    iso8601.ParseError if it can't be parsed. The activities in a bucket
+    often share a time, so recently parsed strings are cached, and
+    repeated times return the same datetime object.
+
+    """
+
+    try:
+        at = _parsed.get(string)
+    except TypeError:
+        at = None
+    if at is not None:
+        return at
+
+    at = parse_gnip_time(string)
+    if at is None:
+        import iso8601
+        at = iso8601.parse_date(string)
+
+    if len(_parsed) >= CACHE_SIZE:
+        _parsed.clear()
+    _parsed[string] = at
+    return at
+
+def parse_gnip_time(string):
+    """Parse a time in one of the forms Gnip uses.
+
+    @return datetime, or None if the string is in any other form
+    """
+
+    if not isinstance(string, basestring):
+        return None
+    match = GNIP_TIME_REGEX.match(string)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+
+    microsecond = 0
+    if fraction and fraction != "000":
+        # The same rounding as iso8601.parse_date()
+        microsecond = int(float("0." + fraction) * 1e6)
+
+    tzinfo = _tzinfos.get(zone)
+    if tzinfo is None:
+        tzinfo = get_tzinfo(zone)
+
+    try:
+        return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+            microsecond, tzinfo)
+    except ValueError:
+        return None
+
+def get_tzinfo(zone):
+    """Return the tzinfo iso8601 uses for a Z or +HH:MM zone, one instance per zone."""
+
+    # iso8601 is only imported the first time each zone is seen, so
+    # importing gnip doesn't load it
+    import iso8601
+    if zone == "Z":
+        tzinfo = iso8601.iso8601.UTC
+    else:
+        hours, minutes = int(zone[1:3]), int(zone[4:6])
+        if zone[0] == "-":
+            hours, minutes = -hours, -minutes
+        tzinfo = iso8601.iso8601.FixedOffset(hours, minutes, zone)
+    return _tzinfos.setdefault(zone, tzinfo)
+
+def format_time(at):
+    """Convert a datetime into the form Gnip uses.
+
+    @type at datetime
+    @param at The time
+    @return string such as "2008-07-02T11:16:16.000Z"
+
+    The time is formatted as it is, without converting it to UTC. The last
+    datetime formatted is remembered, so the activities of a bucket,
+    which share the datetime objects returned by parse_time(), format
+    each repeated time only once.
+
+    """
+
+    global _last_formatted
+    last_at, last_string = _last_formatted
+    if at is last_at:
+        return last_string
+    string = FORMAT % (at.year, at.month, at.day, at.hour, at.minute, at.second)
+    _last_formatted = (at, string)
+    return string
@@ -0,0 +1,202 @@
+import sys
+import threading
+import Queue
+
+class Future(object):
+    """The pending result of a call submitted to a WorkerPool."""
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__state = "pending"
+        self.__result = None
+        self.__exc_info = None
+        self.__callbacks = []
+
+    def cancel(self):
+        """Cancel the call if it has not started running.
+
+        @return boolean True if the call was cancelled
+        """
+
+        self.__condition.acquire()
+        try:
+            if self.__state == "pending":
+                self.__state = "cancelled"
+                self.__condition.notifyAll()
+            cancelled = self.__state == "cancelled"
+        finally:
+            self.__condition.release()
+        if cancelled:
+            self.__run_callbacks()
+        return cancelled
+
+    def cancelled(self):
+        return self.__state == "cancelled"
+
+    def done(self):
+        return self.__state in ("finished", "cancelled")
+
+    def result(self, timeout=None):
+        """Wait for the call to complete and return its result.
+
+        @type timeout float
+        @param timeout Seconds to wait, None to wait forever
+        @return the value returned by the call
+
+        Re-raises any exception raised by the call.
+        """
+
+        self.__wait(timeout)
+        if self.__exc_info is not None:
+            raise self.__exc_info[0], self.__exc_info[1], self.__exc_info[2]
+        return self.__result
+
+    def exception(self, timeout=None):
+        """Wait for the call to complete and return the exception it raised, or None."""
+
+        self.__wait(timeout)
+        if self.__exc_info is not None:
+            return self.__exc_info[1]
+        return None
+
+    def add_done_callback(self, callback):
+        """Call callback(future) once the call completes or is cancelled."""
+
+        self.__condition.acquire()
+        try:
+            if not self.done():
+                self.__callbacks.append(callback)
+                return
+        finally:
+            self.__condition.release()
+        callback(self)
+
+    def run(self, function, args, kwargs):
+        self.__condition.acquire()
+        try:
+            if self.__state != "pending":
+                return
+            self.__state = "running"
+        finally:
+            self.__condition.release()
+
+        try:
+            result = function(*args, **kwargs)
+        except:
+            self.set_exc_info(sys.exc_info())
+        else:
+            self.set_result(result)
+
+    def set_result(self, result):
+        """Complete the Future with a result, unless it is already done.
+
+        For Futures completed by something other than a WorkerPool, such as
+        AsyncGnip's event loop.
+        """
+
+        self.__finish(result, None)
+
+    def set_exc_info(self, exc_info):
+        """Complete the Future with an exception, as returned by sys.exc_info()."""
+
+        self.__finish(None, exc_info)
+
+    def __finish(self, result, exc_info):
+        self.__condition.acquire()
+        try:
+            if self.done():
+                return
+            self.__result = result
+            self.__exc_info = exc_info
+            self.__state = "finished"
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+        self.__run_callbacks()
+
+    def __wait(self, timeout):
+        self.__condition.acquire()
+        try:
+            if not self.done():
+                self.__condition.wait(timeout)
+            if self.__state == "cancelled":
+                raise CancelledError()
+            if not self.done():
+                raise TimeoutError()
+        finally:
+            self.__condition.release()
+
+    def __run_callbacks(self):
+        callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+class CancelledError(Exception):
+    """Raised when waiting on a Future whose call was cancelled."""
+
+class TimeoutError(Exception):
+    """Raised when a Future does not complete within the given timeout."""
+
+class WorkerPool(object):
+    """A fixed size pool of daemon threads that run submitted calls."""
+
+    def __init__(self, size):
+        """Initialize the class.
+
+        @type size int
+        @param size The number of worker threads
+        """
+
+        self.size = size
+        self.__queue = Queue.Queue()
+        self.__threads = []
+        for i in range(size):
+            thread = threading.Thread(target=self.__work)
+            thread.setDaemon(True)
+            thread.start()
+            self.__threads.append(thread)
+
+    def submit(self, function, *args, **kwargs):
+        """Schedule function(*args, **kwargs) to run on a worker thread.
+
+        @return Future for the result of the call
+        """
+
+        future = Future()
+        self.__queue.put((future, function, args, kwargs))
+        return future
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads once the queued calls have run.
+
+        @type wait boolean
+        @param wait Whether to block until the threads have exited
+        """
+
+        for thread in self.__threads:
+            self.__queue.put(None)
+        if wait:
+            for thread in self.__threads:
+                thread.join()
+
+    def __work(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            future, function, args, kwargs = item
+            future.run(function, args, kwargs)
+
+def as_completed(futures):
+    """Yield futures in the order they complete.
+
+    @type futures list of Future
+    @param futures The futures to wait on
+    """
+
+    finished = Queue.Queue()
+    futures = list(futures)
+    for future in futures:
+        future.add_done_callback(finished.put)
+    for i in range(len(futures)):
+        yield finished.get()
@@ -1,8 +1,84 @@
 from elementtree.ElementTree import *
-import urllib
 import string
+import imports
+import xml_writer
 
-class URL(object):
+class SlottedObject(object):
+    """Base class of objects that keep their fields in __slots__.
+
+    Objects with __slots__ have no __dict__ for pickle to save, so the
+    fields named by the __slots__ of the class and its bases are pickled
+    as a dictionary instead. Fields that have not been set are left out.
+
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        state = {}
+        for name in slot_names(self.__class__):
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+def slot_names(cls):
+    """Return the attribute names of the __slots__ of a class and its bases."""
+
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        if isinstance(slots, basestring):
+            slots = (slots,)
+        for name in slots:
+            if name.startswith("__") and not name.endswith("__"):
+                # Private slots are stored under their mangled names
+                name = "_" + klass.__name__.lstrip("_") + name
+            if name not in names:
+                names.append(name)
+    return names
+
+class ValueObject(SlottedObject):
+    """Base class of the Gnip value types.
+
+    Each subclass defines key(), returning its fields. Two values are
+    equal, and hash the same, when their keys are equal, so values can be
+    kept in sets and used as dictionary keys. Values are immutable, so
+    that they can't change while they are in a set or dictionary, or in a
+    Filter's fingerprinted rules: make a new value instead.
+
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s objects are immutable" % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s objects are immutable" % self.__class__.__name__)
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __cmp__(self, other):
+        if isinstance(other, self.__class__):
+            return cmp(self.key(), other.key())
+        return 1
+
+class URL(ValueObject):
     """Gnip URL container class.
     
     value:    string representation of the URL
@@ -10,23 +86,18 @@ class URL(object):
     
     """
 
+    __slots__ = ("value", "meta_url")
+
     def __init__(self, value=None, meta_url=None):
-        self.value = value
-        self.meta_url = meta_url
+        ValueObject.__init__(self, value=value, meta_url=meta_url)
 
     def __str__(self):
         return "[" + str(self.value) + ", " + str(self.meta_url) + "]"
 
-    def __cmp__(self, other):
-        if isinstance(other, URL):
-            ret = cmp(self.value, other.value)
-            if ret == 0:
-                ret = cmp(self.meta_url, other.meta_url)
-        else:
-            ret = 1
-        return ret
+    def key(self):
+        return (self.value, self.meta_url)
 
-class Actor(object):
+class Actor(ValueObject):
     """Gnip Actor container class
     
     value:     string representation of the Actor
@@ -35,15 +106,18 @@ class Actor(object):
     
     """
 
+    __slots__ = ("value", "uid", "meta_url")
+
     def __init__(self, value=None, uid=None, meta_url=None):
-        self.value = value
-        self.uid = uid
-        self.meta_url = meta_url
+        ValueObject.__init__(self, value=value, uid=uid, meta_url=meta_url)
 
     def __str__(self):
         return "[" + str(self.value) + ", " + str(self.uid) + ", " + str(self.meta_url) + "]"
 
-class Tag(object):
+    def key(self):
+        return (self.value, self.uid, self.meta_url)
+
+class Tag(ValueObject):
     """Gnip Tag container class
     
     value:     string representation of the Tag
@@ -51,23 +125,18 @@ class Tag(object):
     
     """
 
+    __slots__ = ("value", "meta_url")
+
     def __init__(self, value=None, meta_url=None):
-        self.value = value
-        self.meta_url = meta_url
+        ValueObject.__init__(self, value=value, meta_url=meta_url)
 
     def __str__(self):
         return "[" + str(self.value) + ", " + str(self.meta_url) + "]"
 
-    def __cmp__(self, other):
-        if isinstance(other, Tag):
-            ret = cmp(self.value, other.value)
-            if ret == 0:
-                ret = cmp(self.meta_url, other.meta_url)
-        else:
-            ret = 1
-        return ret
+    def key(self):
+        return (self.value, self.meta_url)
 
-class To(object):
+class To(ValueObject):
     """Gnip To container class
     
     value:     string representation of the To
@@ -75,23 +144,18 @@ class To(object):
     
     """
 
+    __slots__ = ("value", "meta_url")
+
     def __init__(self, value=None, meta_url=None):
-        self.value = value
-        self.meta_url = meta_url
+        ValueObject.__init__(self, value=value, meta_url=meta_url)
 
     def __str__(self):
         return "[" + str(self.value) + ", " + str(self.meta_url) + "]"
 
-    def __cmp__(self, other):
-        if isinstance(other, To):
-            ret = cmp(self.value, other.value)
-            if ret == 0:
-                ret = cmp(self.meta_url, other.meta_url)
-        else:
-            ret = 1
-        return ret
+    def key(self):
+        return (self.value, self.meta_url)
 
-class Point(object):
+class Point(ValueObject):
     """Gnip Point container class
     
     x:     float representation of the x coordinate
@@ -99,30 +163,18 @@ class Point(object):
     
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x=None, y=None):
-        self.x = x
-        self.y = y
+        ValueObject.__init__(self, x=x, y=y)
 
     def __str__(self):
         return "[" + str(self.x) + ", " + str(self.y) + "]"
 
-    def __cmp__(self, other):
-        if isinstance(other, Point):
-            if self.x < other.x:
-                ret = -1
-            elif self.x > other.x:
-                ret = 1
-            elif self.y < other.y:
-                ret = -1
-            elif self.y > other.y:
-                ret = 1
-            else:
-                ret = 0
-        else:
-            ret = 1
-        return ret
+    def key(self):
+        return (self.x, self.y)
 
-class Rule(object):
+class Rule(ValueObject):
     """Gnip Rule container class
     
     type:    string representation of the rule type
@@ -130,30 +182,24 @@ class Rule(object):
     
     """
 
+    __slots__ = ("type", "value")
+
     def __init__(self, type=None, value=None):
-        self.type = type
-        self.value = value
+        ValueObject.__init__(self, type=type, value=value)
 
     def to_delete_query_string(self):
+        # urllib loads socket and ssl, too slow to import with gnip
+        urllib = imports.load("urllib")
         return urllib.urlencode([("type",self.type),("value",self.value)])
 
     def to_xml(self):
-        rule_node = Element("rule")
-        rule_node.text = self.value
-        rule_node.set("type", self.type)
-        return tostring(rule_node)
+        return xml_writer.element("rule", {"type": self.type}, self.value)
 
     def __str__(self):
         return "[" + str(self.type) + ", " + str(self.value) + "]"
 
-    def __cmp__(self, other):
-        if isinstance(other, Rule):
-            ret = cmp(self.type, other.type)
-            if ret is 0:
-                ret = cmp(self.value, other.value)
-        else:
-            ret = 1
-        return ret
+    def key(self):
+        return (self.type, self.value)
 
 class Result(object):
     """Gnip Result container class
@@ -0,0 +1,133 @@
+# Serialize as tostring does: non-ASCII characters become character references
+ENCODING = "us-ascii"
+
+CHUNK_SIZE = 64 * 1024
+
+def escape_text(text):
+    """Escape the text content of an element.
+
+    @type text string
+    @param text The text, str or unicode
+    @return str with &, < and > escaped, and any non-ASCII characters as
+        character references
+    """
+
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if isinstance(text, unicode):
+        text = text.encode(ENCODING, "xmlcharrefreplace")
+    return text
+
+def escape_attribute(value):
+    """Escape an attribute value, as escape_text() and also escaping quotes.
+
+    Newlines become &#10;, as tostring() writes them. Carriage returns and
+    tabs are left as they are, also as tostring() does, so the output stays
+    byte for byte the same.
+    """
+
+    value = escape_text(value)
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    return value
+
+def element(tag, attributes=None, text=None):
+    """Return the XML for an element with no children.
+
+    @type tag string
+    @param tag The element name
+    @type attributes dictionary
+    @param attributes The attributes of the element
+    @type text string
+    @param text The text content of the element, or None
+    @return string identical to tostring() of the same Element
+    """
+
+    if text:
+        return "<" + tag + _attributes(attributes) + ">" + escape_text(text) + "</" + tag + ">"
+    return "<" + tag + _attributes(attributes) + " />"
+
+def start_tag(tag, attributes=None):
+    """Return the opening tag of an element that has children."""
+
+    return "<" + tag + _attributes(attributes) + ">"
+
+def end_tag(tag):
+    return "</" + tag + ">"
+
+def _attributes(attributes):
+    if not attributes:
+        return ""
+    return "".join([' %s="%s"' % (name, escape_attribute(value))
+                    for name, value in sorted(attributes.items())])
+
+def chunked(parts, chunk_size=CHUNK_SIZE):
+    """Join small strings into chunks of about chunk_size bytes.
+
+    @type parts iterable of strings
+    @param parts The strings to join
+    @return iterator of strings
+    """
+
+    chunk = []
+    size = 0
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk)
+
+def iter_rule_parts(rules):
+    for rule in rules:
+        yield element("rule", {"type": rule.type}, rule.value)
+
+def iter_filter_xml(a_filter, chunk_size=CHUNK_SIZE):
+    """Serialize a Filter a chunk at a time.
+
+    @type a_filter Filter
+    @param a_filter The Filter to serialize
+    @type chunk_size int
+    @param chunk_size The approximate size of each chunk in bytes
+    @return iterator of strings which join to Filter.to_xml()
+    """
+
+    attributes = {"name": a_filter.name, "fullData": str(a_filter.full_data).lower()}
+    if a_filter.post_url is None and not a_filter.rules:
+        return iter([element("filter", attributes)])
+    return chunked(_filter_parts(a_filter, attributes), chunk_size)
+
+def _filter_parts(a_filter, attributes):
+    yield start_tag("filter", attributes)
+    if a_filter.post_url is not None:
+        yield element("postURL", None, a_filter.post_url)
+    for part in iter_rule_parts(a_filter.rules):
+        yield part
+    yield end_tag("filter")
+
+def iter_rules_xml(rules, chunk_size=CHUNK_SIZE):
+    """Serialize a <rules> document, as sent by Gnip.add_rules_to_filter, a chunk at a time.
+
+    @type rules list of Rule
+    @param rules The rules to serialize
+    @type chunk_size int
+    @param chunk_size The approximate size of each chunk in bytes
+    @return iterator of strings
+    """
+
+    return chunked(_rules_parts(rules), chunk_size)
+
+def _rules_parts(rules):
+    yield "<rules>"
+    for part in iter_rule_parts(rules):
+        yield part
+    yield "</rules>"
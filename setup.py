@@ -9,7 +9,6 @@ setup(
     install_requires = [
             'iso8601 == 0.1.4',
             'pyjavaproperties == 0.3',
-            'elementtree == 1.2.7_20070827_preview',
-            'httplib2 == 0.4'
+            'elementtree == 1.2.7_20070827_preview'
     ]
 )
@@ -9,6 +9,7 @@ import datetime
 from xml.dom.minidom import parseString
 import logging
 import random
+import StringIO
 
 class ActivityTestCase(unittest.TestCase):
     def setUp(self):
@@ -56,6 +57,60 @@ class ActivityTestCase(unittest.TestCase):
         actual_xml = a.to_xml()
         self.assertEquals(self.drop_whitespace(xml), self.drop_whitespace(actual_xml))
 
+    def testActivitiesXmlStreams(self):
+        xml = '<?xml version="1.0" encoding="utf-8"?><activities>' + \
+              '<activity><at>2008-07-02T11:16:16.000Z</at><action>update</action><activityID>1</activityID>' + \
+              '<actor>bob</actor><payload><title>Title</title><raw>raw</raw></payload></activity>' + \
+              '<activity><at>2008-07-02T11:16:17.000Z</at><action>delete</action><activityID>2</activityID>' + \
+              '<tag>trains</tag></activity>' + \
+              '</activities>'
+        a = Activities()
+        streamed = a.iter_from_xml(StringIO.StringIO(xml))
+        first = streamed.next()
+        self.assertEquals("1", first.activity_id)
+        self.assertEquals("bob", first.actors[0].value)
+        self.assertEquals("Title", first.payload.title)
+        rest = list(streamed)
+        self.assertEquals(1, len(rest))
+        self.assertEquals("delete", rest[0].action)
+        self.assertEquals("trains", rest[0].tags[0].value)
+        self.assertEquals(0, len(a.items))
+
+        self.assertEquals(["1", "2"], [an_activity.activity_id for an_activity in a.iter_from_xml(xml)])
+
+    def testLazyActivitiesMatchEagerOnes(self):
+        xml = '<?xml version="1.0" encoding="utf-8"?><activities>' + \
+              '<activity><at>2008-07-02T11:16:16.000Z</at><action>update</action><activityID>1</activityID>' + \
+              '<actor uid="7">bob</actor><place><point>1.0 -2.0</point></place>' + \
+              '<payload><title>Title</title><raw>raw</raw></payload></activity>' + \
+              '<activity><at>2008-07-02T11:16:17.000Z</at><action>delete</action><activityID>2</activityID>' + \
+              '<tag>trains</tag></activity>' + \
+              '</activities>'
+        eager = Activities()
+        eager.from_xml(xml)
+        lazy = Activities(lazy=True)
+        lazy.from_xml(xml)
+        streamed = list(Activities(lazy=True).iter_from_xml(xml))
+
+        self.assertTrue(isinstance(lazy.items[0], activity.LazyActivity))
+        self.assertEquals(["1", "2"], [an_activity.activity_id for an_activity in streamed])
+        self.assertEquals(eager.to_xml(), lazy.to_xml())
+        self.assertEquals(eager.to_xml(), Activities(streamed).to_xml())
+        self.assertEquals("Title", streamed[0].payload.title)
+
+    def testPayloadRawsInBulk(self):
+        from gnip import synthetic
+        published = synthetic.ActivityGenerator(payload_size=500).activities(30)
+        published.items[3].payload = None
+        published.encode_raws(processes=2)
+        raws = [an_activity.payload and an_activity.payload.read_raw() for an_activity in published.items]
+
+        received = Activities()
+        received.from_xml(published.to_xml())
+        self.assertEqual(raws, received.read_raws(processes=2))
+        self.assertEqual(None, raws[3])
+        self.assertFalse(received.items[0].payload.needs_decoding())
+
     def drop_whitespace(self, xml):
         pattern = re.compile("\w")
         pattern.sub(xml,"")
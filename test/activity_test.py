@@ -6,6 +6,7 @@ import re
 import StringIO
 import gzip
 import base64
+import pickle
 from xml.dom.minidom import parseString
 sys.path.append("../")
 from gnip import activity
@@ -273,6 +274,79 @@ class ActivityTestCase(unittest.TestCase):
         self.assertEqual(actual.group(1) + actual.group(3), expected.group(1) + expected.group(3))
         self.assertEqual(self.__decode_and_ungzip(actual.group(2)), self.__decode_and_ungzip(expected.group(2)))
 
+    def testAbsentRepeatedFieldsAreEmpty(self):
+        an_activity = activity.Activity()
+        an_activity.from_xml('<activity><at>2008-07-02T11:16:16+00:00</at><action>upload</action></activity>')
+        for field in [an_activity.sources, an_activity.places, an_activity.actors, an_activity.destination_urls,
+                      an_activity.tags, an_activity.tos, an_activity.regarding_urls]:
+            self.assertEqual((), field)
+        self.assertEqual(None, an_activity.payload)
+        self.assertEqual(an_activity.to_xml(), activity.Activity(at=an_activity.at, action="upload").to_xml())
+
+        # Activities and their child objects have no per instance dictionary
+        self.assertFalse(hasattr(an_activity, "__dict__"))
+        self.assertFalse(hasattr(payload.Payload(body="body"), "__dict__"))
+        self.assertFalse(hasattr(place.Place(), "__dict__"))
+        self.assertFalse(hasattr(Actor("joe"), "__dict__"))
+        self.assertRaises(AttributeError, setattr, an_activity, "color", "red")
+
+    def testAbsentRepeatedFieldsAreImmutable(self):
+        xml = '<activity><at>2008-07-02T11:16:16+00:00</at><action>upload</action><tag>a</tag></activity>'
+        eager = activity.Activity()
+        eager.from_xml(xml)
+        for an_activity in [eager, activity.LazyActivity(activity.fromstring(xml))]:
+            self.assertTrue(isinstance(an_activity.tos, tuple))
+            self.assertTrue(an_activity.tos is an_activity.actors)
+            self.assertRaises(AttributeError, getattr, an_activity.tos, "append")
+            an_activity.tos = list(an_activity.tos) + [To("joe")]
+            self.assertEqual([To("joe")], an_activity.tos)
+
+            # Fields that are present are lists, as before
+            an_activity.tags.append(Tag("b"))
+            self.assertEqual([Tag("a"), Tag("b")], an_activity.tags)
+
+    def testLazyActivityDecodesFieldsWhenRead(self):
+        node = activity.fromstring(self.xml_with_payload)
+        an_activity = activity.LazyActivity(node)
+        node.find("at").text = "not a time"
+
+        # Only the fields read are decoded, so the bad time goes unnoticed
+        self.assertEqual(self.testActivityIdValue, an_activity.activity_id)
+        self.assertEqual(self.testActorUid2, an_activity.actors[1].uid)
+        self.assertTrue(an_activity.actors is an_activity.actors)
+        self.assertEqual(self.testRaw, an_activity.payload.read_raw())
+        self.assertRaises(Exception, getattr, an_activity, "at")
+
+        # Assigned fields are not decoded at all
+        an_activity.at = datetime.datetime(2001, 1, 1, 1, 1)
+        an_activity.sources = ["mine"]
+        self.assertEqual(["mine"], an_activity.sources)
+        self.assertEqual(self.testTimeStringValue, an_activity.get_at_as_string())
+
+        eager = activity.Activity()
+        eager.from_xml(self.xml_with_payload)
+        eager.sources = ["mine"]
+        self.assertEqual(eager.to_xml(), an_activity.to_xml())
+        self.assertFalse(hasattr(an_activity, "__dict__"))
+
+        empty = activity.LazyActivity()
+        self.assertEqual(None, empty.actors)
+        empty.from_xml(self.xml_without_payload)
+        self.assertEqual(self.testActionValue, empty.action)
+        self.assertEqual(None, empty.payload)
+
+    def testPickle(self):
+        an_activity = activity.Activity()
+        an_activity.from_xml(self.xml_with_payload)
+        lazy = activity.LazyActivity(activity.fromstring(self.xml_with_payload))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for original in [an_activity, lazy]:
+                copy = pickle.loads(pickle.dumps(original, protocol))
+                self.assertEqual(original.__class__, copy.__class__)
+                self.assertEqual(an_activity.to_xml(), copy.to_xml())
+                self.assertEqual(self.testRaw, copy.payload.read_raw())
+                self.assertEqual(an_activity.places[0].point, copy.places[0].point)
+
     def __decode_and_ungzip(self, data):
         decoded = base64.b64decode(data)
         zbuf = StringIO.StringIO(decoded)
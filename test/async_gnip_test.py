@@ -0,0 +1,283 @@
+import sys
+sys.path.append("../")
+from gnip import *
+from gnip import async_gnip
+from gnip import local_server
+from gnip import synthetic
+from gnip import workers
+import unittest
+import datetime
+import threading
+import httplib
+import socket
+import time
+
+class AsyncGnipTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = local_server.LocalGnipServer(username="user", password="password",
+            activities_per_bucket=5).start()
+        self.server.add_publisher("test")
+        self.gnip = async_gnip.AsyncGnip("user", "password", self.server.url, retry_backoff=0.001)
+
+    def tearDown(self):
+        self.gnip.close()
+        self.server.stop()
+
+    def testManyRequestsShareOneThreadAndFewConnections(self):
+        self.gnip.close()
+        self.gnip = async_gnip.AsyncGnip("user", "password", self.server.url, pool_max_size=5)
+        self.server.latency = 0.2
+        started = time.time()
+        futures = [self.gnip.get_publisher_activities("my", "test") for i in range(50)]
+        for future in workers.as_completed(futures):
+            self.assertEqual(200, future.result().code)
+        # Ten rounds of five requests, rather than fifty one after another
+        self.assertTrue(time.time() - started < 5)
+        loops = [thread for thread in threading.enumerate() if thread.getName() == "gnip-event-loop"]
+        self.assertEqual(1, len(loops))
+        stats = self.gnip.get_pool_stats()
+        self.assertEqual(5, stats['created'])
+        self.assertEqual(45, stats['reused'])
+        self.assertEqual(0, stats['in_flight'])
+
+    def testResultsMatchGnip(self):
+        g = Gnip("user", "password", self.server.url)
+        # Half way through the minute, so each client's clock correction lands in it
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        expected = g.get_publisher_activities("my", "test", bucket_time)
+        response = self.gnip.get_publisher_activities("my", "test", bucket_time).result()
+        self.assertEqual(200, response.code)
+        self.assertEqual([a.activity_id for a in expected.result.items],
+            [a.activity_id for a in response.result.items])
+        self.assertEqual("test", self.gnip.get_publisher("my", "test").result().result.name)
+        self.assertEqual(404, self.gnip.get_publisher("my", "missing").result().code)
+        g.close()
+
+    def testFiltersAndRules(self):
+        rule = Rule("actor", "joe")
+        a_filter = filter.Filter("f", rules=[rule])
+        self.assertEqual(200, self.gnip.create_filter("my", "test", a_filter).result().code)
+        self.assertEqual(a_filter, self.gnip.find_filter("my", "test", "f").result().result)
+
+        self.assertEqual(200, self.gnip.add_rule_to_filter("my", "test", "f", Rule("tag", "x")).result().code)
+        self.assertTrue(self.gnip.rule_exists_in_filter("my", "test", "f", Rule("tag", "x")).result())
+        self.assertEqual(200, self.gnip.remove_rule_from_filter("my", "test", "f", Rule("tag", "x")).result().code)
+        self.assertFalse(self.gnip.rule_exists_in_filter("my", "test", "f", Rule("tag", "x")).result())
+
+        # The same operations tunnelled over POST
+        self.gnip.tunnel_over_post = True
+        self.assertEqual(200, self.gnip.add_rules_to_filter("my", "test", "f", [Rule("actor", "bob")]).result().code)
+        self.assertEqual(200, self.gnip.remove_rule_from_filter("my", "test", "f", Rule("actor", "bob")).result().code)
+        self.assertEqual([rule], self.gnip.find_filter("my", "test", "f").result().result.rules)
+        self.assertEqual(200, self.gnip.update_filter("my", "test", filter.Filter("f", rules=[Rule("actor", "al")])).result().code)
+        self.assertEqual([Rule("actor", "al")], self.gnip.find_filter("my", "test", "f").result().result.rules)
+        self.assertEqual(200, self.gnip.delete_filter("my", "test", "f").result().code)
+        self.assertEqual(404, self.gnip.find_filter("my", "test", "f").result().code)
+
+    def testPublishers(self):
+        self.assertEqual(200, self.gnip.create_publisher(publisher.Publisher("other", ["actor"])).result().code)
+        self.assertEqual(200, self.gnip.update_publisher(publisher.Publisher("other", ["tag"])).result().code)
+        self.assertEqual(["tag"], self.gnip.get_publisher("my", "other").result().result.rule_types)
+
+        generator = synthetic.ActivityGenerator(seed=7, payload_size=100)
+        self.assertEqual(200, self.gnip.publish_activities("test", generator.activities(3)).result().code)
+        ids = [a.activity_id for a in self.gnip.get_publisher_activities("my", "test").result().result.items]
+        for index in range(3):
+            self.assertTrue("7-%d" % index in ids)
+
+    def testClockIsMeasuredOnceForConcurrentBuckets(self):
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10)
+        futures = [self.gnip.get_publisher_notifications("my", "test", bucket_time) for i in range(10)]
+        for future in futures:
+            self.assertEqual(200, future.result().code)
+        self.assertEqual(1, self.gnip.get_clock_stats()['measurements'])
+        self.assertEqual(11, self.server.requests)
+
+    def testBucketsUseTheLastOffsetWhileTheClockBreakerIsOpen(self):
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        self.assertEqual(200, self.gnip.get_publisher_activities("my", "test", bucket_time).result().code)
+        offset = self.gnip.get_clock_stats()['offset']
+
+        # The HEAD is rejected at once, with no Date and no elapsed time
+        self.gnip.clock.invalidate()
+        breaker = self.gnip.retry_policy.get_breaker("HEAD /")
+        for i in range(breaker.failure_threshold):
+            breaker.record_failure()
+        futures = [self.gnip.get_publisher_activities("my", "test", bucket_time) for i in range(3)]
+        for future in futures:
+            self.assertEqual(200, future.result(5).code)
+        stats = self.gnip.get_clock_stats()
+        self.assertEqual(offset, stats['offset'])
+        self.assertEqual(1, stats['measurements'])
+        # Still stale, so buckets arriving after a rejection try once more
+        self.assertTrue(stats['failed_measurements'] >= 1)
+
+    def testResponsesAreParsedOffTheLoopThread(self):
+        threads = []
+        class Sink(object):
+            def record(self, event):
+                threads.append(threading.currentThread().getName())
+        self.gnip.add_instrumentation_sink(Sink())
+        futures = [self.gnip.get_publisher_activities("my", "test") for i in range(5)]
+        for future in futures:
+            self.assertEqual(5, len(future.result().result.items))
+        # A request event and a parse event for each
+        self.assertEqual(10, len(threads))
+        self.assertFalse("gnip-event-loop" in threads)
+
+    def testInjectedErrorsAreRetried(self):
+        self.server.error_rate = 0.5
+        futures = [self.gnip.get_publisher("my", "test") for i in range(10)]
+        for future in futures:
+            self.assertEqual(200, future.result().code)
+        self.assertTrue(self.server.errors > 0)
+        self.assertEqual(self.server.errors, self.gnip.get_retry_stats()['retries'])
+
+    def testConnectionFailureIsRaisedByTheFuture(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        g = async_gnip.AsyncGnip("user", "password", "http://127.0.0.1:%d" % port, retry_max=1, retry_backoff=0)
+        events = []
+        class Sink(object):
+            def record(self, event):
+                events.append(event)
+        g.add_instrumentation_sink(Sink())
+        future = g.get_publisher("my", "test")
+        self.assertRaises(socket.error, future.result, 5)
+        self.assertEqual(1, g.get_retry_stats()['retries'])
+        self.assertEqual(1, len(events))
+        self.assertEqual(None, events[0].status)
+        self.assertEqual("error", events[0].error)
+        g.close()
+
+    def testUnexpectedErrorEndsTheBreakerTrial(self):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(5)
+        def serve():
+            while True:
+                try:
+                    sock = listener.accept()[0]
+                except socket.error:
+                    return
+                sock.recv(4096)
+                sock.sendall("HTTP/1.1 200 OK\r\nContent-Length: many\r\n\r\n")
+                sock.close()
+        thread = threading.Thread(target=serve)
+        thread.setDaemon(True)
+        thread.start()
+        g = async_gnip.AsyncGnip("user", "password", "http://127.0.0.1:%d" % listener.getsockname()[1],
+            breaker_threshold=1, breaker_reset=0)
+        g.retry_policy.get_breaker("GET /{scope}/publishers/{publisher}.xml").record_failure()
+        # Each request is the trial of a half open breaker
+        for i in range(2):
+            self.assertRaises(ValueError, g.get_publisher("my", "test").result, 5)
+        self.assertEqual(0, g.get_retry_stats()['rejected'])
+        g.close()
+        listener.close()
+
+    def testCloseCancelsRequestsInProgress(self):
+        self.server.latency = 1
+        future = self.gnip.get_publisher("my", "test")
+        time.sleep(0.1)
+        self.gnip.close()
+        self.assertTrue(isinstance(future.exception(5), workers.CancelledError))
+        self.assertRaises(ValueError, self.gnip.get_publisher, "my", "test")
+
+class EventLoopTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = local_server.LocalGnipServer(username="user", password="password").start()
+        self.loop = async_gnip.EventLoop()
+        self.lookups = []
+        self.getaddrinfo = socket.getaddrinfo
+        def getaddrinfo(host, *args):
+            self.lookups.append(host)
+            if host == "localhost":
+                time.sleep(0.5)
+                host = "127.0.0.1"
+            return self.getaddrinfo(host, *args)
+        socket.getaddrinfo = getaddrinfo
+
+    def tearDown(self):
+        socket.getaddrinfo = self.getaddrinfo
+        self.loop.close()
+        self.server.stop()
+
+    def request(self, url, finished):
+        future = workers.Future()
+        def callback(resp, content, exc_info):
+            finished.append(url)
+            if exc_info is None:
+                future.set_result(resp)
+            else:
+                future.set_exc_info(exc_info)
+        self.loop.call_soon(self.loop.request, url, "GET", {}, None, callback)
+        return future
+
+    def testSlowLookupDoesNotStallOtherHosts(self):
+        port = self.server.url.rsplit(":", 1)[1]
+        finished = []
+        slow = [self.request("http://localhost:%s/my/publishers/%d.xml" % (port, i), finished) for i in range(3)]
+        fast = self.request("http://127.0.0.1:%s/my/publishers/fast.xml" % port, finished)
+        self.assertEqual(401, fast.result(5).status)
+        self.assertEqual(0, len([url for url in finished if "localhost" in url]))
+        for future in slow:
+            self.assertEqual(401, future.result(5).status)
+        # Looked up once, however many requests were waiting for it
+        self.assertEqual(1, self.lookups.count("localhost"))
+        self.assertEqual(401, self.request("http://localhost:%s/my/publishers/again.xml" % port, finished).result(5).status)
+        self.assertEqual(1, self.lookups.count("localhost"))
+
+    def testFailedLookupFailsTheWaitingRequests(self):
+        def getaddrinfo(host, *args):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        socket.getaddrinfo = getaddrinfo
+        futures = [self.request("http://nowhere.invalid/%d" % i, []) for i in range(2)]
+        for future in futures:
+            self.assertRaises(socket.gaierror, future.result, 5)
+
+class ResponseReaderTestCase(unittest.TestCase):
+
+    def read(self, pieces, verb="GET"):
+        reader = async_gnip.ResponseReader(verb)
+        for piece in pieces:
+            if reader.feed(piece):
+                return reader
+        reader.finish()
+        return reader
+
+    def testContentLength(self):
+        reader = self.read(["HTTP/1.1 200 OK\r\nContent-", "Length: 5\r\n\r\nab", "cde"])
+        self.assertEqual(200, reader.status)
+        self.assertEqual("abcde", reader.get_body())
+        self.assertTrue(reader.reusable)
+
+    def testChunkedBodyInSmallPieces(self):
+        response = "HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n2;x=y\r\nde\r\n0\r\n\r\n"
+        reader = self.read([response[i] for i in range(len(response))])
+        self.assertTrue(reader.complete)
+        self.assertEqual("abcde", reader.get_body())
+        self.assertTrue(reader.reusable)
+
+    def testBodyEndingWithTheConnection(self):
+        reader = self.read(["HTTP/1.0 200 OK\r\n\r\nabc", "de"])
+        self.assertEqual("abcde", reader.get_body())
+        self.assertFalse(reader.reusable)
+
+    def testHeadAndInterimResponses(self):
+        reader = self.read(["HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\n"], "HEAD")
+        self.assertTrue(reader.complete)
+        reader = self.read(["HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"])
+        self.assertEqual(404, reader.status)
+        self.assertEqual("Not Found", reader.reason)
+
+    def testTruncatedResponses(self):
+        self.assertRaises(httplib.BadStatusLine, self.read, [])
+        self.assertRaises(httplib.IncompleteRead, self.read, ["HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nab"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import sys
+sys.path.append("../")
+from gnip.batch_publisher import *
+from gnip.activity import Activity
+from gnip.activities import Activities
+import unittest
+import threading
+import time
+
+class FakeGnip(object):
+    def __init__(self, code=200, delay=0):
+        self.code = code
+        self.delay = delay
+        self.posts = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def publish_activities(self, publisher_name, activities):
+        self.lock.acquire()
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        self.lock.release()
+        time.sleep(self.delay)
+        xml = activities.to_xml()
+        parsed = Activities()
+        parsed.from_xml(xml)
+        self.lock.acquire()
+        self.posts.append([an_activity.activity_id for an_activity in parsed.items])
+        self.active -= 1
+        self.lock.release()
+        return Response(self.code, None)
+
+class BatchPublisherTestCase(unittest.TestCase):
+
+    def activity(self, an_id):
+        an_activity = Activity(action="update", activity_id=str(an_id))
+        an_activity.set_at_from_string("2008-07-02T11:16:16+00:00")
+        return an_activity
+
+    def testChunksByCount(self):
+        gnip = FakeGnip()
+        publisher = BatchPublisher(gnip, "test", max_chunk_count=3)
+        for i in range(7):
+            publisher.publish(self.activity(i))
+        publisher.close()
+        self.assertEqual(7, sum([len(post) for post in gnip.posts]))
+        self.assertEqual([3, 3, 1], sorted([len(post) for post in gnip.posts], reverse=True))
+        self.assertEqual(7, publisher.get_stats()['published'])
+
+    def testChunksBySize(self):
+        gnip = FakeGnip()
+        size = len(self.activity(1).to_xml())
+        publisher = BatchPublisher(gnip, "test", max_chunk_bytes=size * 2)
+        for i in range(4):
+            publisher.publish(self.activity(i))
+        publisher.flush()
+        self.assertEqual([2, 2], [len(post) for post in gnip.posts])
+        publisher.close()
+
+    def testFlushInterval(self):
+        gnip = FakeGnip()
+        publisher = BatchPublisher(gnip, "test", flush_interval=0.05)
+        publisher.publish(self.activity(1))
+        time.sleep(0.2)
+        self.assertEqual([["1"]], gnip.posts)
+        publisher.close()
+
+    def testRequestsAreSentConcurrently(self):
+        gnip = FakeGnip(delay=0.05)
+        publisher = BatchPublisher(gnip, "test", max_chunk_count=1, in_flight=3)
+        for i in range(9):
+            publisher.publish(self.activity(i))
+        publisher.close()
+        self.assertEqual(3, gnip.max_active)
+        self.assertEqual(9, len(gnip.posts))
+
+    def testCallbacks(self):
+        succeeded = []
+        failed = []
+        publisher = BatchPublisher(FakeGnip(code=503), "test", max_chunk_count=2,
+            on_success=lambda chunk, response: succeeded.append(chunk),
+            on_failure=lambda chunk, response: failed.append((len(chunk), response.code)))
+        for i in range(3):
+            publisher.publish(self.activity(i))
+        publisher.close()
+        self.assertEqual([], succeeded)
+        self.assertEqual([(2, 503), (1, 503)], sorted(failed, reverse=True))
+        self.assertEqual(3, publisher.get_stats()['failed'])
+
+    def testClosedPublisherRejectsPublishAndFlush(self):
+        publisher = BatchPublisher(FakeGnip(), "test")
+        publisher.close()
+        self.assertRaises(ValueError, publisher.publish, self.activity(1))
+        self.assertRaises(ValueError, publisher.flush)
+        publisher.close()
+
+    def testActivitiesAcceptedDuringCloseAreSent(self):
+        gnip = FakeGnip(delay=0.01)
+        publisher = BatchPublisher(gnip, "test", max_chunk_count=1, in_flight=1, queue_size=1)
+        accepted = []
+        def produce():
+            for i in range(20):
+                try:
+                    publisher.publish(self.activity(i))
+                except ValueError:
+                    return
+                accepted.append(str(i))
+        producer = threading.Thread(target=produce)
+        producer.start()
+        time.sleep(0.03)
+        publisher.close()
+        producer.join()
+        self.assertEqual(accepted, sorted([post[0] for post in gnip.posts], key=int))
+
+if __name__ == '__main__':
+    unittest.main()
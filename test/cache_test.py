@@ -0,0 +1,56 @@
+import sys
+sys.path.append("../")
+from gnip import cache
+import unittest
+import calendar
+import os
+import shutil
+import tempfile
+
+class BucketCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = cache.BucketCache(os.path.join(self.directory, "buckets"), max_bytes=1024, closed_after=120)
+        self.bucket_start = calendar.timegm((2008, 7, 2, 11, 16, 0, 0, 0, 0))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testOnlyClosedBucketsAreCacheable(self):
+        url = "https://example.com/my/publishers/test/activity/200807021116.xml"
+        self.assertFalse(self.cache.is_cacheable(url, self.bucket_start + 30))
+        self.assertFalse(self.cache.is_cacheable(url, self.bucket_start + 179))
+        self.assertTrue(self.cache.is_cacheable(url, self.bucket_start + 180))
+        self.assertTrue(self.cache.is_cacheable(url.replace("activity", "notification"), self.bucket_start + 180))
+        self.assertFalse(self.cache.is_cacheable("https://example.com/my/publishers/test/activity/current.xml", self.bucket_start + 180))
+        self.assertFalse(self.cache.is_cacheable("https://example.com/my/publishers/test.xml", self.bucket_start + 180))
+
+    def testPutAndGet(self):
+        self.assertEqual(None, self.cache.get("a"))
+        self.cache.put("a", "<activities/>")
+        self.assertEqual("<activities/>", self.cache.get("a"))
+        stats = self.cache.get_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(0.5, stats['hit_rate'])
+
+    def testCachePersists(self):
+        self.cache.put("a", "<activities/>")
+        reopened = cache.BucketCache(self.cache.directory)
+        self.assertEqual("<activities/>", reopened.get("a"))
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        content = os.urandom(400)
+        self.cache.put("a", content)
+        self.cache.put("b", content)
+        self.cache.get("a")
+        self.cache.put("c", content)
+        self.assertEqual(content, self.cache.get("a"))
+        self.assertEqual(None, self.cache.get("b"))
+        self.assertEqual(content, self.cache.get("c"))
+        self.assertEqual(1, self.cache.get_stats()['evictions'])
+        self.assertTrue(self.cache.get_stats()['bytes'] <= 1024)
+
+if __name__ == '__main__':
+    unittest.main()
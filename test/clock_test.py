@@ -0,0 +1,96 @@
+import sys
+sys.path.append("../")
+from gnip import clock
+import unittest
+import os
+import subprocess
+
+class FakeTimer(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class ClockOffsetTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.clock = clock.ClockOffset(ttl=60, drift_tolerance=2.0, timer=self.timer)
+        self.fetches = 0
+
+    def fetch_date(self):
+        self.fetches += 1
+        # One second round trip, server is 100 seconds ahead
+        self.timer.now += 1.0
+        return "Thu, 01 Jan 1970 00:18:40 GMT"
+
+    def testParseHttpDate(self):
+        self.assertEqual(1120.5, clock.parse_http_date("Thu, 01 Jan 1970 00:18:40 GMT"))
+        self.assertEqual(None, clock.parse_http_date(None))
+        self.assertEqual(None, clock.parse_http_date("not a date"))
+
+    def testOffsetIsCorrectedForRoundTrip(self):
+        self.assertEqual(120.0, self.clock.get_offset(self.fetch_date))
+        self.assertEqual(1, self.fetches)
+
+    def testOffsetIsReusedUntilTtlExpires(self):
+        self.clock.get_offset(self.fetch_date)
+        self.timer.now += 30
+        self.clock.get_offset(self.fetch_date)
+        self.assertEqual(1, self.fetches)
+        self.assertEqual(30, self.clock.get_age())
+
+        self.timer.now += 31
+        self.clock.get_offset(self.fetch_date)
+        self.assertEqual(2, self.fetches)
+
+    def testMissingDateFallsBackToLastOffset(self):
+        self.assertEqual(0.0, self.clock.get_offset(lambda: None))
+        self.assertTrue(self.clock.is_stale())
+
+        self.clock.get_offset(self.fetch_date)
+        self.clock.invalidate()
+        self.assertEqual(120.0, self.clock.get_offset(lambda: None))
+        self.assertTrue(self.clock.is_stale())
+        self.assertEqual(2, self.clock.get_stats()['failed_measurements'])
+        self.assertEqual(1, self.clock.get_stats()['measurements'])
+
+    def testDriftTriggersRemeasure(self):
+        self.clock.get_offset(self.fetch_date)
+        self.clock.observe("Thu, 01 Jan 1970 00:18:41 GMT", 1001.0, 1001.0)
+        self.assertFalse(self.clock.is_stale())
+
+        self.clock.observe("Thu, 01 Jan 1970 00:20:00 GMT", 1001.0, 1001.0)
+        self.assertTrue(self.clock.is_stale())
+        self.assertEqual(1, self.clock.get_stats()['drift_resyncs'])
+
+    def testStats(self):
+        stats = self.clock.get_stats()
+        self.assertEqual(None, stats['offset'])
+        self.assertEqual(None, stats['age'])
+
+        self.clock.get_offset(self.fetch_date)
+        stats = self.clock.get_stats()
+        self.assertEqual(120.0, stats['offset'])
+        self.assertEqual(0, stats['age'])
+        self.assertEqual(1, stats['measurements'])
+
+    def testImportingGnipDoesNotLoadOptionalModules(self):
+        modules = ["email", "cPickle", "gnip.follower", "gnip.batch_publisher", "gnip.rule_sync",
+            "gnip.dedup", "gnip.cache", "gnip.instrumentation", "gnip.workers", "gnip.connection",
+            "gnip.retry", "httplib", "urllib", "socket", "logging", "gzip", "hashlib"]
+        script = "import sys; import gnip; print [m for m in %r if m in sys.modules]" % modules
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        output = subprocess.Popen([sys.executable, "-c", script], cwd=directory, stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual("[]", output.strip())
+
+    def testFirstGnipLoadsTheRequestModules(self):
+        script = "import sys; import gnip; gnip.Gnip('user', 'password'); " \
+            "print gnip.connection is sys.modules['gnip.connection'], gnip.retry is sys.modules['gnip.retry']"
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        output = subprocess.Popen([sys.executable, "-c", script], cwd=directory, stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual("True True", output.strip())
+
+if __name__ == '__main__':
+    unittest.main()
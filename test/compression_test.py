@@ -0,0 +1,214 @@
+import sys
+sys.path.append("../")
+from gnip import compression
+from gnip import Gnip
+from gnip import activities
+import unittest
+import gzip
+import StringIO
+import threading
+import BaseHTTPServer
+import SocketServer
+
+ACTIVITIES = '<activities>' + \
+    '<activity><at>2008-07-02T11:16:16.000Z</at><action>update</action><activityID>%d</activityID></activity>' * 200 % \
+    tuple(range(200)) + '</activities>'
+
+def compress(data):
+    zbuf = StringIO.StringIO()
+    zfile = gzip.GzipFile(mode='wb', fileobj=zbuf)
+    zfile.write(data)
+    zfile.close()
+    return zbuf.getvalue()
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(("GET", dict(self.headers)))
+        body = ACTIVITIES
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.requests.append(("POST", dict(self.headers)))
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = "<result>Success</result>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+class CompressionTestCase(unittest.TestCase):
+
+    def decompress(self, data):
+        return gzip.GzipFile(fileobj=StringIO.StringIO(data)).read()
+
+    def testSmallBodiesAreNotCompressed(self):
+        compressor = compression.Compressor(level=6, min_size=16)
+        self.assertEqual((" ", False), compressor.compress(" "))
+        self.assertEqual(("", False), compressor.compress(None))
+
+        body = "<rule type=\"actor\">joe</rule>"
+        compressed, encoded = compressor.compress(body)
+        self.assertTrue(encoded)
+        self.assertEqual(body, self.decompress(compressed))
+
+        stats = compressor.get_stats()
+        self.assertEqual(1, stats['compressed'])
+        self.assertEqual(1, stats['skipped'])
+        self.assertEqual(len(body), stats['bytes_in'])
+
+    def testChunksAreCompressedAsTheyArrive(self):
+        compressor = compression.Compressor(level=6, min_size=16)
+        chunks = ["<rules>"] + ["<rule type=\"actor\">user%d</rule>" % i for i in range(1000)] + ["</rules>"]
+        compressed, encoded, size = compressor.compress_chunks(iter(chunks))
+        self.assertTrue(encoded)
+        self.assertEqual("".join(chunks), self.decompress(compressed))
+        self.assertEqual(len("".join(chunks)), size)
+
+        self.assertEqual(("<a/>", False, 4), compressor.compress_chunks(iter(["<a", "/>"])))
+        self.assertEqual(("", False, 0), compressor.compress_chunks(iter([])))
+        self.assertEqual((" ", False, 1), compressor.compress_chunks(" "))
+
+        stats = compressor.get_stats()
+        self.assertEqual(1, stats['compressed'])
+        self.assertEqual(2, stats['skipped'])
+        self.assertEqual(size, stats['bytes_in'])
+
+    def testFixedLevelIsUsed(self):
+        compressor = compression.Compressor(level=3)
+        self.assertEqual(3, compressor.choose_level(1000))
+
+    def testAdaptiveTriesEachLevelFirst(self):
+        compressor = compression.Compressor(level=9, adaptive=True)
+        levels = []
+        for i in range(len(compression.ADAPTIVE_LEVELS)):
+            levels.append(compressor.choose_level(1000))
+            compressor.compress("<activity>" * 100)
+        self.assertEqual(list(compression.ADAPTIVE_LEVELS), levels)
+
+    def testAdaptiveLevelDependsOnBandwidth(self):
+        # Each level takes twice as long as the one before it
+        times = iter([0, 0.001, 1, 1.002, 2, 2.004, 3, 3.008])
+        compressor = compression.Compressor(level=9, adaptive=True, timer=lambda: times.next())
+        for level in compression.ADAPTIVE_LEVELS:
+            compressor.compress("<activity>" * 1000)
+
+        compressor.observe_upload(100000, 1e-9)
+        self.assertEqual(1, compressor.choose_level(10000))
+
+        # On a slow link the best ratio wins, whatever it costs to compress
+        compressor.bandwidth = 1e-9
+        ratios = compressor.get_stats()['ratios']
+        best_ratio = min(ratios.values())
+        self.assertEqual(best_ratio, ratios[compressor.choose_level(10000)])
+
+    def testSmallUploadsAreNotSampled(self):
+        compressor = compression.Compressor(adaptive=True, sample_min_size=1000)
+        compressor.observe_upload(1, 0.05)
+        compressor.observe_upload(999, 0.05)
+        self.assertEqual(None, compressor.bandwidth)
+        compressor.observe_upload(1000, 0.5)
+        self.assertEqual(2000, compressor.bandwidth)
+
+    def testCountersAreThreadSafe(self):
+        compressor = compression.Compressor(min_size=10)
+        def compress():
+            for i in range(200):
+                compressor.compress("<activity>" * 10)
+                compressor.compress("short")
+        threads = [threading.Thread(target=compress) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = compressor.get_stats()
+        self.assertEqual(800, stats['compressed'])
+        self.assertEqual(800, stats['skipped'])
+        self.assertEqual(80000, stats['bytes_in'])
+
+    def testGzipStreamReadsInChunks(self):
+        data = "<activity>%d</activity>" * 5000 % tuple(range(5000))
+        reads = []
+        stream = compression.GzipStream(compress(data), chunk_size=256, on_read=reads.append)
+        pieces = []
+        while True:
+            piece = stream.read(1000)
+            if not piece:
+                break
+            self.assertTrue(len(piece) <= 1000)
+            pieces.append(piece)
+        self.assertEqual(data, "".join(pieces))
+        self.assertEqual(len(data), sum(reads))
+
+    def testGzipStreamReadsConcatenatedMembers(self):
+        stream = compression.GzipStream(compress("first ") + compress("second"), chunk_size=8)
+        self.assertEqual("first second", stream.read())
+
+    def testTruncatedGzipStreamRaises(self):
+        data = compress(ACTIVITIES)
+        for size in (len(data) - 1, len(data) - 8, len(data) // 2, 5):
+            stream = compression.GzipStream(data[:size], chunk_size=64)
+            self.assertRaises(IOError, stream.read)
+        self.assertRaises(IOError, compression.Decompressor().decode, data[:-8], "gzip")
+        self.assertEqual(ACTIVITIES, compression.GzipStream(data, chunk_size=64).read())
+        self.assertEqual("", compression.GzipStream("").read())
+
+    def testDecompressorCountsBytesSaved(self):
+        decompressor = compression.Decompressor()
+        self.assertEqual(ACTIVITIES, decompressor.decode(compress(ACTIVITIES), "gzip"))
+        self.assertEqual("<result/>", decompressor.decode("<result/>", None))
+        stats = decompressor.get_stats()
+        self.assertEqual(1, stats['compressed'])
+        self.assertEqual(1, stats['plain'])
+        self.assertEqual(len(ACTIVITIES) + 9, stats['bytes_out'])
+        self.assertEqual(len(ACTIVITIES) - len(compress(ACTIVITIES)), stats['bytes_saved'])
+
+    def testGnipNegotiatesResponseCompression(self):
+        server = Server(("127.0.0.1", 0), Handler)
+        server.requests = []
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.setDaemon(True)
+        thread.start()
+        try:
+            g = Gnip("user", "password", "http://127.0.0.1:%d" % server.server_port, retry_max=0)
+            response = g.get_publisher_activities("my", "test")
+            self.assertEqual(200, len(response.result.items))
+
+            response = g.get_publisher_activities("my", "test", stream=True)
+            self.assertEqual(range(200), [int(a.activity_id) for a in response.result])
+
+            verb, headers = server.requests[0]
+            self.assertEqual("gzip", headers.get("accept-encoding"))
+            self.assertFalse("content-type" in headers)
+            self.assertFalse("content-encoding" in headers)
+
+            g.publish_activities("test", activities.Activities())
+            verb, headers = server.requests[-1]
+            self.assertEqual("POST", verb)
+            self.assertEqual("application/xml", headers.get("content-type"))
+            self.assertNotEqual("gzip", headers.get("accept-encoding"))
+
+            stats = g.get_decompression_stats()
+            self.assertEqual(2, stats['compressed'])
+            self.assertEqual(1, stats['plain'])
+            self.assertEqual(2 * len(ACTIVITIES) + len("<result>Success</result>"), stats['bytes_out'])
+            self.assertTrue(stats['bytes_saved'] > len(ACTIVITIES))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import sys
+sys.path.append("../")
+from gnip import config
+from gnip import Gnip
+import unittest
+import os
+import tempfile
+
+class ConfigTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".properties")
+        os.write(fd, "gnip.server=https://example.com\ngnip.pool.max.size=10\ngnip.gzip.adaptive=false\ngnip.cache.dir=\ngnip.retry.max=3\n")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+        config.reset_config()
+
+    def testLoadConfig(self):
+        settings = config.load_config(self.path, {})
+        self.assertEqual("https://example.com", settings['gnip.server'])
+        self.assertEqual(10, settings.get_int('gnip.pool.max.size'))
+        self.assertEqual(False, settings.get_bool('gnip.gzip.adaptive', True))
+        self.assertEqual("", settings['gnip.missing'])
+        self.assertEqual(None, settings.get('gnip.cache.dir'))
+        self.assertEqual(5.0, settings.get_float('gnip.cache.dir', 5.0))
+
+    def testEnvironmentOverridesFile(self):
+        settings = config.load_config(self.path, {'GNIP_POOL_MAX_SIZE': '20', 'GNIP_SERVER': 'http://localhost', 'HOME': '/'})
+        self.assertEqual(20, settings.get_int('gnip.pool.max.size'))
+        self.assertEqual("http://localhost", settings['gnip.server'])
+        self.assertFalse('home' in settings)
+
+    def testConfigIsImmutable(self):
+        settings = config.load_config(self.path, {})
+        self.assertRaises(AttributeError, setattr, settings, "server", "x")
+        overridden = settings.override({'gnip.server': 'http://localhost'}, pool_max_size=3, gzip_adaptive=True)
+        self.assertEqual("https://example.com", settings['gnip.server'])
+        self.assertEqual("http://localhost", overridden['gnip.server'])
+        self.assertEqual(3, overridden.get_int('gnip.pool.max.size'))
+        self.assertTrue(overridden.get_bool('gnip.gzip.adaptive'))
+        self.assertEqual(settings, config.load_config(self.path, {}))
+        self.assertNotEqual(settings, overridden)
+
+    def testUnknownKeywordsAreRejected(self):
+        settings = config.load_config(self.path, {})
+        self.assertRaises(TypeError, settings.override, retry_maxx=0)
+        self.assertRaises(TypeError, settings.override, pool_maxsize=5)
+        self.assertRaises(TypeError, Gnip, "user", "password", config=settings, pool_maxsize=5)
+
+    def testConfigIsLoadedOncePerProcess(self):
+        self.assertTrue(config.get_config() is config.get_config())
+
+    def testGnipUsesOverrides(self):
+        settings = config.load_config(self.path, {})
+        g = Gnip("user", "password", config=settings, pool_max_size=4, retry_max=0)
+        self.assertEqual("https://example.com", g.base_url)
+        self.assertEqual(4, g.pool.max_size)
+        self.assertEqual(0, g.retry_policy.max_retries)
+        self.assertEqual("4", g.config['gnip.pool.max.size'])
+
+if __name__ == '__main__':
+    unittest.main()
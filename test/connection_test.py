@@ -0,0 +1,156 @@
+import sys
+sys.path.append("../")
+from gnip import connection
+import unittest
+import threading
+import time
+import httplib
+import BaseHTTPServer
+import SocketServer
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.last_headers = self.headers
+        if self.path == "/slow":
+            time.sleep(0.2)
+        if self.path == "/hangup":
+            # Close the connection without responding, as a server timing
+            # out an idle connection does
+            self.server.hangups += 1
+            self.close_connection = 1
+            return
+        if self.path in ("/redirect", "/see-other", "/loop"):
+            self.send_response({"/redirect": 302, "/see-other": 303, "/loop": 301}[self.path])
+            if self.path == "/loop":
+                self.send_header("Location", "/loop")
+            else:
+                self.send_header("Location", "/target")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = "<result>" + self.path + "</result>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == "/drop":
+            self.close_connection = 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.do_GET()
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    hangups = 0
+
+class ConnectionPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.setDaemon(True)
+        thread.start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_port
+        self.pool = connection.ConnectionPool(max_size=2, idle_timeout=60, timeout=5)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testConnectionsAreReused(self):
+        for i in range(3):
+            response, content = self.pool.request(self.url + "/path?query=" + str(i), "GET")
+            self.assertEqual(200, response.status)
+            self.assertEqual("<result>/path?query=" + str(i) + "</result>", content)
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['created'])
+        self.assertEqual(2, stats['reused'])
+        self.assertEqual(1, stats['idle'])
+        self.assertEqual(0, stats['in_use'])
+
+    def testSendTimeExcludesTheWaitForTheResponse(self):
+        response, content = self.pool.request(self.url + "/slow", "GET")
+        self.assertTrue(response.send_time < 0.1)
+        self.assertTrue(response.ttfb >= 0.2)
+
+    def testHeadersAreLowerCased(self):
+        response, content = self.pool.request(self.url + "/", "GET")
+        self.assertEqual(str(len(content)), response["content-length"])
+
+    def testClosedConnectionIsNotReused(self):
+        self.pool.request(self.url + "/close", "GET")
+        self.pool.request(self.url + "/", "GET")
+        stats = self.pool.get_stats()
+        self.assertEqual(2, stats['created'])
+        self.assertEqual(0, stats['reused'])
+
+    def testServerClosedIdleConnectionIsReplaced(self):
+        self.pool.request(self.url + "/drop", "GET")
+        time.sleep(0.05)
+        response, content = self.pool.request(self.url + "/", "GET")
+        self.assertEqual(200, response.status)
+        stats = self.pool.get_stats()
+        self.assertEqual(2, stats['created'])
+        self.assertEqual(1, stats['discarded'])
+
+    def testIdleConnectionsAreEvicted(self):
+        self.pool.request(self.url + "/", "GET")
+        self.pool.idle_timeout = 0
+        time.sleep(0.01)
+        self.pool.evict_idle()
+        stats = self.pool.get_stats()
+        self.assertEqual(0, stats['idle'])
+        self.assertEqual(1, stats['discarded'])
+
+    def testPoolSizeIsBounded(self):
+        threads = [threading.Thread(target=self.pool.request, args=(self.url + "/slow", "GET")) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.pool.get_stats()
+        self.assertEqual(2, stats['created'])
+        self.assertEqual(4, stats['reused'])
+
+    def testStaleConnectionIsRetriedForIdempotentRequests(self):
+        self.pool.request(self.url + "/", "GET")
+        self.assertRaises(httplib.BadStatusLine, self.pool.request, self.url + "/hangup", "GET")
+        # Sent on the reused connection, then once more on a new one
+        self.assertEqual(2, self.server.hangups)
+
+    def testStaleConnectionIsNotRetriedForPosts(self):
+        self.pool.request(self.url + "/", "GET")
+        self.assertRaises(httplib.BadStatusLine, self.pool.request, self.url + "/hangup", "POST", body="<activity/>")
+        self.assertEqual(1, self.server.hangups)
+
+    def testRedirectsAreFollowed(self):
+        response, content = self.pool.request(self.url + "/redirect", "GET")
+        self.assertEqual(200, response.status)
+        self.assertEqual("<result>/target</result>", content)
+
+        response, content = self.pool.request(self.url + "/redirect", "POST", body="<activity/>")
+        self.assertEqual(302, response.status)
+
+        response, content = self.pool.request(self.url + "/see-other", "POST",
+            {'Content-Type': 'application/xml', 'Content-Encoding': 'gzip', 'Authorization': 'Basic x'}, "<activity/>")
+        self.assertEqual(200, response.status)
+        self.assertEqual("<result>/target</result>", content)
+        # The GET that follows a 303 has no body, so no body headers either
+        self.assertEqual(None, self.server.last_headers.get("Content-Type"))
+        self.assertEqual(None, self.server.last_headers.get("Content-Encoding"))
+        self.assertEqual("Basic x", self.server.last_headers.get("Authorization"))
+
+        response, content = self.pool.request(self.url + "/loop", "GET")
+        self.assertEqual(301, response.status)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+sys.path.append("../")
+from gnip.dedup import *
+from gnip.activity import Activity
+import unittest
+import threading
+import tempfile
+import shutil
+import os
+
+class DedupTestCase(unittest.TestCase):
+
+    def testWindowIsExact(self):
+        store = DedupStore(window=3, bloom_bits=0)
+        self.assertEqual([True, True, False, True], [store.add(key) for key in ["a", "b", "a", "c"]])
+        # "a" was used more recently than "b", so "b" is forgotten first
+        store.add("d")
+        self.assertTrue("a" in store)
+        self.assertFalse("b" in store)
+        self.assertEqual(1, store.get_stats()['duplicates'])
+
+    def testBloomFilterRemembersBeyondTheWindow(self):
+        store = DedupStore(window=10, bloom_bits=64 * 1024)
+        for i in range(1000):
+            self.assertTrue(store.add("id%d" % i))
+        self.assertFalse(store.add("id1"))
+        stats = store.get_stats()
+        self.assertEqual(1, stats['bloom_duplicates'])
+        self.assertEqual(10, stats['recent'])
+
+        new = len([i for i in range(1000, 2000) if store.add("id%d" % i)])
+        self.assertTrue(new > 990)
+
+    def testBloomFiltersRotate(self):
+        store = DedupStore(window=1, bloom_bits=64 * 1024, bloom_capacity=100)
+        for i in range(250):
+            store.add("id%d" % i)
+        self.assertEqual(2, store.get_stats()['rotations'])
+        self.assertFalse("id0" in store)
+        self.assertTrue("id150" in store)
+
+    def testActivitiesWithoutIdsUseTheirContent(self):
+        store = DedupStore()
+        first = Activity(action="update", url="http://example.com/1")
+        first.set_at_from_string("2008-07-02T11:16:16+00:00")
+        second = Activity(action="update", url="http://example.com/2")
+        second.set_at_from_string("2008-07-02T11:16:16+00:00")
+        self.assertEqual([first, second], store.filter([first, second, first]))
+        self.assertEqual(activity_key(first), activity_key(Activity(action="update", url="http://example.com/1", at=first.at)))
+        self.assertEqual("42", activity_key(Activity(activity_id="42")))
+
+    def testSaveAndLoad(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "seen")
+            store = DedupStore(window=5, bloom_bits=8192, path=path)
+            for i in range(20):
+                store.add("id%d" % i)
+            store.save()
+
+            restored = DedupStore(window=5, bloom_bits=8192, path=path)
+            self.assertFalse(restored.add("id19"))
+            self.assertFalse(restored.add("id0"))
+            self.assertTrue(restored.add("id20"))
+
+            # Bloom filters of another size can't be reused, but the window can
+            smaller = DedupStore(window=5, bloom_bits=4096, path=path)
+            self.assertTrue("id19" in smaller)
+            self.assertFalse("id0" in smaller)
+        finally:
+            shutil.rmtree(directory)
+
+    def testConcurrentAddsCountEachKeyOnce(self):
+        store = DedupStore(window=1000)
+        results = []
+        def add():
+            results.extend([store.add("id%d" % i) for i in range(500)])
+        threads = [threading.Thread(target=add) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(500, results.count(True))
+        self.assertEqual(1500, store.get_stats()['duplicates'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ sys.path.append("../")
 from gnip import filter
 from gnip.xml_objects import *
 import unittest
+import pickle
 
 class FilterTestCase(unittest.TestCase):
 
@@ -105,6 +106,9 @@ class FilterTestCase(unittest.TestCase):
         filter1 = filter.Filter(name="jojo-filter", rules=[Rule("actor", "me"), Rule("actor", "you"), Rule("actor", "bob")])
         filter2 = filter.Filter(name="jojo-filter", rules=[Rule("actor", "bob"), Rule("actor", "you"), Rule("actor", "me")])
         self.assertEquals(filter1, filter2)
+
+    def testFilterIsNotHashable(self):
+        self.assertRaises(TypeError, hash, filter.Filter(name="jojo-filter"))
         
     def testFilterNotEquals(self):
         filter1 = filter.Filter("jojo-filter", True, "http://www.example.com/posttome", [Rule("actor", "jojo")])
@@ -127,5 +131,42 @@ class FilterTestCase(unittest.TestCase):
         filter2 = filter.Filter("jojo-filter", True, "http://www.example.com/posttome", [Rule("actor", "jojo"), Rule("to", "frank")])
         self.assertNotEquals(filter1, filter2)
         
+    def testFilterWithoutRules(self):
+        a_filter = filter.Filter(name="empty")
+        self.assertEqual('<filter fullData="true" name="empty" />', a_filter.to_xml())
+        a_filter.rules.append(Rule("actor", "jojo"))
+        self.assertEqual([], filter.Filter(name="other").rules)
+
+    def testPickle(self):
+        a_filter = filter.Filter(name="f", post_url="http://example.com", rules=[Rule("actor", "jojo"), Rule("tag", "x")])
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(a_filter, protocol))
+            self.assertEqual(a_filter, copy)
+            self.assertEqual(a_filter.fingerprint(), copy.fingerprint())
+            copy.rules.append(Rule("to", "y"))
+            self.assertNotEqual(a_filter.fingerprint(), copy.fingerprint())
+
+    def testFingerprint(self):
+        filter1 = filter.Filter(name="jojo-filter", rules=[Rule("actor", "jojo"), Rule("actor", "bob")])
+        filter2 = filter.Filter(name="jojo-filter", rules=[Rule("actor", "bob"), Rule("actor", "jojo")])
+        self.assertEqual(filter1.fingerprint(), filter2.fingerprint())
+
+        before = filter1.fingerprint()
+        filter1.rules.append(Rule("tag", "x"))
+        self.assertNotEqual(before, filter1.fingerprint())
+        self.assertNotEquals(filter1, filter2)
+        filter1.rules.remove(Rule("tag", "x"))
+        self.assertEqual(before, filter1.fingerprint())
+
+        filter1.rules[0] = Rule("actor", "al")
+        self.assertNotEqual(before, filter1.fingerprint())
+        del filter1.rules[:]
+        self.assertEqual(filter.Filter().fingerprint(), filter1.fingerprint())
+
+        filter2.rules = [Rule("actor", "")]
+        self.assertNotEqual(filter.Filter(rules=[Rule("actor", None)]).fingerprint(), filter2.fingerprint())
+        self.assertEqual(filter.Filter(rules=[Rule(u"actor", u"bob")]).fingerprint(),
+            filter.Filter(rules=[Rule("actor", "bob")]).fingerprint())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,195 @@
+import sys
+sys.path.append("../")
+from gnip import follower
+from gnip import dedup
+from gnip.activities import Activities
+from gnip.activity import Activity
+from gnip.response import Response
+import unittest
+import calendar
+import datetime
+import socket
+
+class FakeGnip(object):
+    def __init__(self, timer):
+        self.timer = timer
+        self.buckets = {}
+        self.failing = set()
+        self.raising = set()
+        self.requests = []
+        self.dedup = None
+
+    def time_to_string(self, time):
+        return time.strftime("%Y%m%d%H%M")
+
+    def sync_clock(self, time):
+        return time
+
+    def get_filter_activities(self, publisher_scope, publisher_name, name, date_time=None, dedup=None):
+        if date_time is None:
+            date_time = datetime.datetime.utcfromtimestamp(self.timer())
+        bucket = self.time_to_string(date_time)
+        self.requests.append(bucket)
+        if bucket in self.failing:
+            return Response(503, None)
+        if bucket in self.raising:
+            raise socket.error(104, "Connection reset by peer")
+        items = [Activity(activity_id=an_id) for an_id in self.buckets.get(bucket, [])]
+        if dedup is None:
+            dedup = self.dedup
+        if dedup is not None and dedup is not False:
+            items = dedup.filter(items)
+        return Response(200, Activities(items))
+
+class FakeTimer(object):
+    def __init__(self):
+        # 2008-01-01 00:00:00 UTC
+        self.now = float(calendar.timegm((2008, 1, 1, 0, 0, 0)))
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class FollowerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.gnip = FakeGnip(self.timer)
+        self.follower = follower.Follower(self.gnip, "my", "publisher", "filter", window=3,
+            min_interval=1, max_interval=8, target_batch=2, sleep=self.timer.sleep, timer=self.timer)
+
+    def ids(self, activities):
+        return [an_activity.activity_id for an_activity in activities]
+
+    def testOnlyNewActivitiesAreReturned(self):
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.assertEqual(["1", "2"], self.ids(self.follower.poll()))
+        self.gnip.buckets["200801010000"] = ["1", "2", "3"]
+        self.assertEqual(["3"], self.ids(self.follower.poll()))
+        self.assertEqual(2, self.follower.duplicates)
+
+    def testWindowIsBounded(self):
+        self.gnip.buckets["200801010000"] = ["1", "2", "3", "4"]
+        self.follower.poll()
+        self.gnip.buckets["200801010000"] = ["1"]
+        self.assertEqual(["1"], self.ids(self.follower.poll()))
+
+    def testFollowersCanShareADedupStore(self):
+        store = dedup.DedupStore(window=100, bloom_bits=0)
+        first = follower.Follower(self.gnip, "my", "publisher", "filter", dedup_store=store)
+        second = follower.Follower(self.gnip, "my", "publisher", "other", dedup_store=store)
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.assertEqual(["1", "2"], self.ids(first.poll()))
+        self.assertEqual([], self.ids(second.poll()))
+        self.assertEqual(2, second.duplicates)
+
+    def testFollowerCanShareTheGnipDedupStore(self):
+        self.gnip.dedup = dedup.DedupStore(window=100, bloom_bits=0)
+        shared = follower.Follower(self.gnip, "my", "publisher", "filter", dedup_store=self.gnip.dedup)
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.assertEqual(["1", "2"], self.ids(shared.poll()))
+        self.assertEqual([], self.ids(shared.poll()))
+        self.assertEqual(0, len(self.gnip.get_filter_activities("my", "publisher", "other").result.items))
+
+    def testClosedBucketIsFetchedOnRollOver(self):
+        self.gnip.buckets["200801010000"] = ["1"]
+        self.follower.poll()
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.gnip.buckets["200801010001"] = ["3"]
+        self.timer.sleep(60)
+        self.assertEqual(["2", "3"], self.ids(self.follower.poll()))
+        self.assertEqual(["200801010000", "200801010000", "200801010001"], self.gnip.requests)
+
+    def testEveryClosedBucketIsFetchedAfterALongPoll(self):
+        self.timer.sleep(30)
+        self.gnip.buckets["200801010000"] = ["1"]
+        self.follower.poll()
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.gnip.buckets["200801010001"] = ["3"]
+        self.gnip.buckets["200801010002"] = ["4"]
+        self.gnip.buckets["200801010003"] = ["5"]
+        self.timer.sleep(150)
+        self.assertEqual(["2", "3", "4", "5"], self.ids(self.follower.poll()))
+        self.assertEqual(["200801010000", "200801010000", "200801010001", "200801010002", "200801010003"],
+            self.gnip.requests)
+
+    def testFailedClosedBucketIsFetchedOnTheNextPoll(self):
+        self.gnip.buckets["200801010000"] = ["1"]
+        self.follower.poll()
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.gnip.buckets["200801010001"] = ["3"]
+        self.gnip.failing.add("200801010000")
+        self.timer.sleep(60)
+        self.assertEqual(["3"], self.ids(self.follower.poll()))
+
+        self.gnip.failing.clear()
+        self.timer.sleep(5)
+        self.assertEqual(["2"], self.ids(self.follower.poll()))
+        self.assertEqual(["200801010000", "200801010000", "200801010001", "200801010000", "200801010001"],
+            self.gnip.requests)
+
+    def testFailedClosedBucketIsRetriedALimitedNumberOfTimes(self):
+        self.follower.max_bucket_retries = 2
+        self.follower.poll()
+        self.gnip.failing.add("200801010000")
+        self.timer.sleep(60)
+        for i in range(4):
+            self.follower.poll()
+        self.assertEqual(1 + 3, self.gnip.requests.count("200801010000"))
+
+    def testActivitiesAreKeptWhenAFetchRaises(self):
+        self.gnip.buckets["200801010000"] = ["1"]
+        self.follower.poll()
+        self.gnip.buckets["200801010000"] = ["1", "late0"]
+        self.gnip.buckets["200801010001"] = ["2"]
+        self.gnip.raising.add("200801010001")
+        self.timer.sleep(60)
+        self.assertEqual(["late0"], self.ids(self.follower.poll()))
+
+        self.gnip.raising.clear()
+        self.timer.sleep(5)
+        self.assertEqual(["2"], self.ids(self.follower.poll()))
+
+    def testClosedBucketIsRetriedWhenItsFetchRaises(self):
+        self.gnip.buckets["200801010000"] = ["1"]
+        self.follower.poll()
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        self.gnip.buckets["200801010001"] = ["3"]
+        self.gnip.raising.add("200801010000")
+        self.timer.sleep(60)
+        self.assertEqual(["3"], self.ids(self.follower.poll()))
+
+        self.gnip.raising.clear()
+        self.timer.sleep(5)
+        self.assertEqual(["2"], self.ids(self.follower.poll()))
+
+    def testIntervalBacksOffWhenIdle(self):
+        self.follower.poll()
+        self.assertEqual(2, self.follower.interval)
+        self.timer.sleep(self.follower.interval)
+        self.follower.poll()
+        self.timer.sleep(self.follower.interval)
+        self.follower.poll()
+        self.assertEqual(8, self.follower.interval)
+
+    def testIntervalShrinksWhenBusy(self):
+        self.follower.interval = 8
+        self.follower.poll()
+        self.timer.sleep(8)
+        self.gnip.buckets["200801010000"] = [str(i) for i in range(40)]
+        self.follower.poll()
+        self.assertEqual(1, self.follower.interval)
+
+    def testFollowStops(self):
+        self.gnip.buckets["200801010000"] = ["1", "2"]
+        followed = []
+        for an_activity in self.follower:
+            followed.append(an_activity.activity_id)
+            if len(followed) == 2:
+                self.follower.stop()
+        self.assertEqual(["1", "2"], followed)
+
+if __name__ == '__main__':
+    unittest.main()
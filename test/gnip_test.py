@@ -141,6 +141,16 @@ class GnipTestCase(unittest.TestCase):
             numMatches += count(singleActivity.activity_id, randVal)
         self.assert_(0 != numMatches)
 
+    def testGetPublisherNotificationsRange(self):
+        end = datetime.datetime.utcnow()
+        start = end - datetime.timedelta(minutes=5)
+        responses = list(self.gnip.get_publisher_notifications_range(self.testpublisherscope, self.testpublisher, start, end))
+        self.assertTrue(5 <= len(responses) <= 6)
+        buckets = [response.bucket for response in responses]
+        self.assertEqual(sorted(buckets), buckets)
+        for response in responses:
+            self.assertEqual(200, response.code)
+
     def testUpdateFilter(self):
         a_filter = filter.Filter(name=self.filterName, rules=self.rules, full_data=self.filterFullData)
         self.gnip.create_filter(self.testpublisherscope, self.testpublisher, a_filter)
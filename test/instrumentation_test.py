@@ -0,0 +1,164 @@
+import sys
+sys.path.append("../")
+from gnip import *
+from gnip import instrumentation
+import unittest
+import threading
+import socket
+import BaseHTTPServer
+import SocketServer
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.endswith("/publishers/test/activity/current.xml"):
+            code = 200
+            body ='<activities><activity><at>2008-07-02T11:16:16.000Z</at><action>update</action>' + \
+                '<activityID>1</activityID></activity></activities>'
+        else:
+            code = 404
+            body = '<error>Not found</error>'
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def testHistogram(self):
+        histogram = instrumentation.Histogram()
+        self.assertEqual(None, histogram.percentile(50))
+        for value in [1, 3, 5, 100]:
+            histogram.add(value)
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(27.25, histogram.mean())
+        self.assertEqual(4, histogram.percentile(50))
+        self.assertEqual(100, histogram.percentile(99))
+        self.assertEqual(1, histogram.get_stats()['min'])
+
+    def testHistogramSink(self):
+        sink = instrumentation.HistogramSink()
+        sink.record(instrumentation.RequestEvent("/{scope}/publishers/{publisher}.xml", "GET", 200,
+            bytes_in=100, uncompressed_in=400, bytes_out=10, uncompressed_out=30, ttfb=0.01, total_time=0.02))
+        sink.record(instrumentation.ParseEvent("/{scope}/publishers/{publisher}.xml", "GET", 0.001))
+        sink.record(instrumentation.RequestEvent("/{scope}/publishers/{publisher}.xml", "GET", 404, bytes_in=20,
+            uncompressed_in=None))
+        stats = sink.get_stats()["GET /{scope}/publishers/{publisher}.xml"]
+        self.assertEqual({200: 1, 404: 1}, stats['statuses'])
+        self.assertEqual(2, stats['bytes_in']['count'])
+        self.assertEqual(1, stats['ttfb_ms']['count'])
+        self.assertEqual(1, stats['uncompressed_in']['count'])
+        self.assertEqual(400, stats['uncompressed_in']['max'])
+        self.assertEqual(30, stats['uncompressed_out']['max'])
+        self.assertAlmostEqual(1.0, sink.get_histogram("GET /{scope}/publishers/{publisher}.xml", "parse_ms").max)
+
+        sink.record(instrumentation.RequestEvent("/{scope}/publishers/{publisher}.xml", "GET", None, total_time=0.5,
+            error="timeout"))
+        stats = sink.get_stats()["GET /{scope}/publishers/{publisher}.xml"]
+        self.assertEqual({200: 1, 404: 1, "timeout": 1}, stats['statuses'])
+        self.assertEqual(500, stats['total_ms']['max'])
+
+    def testStatsdLines(self):
+        packets = []
+        sink = instrumentation.StatsdSink(send=packets.append)
+        sink.record(instrumentation.RequestEvent("/{scope}/publishers/{publisher}/activity/{bucket}.xml", "GET", 200,
+            bytes_in=512, uncompressed_in=2048, ttfb=0.0125, total_time=0.02))
+        self.assertEqual([
+            "gnip.scope.publishers.publisher.activity.bucket.get.status.200:1|c",
+            "gnip.scope.publishers.publisher.activity.bucket.get.ttfb:12.500|ms",
+            "gnip.scope.publishers.publisher.activity.bucket.get.total:20.000|ms",
+            "gnip.scope.publishers.publisher.activity.bucket.get.bytes_in:512|c",
+            "gnip.scope.publishers.publisher.activity.bucket.get.bytes_out:0|c",
+            "gnip.scope.publishers.publisher.activity.bucket.get.uncompressed_in:2048|c",
+            "gnip.scope.publishers.publisher.activity.bucket.get.uncompressed_out:0|c",
+        ], packets[0].split("\n"))
+        self.assertEqual("root", instrumentation.metric_name("/"))
+
+        sink.record(instrumentation.ParseEvent("/{scope}/publishers/{publisher}/activity/{bucket}.xml", "GET", 0.0015))
+        self.assertEqual("gnip.scope.publishers.publisher.activity.bucket.get.parse:1.500|ms", packets[1])
+
+        sink.record(instrumentation.RequestEvent("/{scope}/publishers/{publisher}/activity/{bucket}.xml", "GET", None,
+            total_time=0.25, error="timeout"))
+        self.assertEqual([
+            "gnip.scope.publishers.publisher.activity.bucket.get.error.timeout:1|c",
+            "gnip.scope.publishers.publisher.activity.bucket.get.total:250.000|ms",
+        ], packets[2].split("\n")[:2])
+
+    def testGnipEmitsEvents(self):
+        server = Server(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.setDaemon(True)
+        thread.start()
+        try:
+            g = Gnip("user", "password", "http://127.0.0.1:%d" % server.server_port, retry_max=0)
+            events = []
+            class Sink(object):
+                def record(self, event):
+                    events.append(event)
+            sink = Sink()
+            g.add_instrumentation_sink(sink)
+
+            response = g.get_publisher_activities("my", "test")
+            self.assertEqual(200, response.code)
+            self.assertEqual(2, len(events))
+            event, parse_event = events
+            self.assertEqual("GET /{scope}/publishers/{publisher}/activity/{bucket}.xml", event.get_key())
+            self.assertEqual(200, event.status)
+            self.assertTrue(event.bytes_in > 0)
+            self.assertEqual(event.bytes_in, event.uncompressed_in)
+            self.assertTrue(0 <= event.ttfb <= event.total_time)
+            self.assertEqual(event.get_key(), parse_event.get_key())
+            self.assertTrue(parse_event.parse_time >= 0)
+
+            g.get_publisher("my", "missing")
+            self.assertEqual(404, events[2].status)
+            self.assertTrue(isinstance(events[3], instrumentation.ParseEvent))
+
+            # Requests whose responses are not parsed are still reported
+            self.assertEqual(False, g.rule_exists_in_filter("my", "test", "filter", Rule("actor", "joe")))
+            self.assertEqual(5, len(events))
+            self.assertEqual(404, events[4].status)
+
+            # A streamed response reports its parse time once it has been read
+            items = g.get_publisher_activities("my", "test", stream=True).result
+            self.assertEqual(6, len(events))
+            self.assertEqual(1, len(list(items)))
+            self.assertEqual(7, len(events))
+            self.assertTrue(isinstance(events[6], instrumentation.ParseEvent))
+
+            g.remove_instrumentation_sink(sink)
+            g.get_publisher("my", "missing")
+            self.assertEqual(7, len(events))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def testGnipEmitsEventsForFailedRequests(self):
+        # Nothing listens on the port of a closed server
+        server = Server(("127.0.0.1", 0), Handler)
+        port = server.server_port
+        server.server_close()
+
+        g = Gnip("user", "password", "http://127.0.0.1:%d" % port, retry_max=1, retry_backoff=0)
+        events = []
+        class Sink(object):
+            def record(self, event):
+                events.append(event)
+        g.add_instrumentation_sink(Sink())
+
+        self.assertRaises(socket.error, g.get_publisher, "my", "test")
+        self.assertEqual(1, len(events))
+        self.assertEqual("GET /{scope}/publishers/{publisher}.xml", events[0].get_key())
+        self.assertEqual(None, events[0].status)
+        self.assertEqual("error", events[0].error)
+        self.assertTrue(events[0].total_time >= 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+import sys
+sys.path.append("../")
+from gnip import *
+from gnip import local_server
+from gnip import synthetic
+from gnip import dedup
+import unittest
+import datetime
+import time
+import os
+import shutil
+import tempfile
+
+class LocalServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = local_server.LocalGnipServer(username="user", password="password",
+            activities_per_bucket=5).start()
+        self.server.add_publisher("test")
+        self.gnip = Gnip("user", "password", self.server.url, retry_backoff=0.001)
+
+    def tearDown(self):
+        self.gnip.pool.close()
+        self.server.stop()
+
+    def testPublishers(self):
+        response = self.gnip.get_publisher("my", "test")
+        self.assertEqual(200, response.code)
+        self.assertEqual("test", response.result.name)
+        self.assertEqual(404, self.gnip.get_publisher("my", "missing").code)
+
+        self.assertEqual(200, self.gnip.create_publisher(publisher.Publisher("other", ["actor"])).code)
+        self.assertEqual(["actor"], self.gnip.get_publisher("my", "other").result.rule_types)
+
+        self.gnip.tunnel_over_post = True
+        self.assertEqual(200, self.gnip.update_publisher(publisher.Publisher("other", ["tag"])).code)
+        self.assertEqual(["tag"], self.gnip.get_publisher("my", "other").result.rule_types)
+
+    def testFiltersAndRules(self):
+        rule = Rule("actor", "joe")
+        a_filter = filter.Filter("f", rules=[rule])
+        self.assertEqual(200, self.gnip.create_filter("my", "test", a_filter).code)
+        self.assertEqual(a_filter, self.gnip.find_filter("my", "test", "f").result)
+
+        self.assertEqual(200, self.gnip.add_rules_to_filter("my", "test", "f", [Rule("actor", "bob"), Rule("tag", "x")]).code)
+        self.assertTrue(self.gnip.rule_exists_in_filter("my", "test", "f", Rule("tag", "x")))
+        self.assertEqual(200, self.gnip.remove_rule_from_filter("my", "test", "f", Rule("tag", "x")).code)
+        self.assertFalse(self.gnip.rule_exists_in_filter("my", "test", "f", Rule("tag", "x")))
+
+        # The same operations tunnelled over POST
+        self.gnip.tunnel_over_post = True
+        self.assertEqual(200, self.gnip.remove_rule_from_filter("my", "test", "f", Rule("actor", "bob")).code)
+        self.assertEqual([rule], self.gnip.find_filter("my", "test", "f").result.rules)
+        self.assertEqual(200, self.gnip.update_filter("my", "test", filter.Filter("f", rules=[Rule("actor", "al")])).code)
+        self.assertEqual([Rule("actor", "al")], self.gnip.find_filter("my", "test", "f").result.rules)
+        self.assertEqual(200, self.gnip.delete_filter("my", "test", "f").code)
+        self.assertEqual(404, self.gnip.find_filter("my", "test", "f").code)
+
+    def testBucketsAreSyntheticAndRepeatable(self):
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10)
+        first = self.gnip.get_publisher_activities("my", "test", bucket_time)
+        second = self.gnip.get_publisher_activities("my", "test", bucket_time)
+        self.assertEqual(5, len(first.result.items))
+        self.assertEqual([a.to_xml() for a in first.result.items], [a.to_xml() for a in second.result.items])
+
+        # Stay clear of minute boundaries, the server clock offset shifts the range slightly
+        responses = list(self.gnip.get_publisher_notifications_range("my", "test",
+            bucket_time + datetime.timedelta(seconds=5), bucket_time + datetime.timedelta(minutes=3, seconds=-5)))
+        self.assertEqual(3, len(responses))
+        for response in responses:
+            self.assertEqual(200, response.code)
+            self.assertEqual(None, response.result.items[0].payload)
+
+    def testSyncFilterRules(self):
+        self.gnip.create_filter("my", "test", filter.Filter("f", rules=[Rule("actor", "a"), Rule("actor", "b")]))
+        desired = [Rule("actor", "b"), Rule("tag", "x"), Rule("tag", "y")]
+
+        response = self.gnip.sync_filter_rules("my", "test", "f", desired, dry_run=True)
+        self.assertEqual(200, response.code)
+        self.assertEqual("my/test/f: +2 -1 =1 (dry run)", str(response.result))
+        self.assertEqual(2, len(self.gnip.find_filter("my", "test", "f").result.rules))
+
+        self.assertEqual(200, self.gnip.sync_filter_rules("my", "test", "f", desired).code)
+        self.assertEqual(sorted(desired), sorted(self.gnip.find_filter("my", "test", "f").result.rules))
+        self.assertEqual(0, self.gnip.sync_filter_rules("my", "test", "f", desired).result.requests)
+
+    def testFilterFanOut(self):
+        names = ["f%d" % i for i in range(6)]
+        for name in names:
+            self.assertEqual(200, self.gnip.create_filter("my", "test", filter.Filter(name, rules=[Rule("actor", name)])).code)
+        filters = [("my", "test", name) for name in names] + [("my", "test", "missing")]
+
+        self.server.latency = 0.2
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        started = time.time()
+        responses = self.gnip.get_filters_activities(filters, bucket_time, max_workers=7)
+        self.assertTrue(time.time() - started < 0.2 * 4)
+        self.assertEqual(set(filters), set(responses.keys()))
+        for name in names:
+            self.assertEqual(200, responses[("my", "test", name)].code)
+            self.assertEqual(5, len(responses[("my", "test", name)].result.items))
+        self.assertEqual(404, responses[("my", "test", "missing")].code)
+        self.assertEqual(1, self.gnip.get_clock_stats()['measurements'])
+
+        self.server.latency = 0
+        completed = list(self.gnip.iter_filters_notifications(filters[:3] + filters[:1]))
+        self.assertEqual(set(filters[:3]), set([response.filter for response in completed]))
+        self.assertEqual(3, len(completed))
+        self.assertEqual("current", completed[0].bucket)
+
+    def testDuplicateActivitiesAreRemoved(self):
+        g = Gnip("user", "password", self.server.url, dedup_enabled=True)
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        self.assertEqual(5, len(g.get_publisher_activities("my", "test", bucket_time).result.items))
+        self.assertEqual(0, len(g.get_publisher_activities("my", "test", bucket_time).result.items))
+        self.assertEqual([], list(g.get_publisher_activities("my", "test", bucket_time, stream=True).result))
+        self.assertEqual(10, g.get_dedup_stats()['duplicates'])
+        self.assertEqual(None, self.gnip.get_dedup_stats())
+        g.pool.close()
+
+    def testDedupStoreIsSavedOnClose(self):
+        path = os.path.join(tempfile.mkdtemp(), "dedup.pickle")
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        g = Gnip("user", "password", self.server.url, dedup_enabled=True, dedup_path=path)
+        self.assertEqual(5, len(g.get_publisher_activities("my", "test", bucket_time).result.items))
+        g.close()
+        self.assertTrue(os.path.exists(path))
+
+        g = Gnip("user", "password", self.server.url, dedup_enabled=True, dedup_path=path)
+        self.assertEqual(0, len(g.get_publisher_activities("my", "test", bucket_time).result.items))
+        g.close()
+        shutil.rmtree(os.path.dirname(path))
+
+    def testGnipsCanShareADedupStore(self):
+        store = dedup.DedupStore(window=100, bloom_bits=0)
+        first = Gnip("user", "password", self.server.url, dedup=store)
+        second = Gnip("user", "password", self.server.url, dedup=store)
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        self.assertEqual(5, len(first.get_publisher_activities("my", "test", bucket_time).result.items))
+        self.assertEqual(0, len(second.get_publisher_activities("my", "test", bucket_time).result.items))
+        self.assertEqual(5, store.get_stats()['duplicates'])
+        self.assertTrue(first.dedup is second.dedup)
+        first.close()
+        second.close()
+
+    def testDedupCanBeChosenPerCall(self):
+        g = Gnip("user", "password", self.server.url, dedup_enabled=True)
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        self.assertEqual(5, len(g.get_publisher_activities("my", "test", bucket_time).result.items))
+        self.assertEqual(5, len(g.get_publisher_activities("my", "test", bucket_time, dedup=False).result.items))
+        self.assertEqual(0, len(g.get_publisher_activities("my", "test", bucket_time).result.items))
+
+        # A store for just this call, on an instance without one
+        store = dedup.DedupStore(window=100, bloom_bits=0)
+        self.assertEqual(5, len(self.gnip.get_publisher_activities("my", "test", bucket_time, dedup=store).result.items))
+        responses = list(self.gnip.get_publisher_activities_range("my", "test", bucket_time,
+            bucket_time + datetime.timedelta(minutes=1), dedup=store))
+        self.assertEqual([], responses[0].result.items)
+        responses = self.gnip.get_filters_activities([("my", "test", "missing")], bucket_time, dedup=store)
+        self.assertEqual(404, responses[("my", "test", "missing")].code)
+        self.assertEqual(5, len(self.gnip.get_publisher_activities("my", "test", bucket_time).result.items))
+        self.assertEqual(None, self.gnip.get_dedup_stats())
+        g.close()
+
+    def testCacheErrorsDoNotFailRequests(self):
+        # A file where the cache directory should be, so every cache access fails
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        g = Gnip("user", "password", self.server.url, cache_dir=os.path.join(path, "buckets"))
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        response = g.get_publisher_activities("my", "test", bucket_time)
+        self.assertEqual(200, response.code)
+        self.assertEqual(5, len(response.result.items))
+        self.assertEqual(200, g.get_publisher_activities("my", "test", bucket_time).code)
+        g.close()
+        os.remove(path)
+
+    def testLazyActivities(self):
+        g = Gnip("user", "password", self.server.url, activities_lazy=True)
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        eager = self.gnip.get_publisher_activities("my", "test", bucket_time).result
+        lazy = g.get_publisher_activities("my", "test", bucket_time).result
+        self.assertTrue(isinstance(lazy.items[0], activity.LazyActivity))
+        self.assertEqual(eager.to_xml(), lazy.to_xml())
+        streamed = g.get_publisher_activities("my", "test", bucket_time, stream=True).result
+        self.assertEqual([a.activity_id for a in eager.items], [a.activity_id for a in streamed])
+        g.pool.close()
+
+    def testPublishedActivitiesAppearInCurrentBucket(self):
+        generator = synthetic.ActivityGenerator(seed=7, payload_size=100)
+        self.assertEqual(200, self.gnip.publish_activities("test", generator.activities(3)).code)
+        ids = [a.activity_id for a in self.gnip.get_publisher_activities("my", "test").result.items]
+        for index in range(3):
+            self.assertTrue("7-%d" % index in ids)
+
+    def testAuthenticationIsChecked(self):
+        g = Gnip("user", "wrong", self.server.url)
+        self.assertEqual(401, g.get_publisher("my", "test").code)
+        g.pool.close()
+
+    def testInjectedErrorsAreRetried(self):
+        self.server.error_rate = 0.5
+        for i in range(10):
+            self.assertEqual(200, self.gnip.get_publisher("my", "test").code)
+        self.assertTrue(self.server.errors > 0)
+        self.assertEqual(self.server.errors, self.gnip.get_retry_stats()['retries'])
+
+    def testBucketsAreFetchedWhileTheClockBreakerIsOpen(self):
+        g = Gnip("user", "password", self.server.url, breaker_threshold=1, retry_max=0)
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10, 30)
+        # The failed HEAD still has a Date header, then opens its breaker
+        self.server.error_rate = 1.0
+        g.sync_clock(bucket_time)
+        self.assertEqual(1, g.get_clock_stats()['measurements'])
+
+        # Rejected by the breaker, so there is no Date and the last offset is used
+        self.server.error_rate = 0
+        g.clock.invalidate()
+        offset = g.get_clock_stats()['offset']
+        self.assertEqual(200, g.get_publisher_activities("my", "test", bucket_time).code)
+        self.assertEqual(1, g.get_retry_stats()['rejected'])
+        self.assertEqual(offset, g.get_clock_stats()['offset'])
+        self.assertEqual(1, g.get_clock_stats()['failed_measurements'])
+        self.assertTrue(g.clock.is_stale())
+        g.pool.close()
+
+    def testLatencyAndBandwidthAreInjected(self):
+        self.server.latency = 0.1
+        started = time.time()
+        self.gnip.get_publisher("my", "test")
+        self.assertTrue(time.time() - started >= 0.1)
+
+        self.server.latency = 0
+        self.server.bandwidth = 4000
+        before = self.gnip.get_decompression_stats()['bytes_in']
+        started = time.time()
+        response = self.gnip.get_publisher_activities("my", "test")
+        elapsed = time.time() - started
+        self.assertEqual(200, response.code)
+        received = self.gnip.get_decompression_stats()['bytes_in'] - before
+        self.assertTrue(elapsed >= received / 4000.0 * 0.8)
+
+if __name__ == '__main__':
+    unittest.main()
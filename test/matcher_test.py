@@ -0,0 +1,75 @@
+import sys
+sys.path.append("../")
+from gnip.matcher import *
+from gnip.activity import Activity
+from gnip.activities import Activities
+from gnip.payload import Payload
+from gnip.filter import Filter
+from gnip.xml_objects import Rule, Actor, Tag, To, URL
+from gnip import synthetic
+import unittest
+
+class KeywordAutomatonTestCase(unittest.TestCase):
+
+    def testFindsWholeWordsCaseInsensitively(self):
+        automaton = KeywordAutomaton(["cat", "Hot Dog", "dog", "at", "concat"])
+        self.assertEqual(set(["cat", "at"]), automaton.find("The CAT sat at home"))
+        self.assertEqual(set(["Hot Dog", "dog"]), automaton.find("a hot dog!"))
+        self.assertEqual(set(["concat"]), automaton.find("concat"))
+        self.assertEqual(set(), automaton.find("concatenate scatter"))
+        self.assertEqual(set(), automaton.find(None))
+
+    def testOverlappingKeywords(self):
+        automaton = KeywordAutomaton(["he", "she", "his", "hers", "ushers"])
+        self.assertEqual(set(["ushers"]), automaton.find("ushers"))
+        self.assertEqual(set(["she", "he", "hers"]), automaton.find("she, he and hers"))
+
+class MatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = [Rule("actor", "joe"), Rule("tag", "python"), Rule("to", "bob"), Rule("regarding", "http://example.com/1"),
+                      Rule("source", "sms"), Rule("keyword", "release"), Rule("keyword", "code review"), Rule("place", "Denver")]
+        self.matcher = Matcher(Filter("f", rules=self.rules).rules)
+
+    def activity(self, **fields):
+        return Activity(action="update", **fields)
+
+    def testEachRuleType(self):
+        self.assertEqual([self.rules[0]], self.matcher.match(self.activity(actors=[Actor("joe")])))
+        self.assertEqual([self.rules[1]], self.matcher.match(self.activity(tags=[Tag("python")])))
+        self.assertEqual([self.rules[2]], self.matcher.match(self.activity(tos=[To("bob")])))
+        self.assertEqual([self.rules[3]], self.matcher.match(self.activity(regarding_urls=[URL("http://example.com/1")])))
+        self.assertEqual([self.rules[4]], self.matcher.match(self.activity(sources=["sms"])))
+        self.assertEqual([self.rules[5], self.rules[6]],
+            self.matcher.match(self.activity(payload=Payload(title="New release", body="Needs a Code Review"))))
+        self.assertEqual([], self.matcher.match(self.activity(actors=[Actor("Joe")], tags=[Tag("py")], payload=Payload(body="released"))))
+        self.assertEqual([Rule("place", "Denver")], self.matcher.unsupported)
+
+    def testMatchesAreInRuleOrder(self):
+        an_activity = self.activity(sources=["sms"], actors=[Actor("joe")], tags=[Tag("python"), Tag("python")])
+        self.assertEqual(self.rules[0:2] + [self.rules[4]], self.matcher.match(an_activity))
+        self.assertTrue(self.matcher.matches(an_activity))
+
+    def testBatchEvaluation(self):
+        generator = synthetic.ActivityGenerator(payload_size=10)
+        some_activities = generator.activities(200)
+        rules = [Rule("actor", an_activity.actors[0].value) for an_activity in some_activities.items[:50]]
+        matcher = Matcher(rules + [Rule("actor", "nobody")])
+
+        matched = list(matcher.iter_matches(some_activities))
+        expected = set([rule.value for rule in rules])
+        self.assertEqual([a for a in some_activities.items if a.actors[0].value in expected], [a for a, r in matched])
+        for an_activity, matched_rules in matched:
+            self.assertEqual([Rule("actor", an_activity.actors[0].value)], matched_rules)
+
+        # Streamed activities can be evaluated too
+        parsed = Activities().iter_from_xml(some_activities.to_xml())
+        self.assertEqual(len(matched), len(list(matcher.iter_matches(parsed))))
+
+        stats = matcher.get_stats()
+        self.assertEqual(400, stats['activities'])
+        self.assertEqual(2 * len(matched), stats['matched'])
+        self.assertFalse(Rule("actor", "nobody") in stats['rule_hits'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,8 @@ sys.path.append("../")
 from gnip import payload
 import unittest
 import logging
+import os
+import subprocess
 
 class PayloadTestCase(unittest.TestCase):
 
@@ -21,6 +23,60 @@ class PayloadTestCase(unittest.TestCase):
         p.write_raw(None)
         self.assertEqual(None, p.read_raw())
                 
+    def testDecodedRawIsRemembered(self):
+        raw = "raw payload data " * 1000
+        p = payload.Payload(raw=raw)
+        self.assertTrue(p.needs_encoding())
+        encoded = p.get_encoded_raw()
+        self.assertEqual(encoded, payload.encode_raw(raw))
+        self.assertEqual(raw, payload.decode_raw(encoded))
+
+        p.write_raw(None)
+        p.write_raw("x", encoded_raw=encoded)
+        self.assertEqual("x", p.read_raw())
+        self.assertFalse(p.needs_decoding())
+
+        q = payload.Payload()
+        q.from_xml_node(p.to_xml_node())
+        self.assertTrue(q.needs_decoding())
+        self.assertEqual(raw, q.read_raw())
+        self.assertFalse(q.needs_decoding())
+        self.assertTrue(q.read_raw() is q.read_raw())
+
+    def testStreamingRead(self):
+        raw = "".join([str(i) for i in range(100000)])
+        p = payload.Payload()
+        p.from_xml_node(payload.Payload(raw=raw).to_xml_node())
+        stream = p.read_raw(stream=True)
+        self.assertEqual(raw[:10], stream.read(10))
+        self.assertEqual(raw[10:], stream.read())
+        self.assertTrue(p.needs_decoding())
+        self.assertEqual(raw, p.read_raw())
+        self.assertEqual(raw, p.read_raw(stream=True).read())
+        self.assertEqual(None, payload.Payload().read_raw(stream=True))
+
+    def testBulkEncodeAndDecode(self):
+        raws = ["raw %d " % i * 100 for i in range(20)]
+        payloads = [payload.Payload(raw=raw) for raw in raws] + [None]
+        payload.encode_payloads(payloads, processes=2, chunk_size=3)
+        self.assertEqual([payload.encode_raw(raw) for raw in raws], [p.get_encoded_raw() for p in payloads[:-1]])
+
+        parsed = []
+        for p in payloads[:-1]:
+            parsed.append(payload.Payload())
+            parsed[-1].from_xml_node(p.to_xml_node())
+        payload.decode_payloads(parsed, processes=2)
+        self.assertEqual([False] * 20, [p.needs_decoding() for p in parsed])
+        self.assertEqual(raws, [p.read_raw() for p in parsed])
+
+        self.assertEqual(raws, payload.map_raws(payload.decode_raw, map(payload.encode_raw, raws), processes=1))
+
+    def testImportingGnipDoesNotLoadMultiprocessing(self):
+        script = "import sys; import gnip; print 'multiprocessing' in sys.modules"
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        output = subprocess.Popen([sys.executable, "-c", script], cwd=directory, stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual("False", output.strip())
+
 if __name__ == '__main__':
     unittest.main()
         
\ No newline at end of file
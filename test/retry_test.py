@@ -0,0 +1,202 @@
+import sys
+sys.path.append("../")
+from gnip import retry
+from gnip import clock
+from gnip.connection import HttpResponse
+import unittest
+import socket
+import threading
+import email.utils
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class RetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.sleeps = []
+        self.policy = retry.RetryPolicy(max_retries=3, backoff=1, max_backoff=10, failure_threshold=3,
+            reset_timeout=30, sleep=self.sleeps.append, timer=self.timer)
+
+    def responder(self, *results):
+        calls = []
+        results = list(results)
+        def send():
+            calls.append(True)
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return HttpResponse(result[0], "", result[1]), "<result/>"
+        return send, calls
+
+    def testEndpointTemplate(self):
+        self.assertEqual("/{scope}/publishers/{publisher}/filters/{filter}/activity/{bucket}.xml",
+            retry.endpoint_template("https://prod.gnipcentral.com/my/publishers/pub1/filters/f1/activity/200807231910.xml"))
+        self.assertEqual("/{scope}/publishers/{publisher}/notification/{bucket}.xml",
+            retry.endpoint_template("https://prod.gnipcentral.com/gnip/publishers/pub2/notification/current.xml"))
+        self.assertEqual("/{scope}/publishers/{publisher}/filters/{filter}.xml;edit",
+            retry.endpoint_template("https://prod.gnipcentral.com/my/publishers/pub1/filters/f1.xml;edit"))
+        self.assertEqual("/", retry.endpoint_template("https://prod.gnipcentral.com"))
+
+    def testTransientErrorsAreRetried(self):
+        send, calls = self.responder((503, {}), socket.error("reset"), (200, {}))
+        resp, content = self.policy.execute("GET", "http://host/my/publishers/p/activity/current.xml", send)
+        self.assertEqual(200, resp.status)
+        self.assertEqual(3, len(calls))
+        self.assertEqual(2, len(self.sleeps))
+        self.assertTrue(0 <= self.sleeps[0] <= 1)
+        self.assertTrue(0 <= self.sleeps[1] <= 2)
+        self.assertEqual(2, self.policy.get_stats()['retries'])
+
+    def testRetryAfterIsHonoured(self):
+        send, calls = self.responder((503, {'retry-after': '7'}), (200, {}))
+        self.policy.execute("GET", "http://host/my/publishers/p.xml", send)
+        self.assertEqual([7.0], self.sleeps)
+        self.assertEqual(120, self.policy.get_delay(0, "120"))
+
+    def testLongRetryAfterIsNotCutShort(self):
+        send, calls = self.responder((503, {'retry-after': '60'}), (200, {}))
+        self.assertEqual(200, self.policy.execute("GET", "http://host/my/publishers/p.xml", send)[0].status)
+        self.assertEqual([60.0], self.sleeps)
+
+        # Longer than max_retry_after, so the response is returned rather than retried early
+        send, calls = self.responder((503, {'retry-after': '121'}), (200, {}))
+        resp, content = self.policy.execute("GET", "http://host/my/publishers/p.xml", send)
+        self.assertEqual(503, resp.status)
+        self.assertEqual(1, len(calls))
+        self.assertEqual([60.0], self.sleeps)
+        self.assertEqual(1, self.policy.get_stats()['exhausted'])
+
+    def testLastResponseIsReturnedWhenRetriesRunOut(self):
+        self.policy.failure_threshold = 10
+        send, calls = self.responder((500, {}), (500, {}), (500, {}), (502, {}))
+        resp, content = self.policy.execute("GET", "http://host/my/publishers/p.xml", send)
+        self.assertEqual(502, resp.status)
+        self.assertEqual(4, len(calls))
+        self.assertEqual(1, self.policy.get_stats()['exhausted'])
+
+    def testClientErrorsAreNotRetried(self):
+        send, calls = self.responder((404, {}))
+        resp, content = self.policy.execute("GET", "http://host/my/publishers/p.xml", send)
+        self.assertEqual(404, resp.status)
+        self.assertEqual(1, len(calls))
+
+    def testPostsAreOnlyRetriedWhenIdempotent(self):
+        send, calls = self.responder(socket.error("reset"))
+        self.assertRaises(socket.error, self.policy.execute, "POST",
+            "http://host/my/publishers/p/activity.xml", send)
+        self.assertEqual(1, len(calls))
+
+        send, calls = self.responder((503, {}), (200, {}))
+        resp, content = self.policy.execute("POST", "http://host/my/publishers/p/filters/f.xml;edit", send)
+        self.assertEqual(200, resp.status)
+        self.assertEqual(2, len(calls))
+
+    def testBreakerOpensAndRecovers(self):
+        url = "http://host/my/publishers/p/activity/current.xml"
+        send, calls = self.responder(*[(503, {})] * 12)
+        for i in range(3):
+            resp, content = self.policy.execute("GET", url, send)
+            self.assertEqual(503, resp.status)
+        self.assertEqual(12, len(calls))
+        self.assertEqual({"GET /{scope}/publishers/{publisher}/activity/{bucket}.xml": "open"},
+            self.policy.get_stats()['breakers'])
+
+        # Open breakers fail fast, other endpoints are unaffected
+        resp, content = self.policy.execute("GET", url, send)
+        self.assertEqual(503, resp.status)
+        self.assertTrue(content.startswith("<error>"))
+        self.assertEqual(12, len(calls))
+        self.assertEqual(1, self.policy.get_stats()['rejected'])
+        other, other_calls = self.responder((200, {}))
+        self.assertEqual(200, self.policy.execute("GET", "http://host/my/publishers/p.xml", other)[0].status)
+
+        # After the reset timeout one trial request is let through
+        self.timer.now += 30
+        send, calls = self.responder((200, {}))
+        resp, content = self.policy.execute("GET", url, send)
+        self.assertEqual(200, resp.status)
+        self.assertEqual("closed", self.policy.get_breaker("GET /{scope}/publishers/{publisher}/activity/{bucket}.xml").state)
+
+    def testBreakerCountsRequestsNotAttempts(self):
+        url = "http://host/my/publishers/p/activity/current.xml"
+        breaker = self.policy.get_breaker("GET /{scope}/publishers/{publisher}/activity/{bucket}.xml")
+        send, calls = self.responder((503, {}), socket.error("reset"), (200, {}))
+        self.assertEqual(200, self.policy.execute("GET", url, send)[0].status)
+        self.assertEqual(0, breaker.failures)
+
+        send, calls = self.responder(*[(503, {})] * 4)
+        self.policy.execute("GET", url, send)
+        self.assertEqual(1, breaker.failures)
+        self.assertEqual("closed", breaker.state)
+
+    def testTrialRequestIsRetried(self):
+        url = "http://host/my/publishers/p/activity/current.xml"
+        breaker = self.policy.get_breaker("GET /{scope}/publishers/{publisher}/activity/{bucket}.xml")
+        for i in range(3):
+            breaker.record_failure()
+        self.timer.now += 30
+        send, calls = self.responder((503, {}), (200, {}))
+        self.assertEqual(200, self.policy.execute("GET", url, send)[0].status)
+        self.assertEqual("closed", breaker.state)
+
+    def testUnexpectedErrorEndsTheTrial(self):
+        url = "http://host/my/publishers/p/activity/current.xml"
+        breaker = self.policy.get_breaker("GET /{scope}/publishers/{publisher}/activity/{bucket}.xml")
+        for i in range(3):
+            breaker.record_failure()
+        self.timer.now += 30
+        send, calls = self.responder(ValueError("bad body"))
+        self.assertRaises(ValueError, self.policy.execute, "GET", url, send)
+        self.assertEqual(1, len(calls))
+        self.assertEqual("open", breaker.state)
+
+        # The breaker lets another trial through after the next timeout
+        self.timer.now += 30
+        send, calls = self.responder((200, {}))
+        self.assertEqual(200, self.policy.execute("GET", url, send)[0].status)
+        self.assertEqual("closed", breaker.state)
+
+    def testRetryAfterDateUsesServerClock(self):
+        # The server's clock is 100 seconds ahead of ours
+        server_clock = clock.ClockOffset(timer=self.timer)
+        server_clock.offset = 100.0
+        self.policy.server_clock = server_clock
+        retry_after = email.utils.formatdate(self.timer.now + 100 + 5, usegmt=True)
+        # Plus half a second, as the date only has one second resolution
+        self.assertEqual(5.5, self.policy.get_delay(0, retry_after))
+
+        self.policy.server_clock = None
+        self.assertEqual(105.5, self.policy.get_delay(0, retry_after))
+
+    def testCountersAreThreadSafe(self):
+        def run():
+            for i in range(200):
+                send, calls = self.responder((503, {}), (200, {}))
+                self.policy.execute("GET", "http://host/my/publishers/p.xml", send)
+        threads = [threading.Thread(target=run) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(800, self.policy.get_stats()['retries'])
+
+    def testFailedTrialReopensBreaker(self):
+        breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=5, timer=self.timer)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        self.timer.now += 5
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(retry.CircuitBreaker.OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+
+if __name__ == '__main__':
+    unittest.main()
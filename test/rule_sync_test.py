@@ -0,0 +1,90 @@
+import sys
+sys.path.append("../")
+from gnip.rule_sync import *
+from gnip.filter import Filter
+from gnip.xml_objects import Rule
+import unittest
+import threading
+
+class FakeGnip(object):
+    def __init__(self, rules, find_code=200, fail_rule=None):
+        self.rules = list(rules)
+        self.find_code = find_code
+        self.fail_rule = fail_rule
+        self.finds = 0
+        self.additions = []
+        self.removals = []
+        self.lock = threading.Lock()
+
+    def find_filter(self, publisher_scope, publisher_name, name):
+        self.finds += 1
+        if self.find_code != 200:
+            return Response(self.find_code, Error("missing"))
+        return Response(200, Filter(name, rules=list(self.rules)))
+
+    def add_rules_to_filter(self, publisher_scope, publisher_name, filter_name, rules):
+        self.lock.acquire()
+        self.additions.append(list(rules))
+        self.lock.release()
+        return Response(200, None)
+
+    def remove_rule_from_filter(self, publisher_scope, publisher_name, filter_name, rule):
+        if rule == self.fail_rule:
+            raise IOError("connection reset")
+        self.lock.acquire()
+        self.removals.append(rule)
+        self.lock.release()
+        return Response(200, None)
+
+def actors(*names):
+    return [Rule("actor", name) for name in names]
+
+class RuleSyncTestCase(unittest.TestCase):
+
+    def testDiffRules(self):
+        additions, removals, unchanged = diff_rules(actors("a", "b", "c", "c"), actors("d", "b", "e", "d"))
+        self.assertEqual(actors("d", "e"), additions)
+        self.assertEqual(actors("a", "c"), removals)
+        self.assertEqual(1, unchanged)
+
+        additions, removals, unchanged = diff_rules(actors("a"), [Rule("tag", "a")])
+        self.assertEqual([Rule("tag", "a")], additions)
+        self.assertEqual(actors("a"), removals)
+
+    def testSyncSendsChunkedAdditionsAndRemovals(self):
+        gnip = FakeGnip(actors("keep", "old1", "old2"))
+        desired = actors("keep") + actors(*["new%d" % i for i in range(5)])
+        response = sync_filter_rules(gnip, "my", "test", "f", desired, chunk_size=2)
+        self.assertEqual(200, response.code)
+        summary = response.result
+        self.assertEqual(1, gnip.finds)
+        # Chunks are sent concurrently, so they may arrive in any order
+        self.assertEqual([1, 2, 2], sorted([len(chunk) for chunk in gnip.additions]))
+        self.assertEqual(actors(*["new%d" % i for i in range(5)]), sorted(sum(gnip.additions, [])))
+        self.assertEqual(sorted(actors("old1", "old2")), sorted(gnip.removals))
+        self.assertEqual(1, summary.unchanged)
+        self.assertEqual(5, summary.requests)
+        self.assertEqual("my/test/f: +5 -2 =1", str(summary))
+
+    def testDryRunSendsNothing(self):
+        gnip = FakeGnip(actors("old"))
+        response = sync_filter_rules(gnip, "my", "test", "f", actors("new"), dry_run=True)
+        self.assertEqual(200, response.code)
+        self.assertEqual(actors("new"), response.result.added)
+        self.assertEqual(actors("old"), response.result.removed)
+        self.assertEqual(0, response.result.requests)
+        self.assertEqual([], gnip.additions)
+        self.assertEqual([], gnip.removals)
+
+    def testFailures(self):
+        gnip = FakeGnip(actors("old", "bad"), fail_rule=Rule("actor", "bad"))
+        response = sync_filter_rules(gnip, "my", "test", "f", [])
+        self.assertEqual(None, response.code)
+        self.assertEqual([(actors("bad"), None)], [(rules, failure.code) for rules, failure in response.result.failures])
+        self.assertEqual(actors("old"), gnip.removals)
+
+        response = sync_filter_rules(FakeGnip([], find_code=404), "my", "test", "f", actors("new"))
+        self.assertEqual(404, response.code)
+
+if __name__ == '__main__':
+    unittest.main()
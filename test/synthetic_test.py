@@ -0,0 +1,41 @@
+import sys
+sys.path.append("../")
+from gnip import synthetic
+from gnip import activities
+import unittest
+import datetime
+
+class SyntheticTestCase(unittest.TestCase):
+
+    def testGeneratorIsDeterministic(self):
+        first = synthetic.ActivityGenerator(seed=3, payload_size=200).activities(20)
+        second = synthetic.ActivityGenerator(seed=3, payload_size=200).activities(20)
+        other = synthetic.ActivityGenerator(seed=4, payload_size=200).activities(20)
+        self.assertEqual(first.to_xml(), second.to_xml())
+        self.assertNotEqual(first.to_xml(), other.to_xml())
+
+    def testGeneratedFields(self):
+        generator = synthetic.ActivityGenerator(payload_size=500, places=2, actors=3, tags=4, tos=5, regarding_urls=6)
+        an_activity = generator.activity(10)
+        self.assertEqual("0-10", an_activity.activity_id)
+        self.assertEqual(generator.start + datetime.timedelta(seconds=10), an_activity.at)
+        self.assertEqual([2, 3, 4, 5, 6], [len(an_activity.places), len(an_activity.actors), len(an_activity.tags),
+            len(an_activity.tos), len(an_activity.regarding_urls)])
+        self.assertEqual(500, len(an_activity.payload.read_raw()))
+        self.assertEqual(None, synthetic.ActivityGenerator().activity(0).payload)
+
+    def testGeneratedXmlRoundTrips(self):
+        xml = synthetic.ActivityGenerator(payload_size=100).activities(5).to_xml()
+        parsed = activities.Activities()
+        parsed.from_xml(xml)
+        self.assertEqual(xml, parsed.to_xml())
+
+    def testBucketActivitiesFallInTheMinute(self):
+        bucket_time = datetime.datetime(2008, 7, 23, 19, 10)
+        bucket = synthetic.ActivityGenerator().bucket(bucket_time, 30)
+        self.assertEqual(30, len(bucket.items))
+        for an_activity in bucket.items:
+            self.assertTrue(bucket_time <= an_activity.at < bucket_time + datetime.timedelta(minutes=1))
+
+if __name__ == '__main__':
+    unittest.main()
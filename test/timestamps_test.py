@@ -0,0 +1,51 @@
+import sys
+sys.path.append("../")
+from gnip.timestamps import *
+import unittest
+import datetime
+import iso8601
+import os
+import subprocess
+
+class TimestampsTestCase(unittest.TestCase):
+
+    def testGnipFormsMatchTheGeneralParser(self):
+        for string in ["2008-07-02T11:16:16.000Z", "2008-07-02T11:16:16Z", "2008-07-02T11:16:16.123456789Z",
+                       "2008-07-02T11:16:16+00:00", "2008-07-02T11:16:16.5-05:30", "2008-12-31T23:59:59+14:00"]:
+            self.assertNotEqual(None, parse_gnip_time(string))
+            expected = iso8601.parse_date(string)
+            actual = parse_time(string)
+            self.assertEqual(expected, actual)
+            self.assertEqual(expected.utcoffset(), actual.utcoffset())
+            self.assertEqual(expected.tzname(), actual.tzname())
+        self.assertTrue(parse_time("2008-07-02T11:16:16Z").tzinfo is iso8601.iso8601.UTC)
+
+    def testOtherFormsFallBack(self):
+        for string in ["2008-07-02T11:16:16", "2008-07-02 11:16:16Z", "2008-07-02T11:16:16+0100"]:
+            self.assertEqual(None, parse_gnip_time(string))
+            self.assertEqual(iso8601.parse_date(string), parse_time(string))
+        for string in ["2008-02-30T11:16:16Z", "2008-07-02T11:16:16.Z", "yesterday", None]:
+            self.assertEqual(None, parse_gnip_time(string))
+        self.assertRaises(iso8601.ParseError, parse_time, "yesterday")
+        self.assertRaises(ValueError, parse_time, "2008-02-30T11:16:16Z")
+
+    def testRepeatedTimesAreCached(self):
+        first = parse_time("2008-07-02T11:16:17.000Z")
+        self.assertTrue(first is parse_time("2008-07-02T11:16:17.000Z"))
+        self.assertTrue(parse_time("2008-07-02T11:16:17-07:00").tzinfo is parse_time("2008-07-02T11:16:18-07:00").tzinfo)
+
+    def testFormat(self):
+        at = datetime.datetime(2008, 7, 2, 1, 6, 9, 500000, iso8601.iso8601.FixedOffset(-7, 0, "-07:00"))
+        self.assertEqual(at.strftime("%Y-%m-%dT%H:%M:%S.000Z"), format_time(at))
+        self.assertEqual("2008-07-02T01:06:09.000Z", format_time(at))
+        self.assertEqual("2008-07-02T01:06:10.000Z", format_time(datetime.datetime(2008, 7, 2, 1, 6, 10)))
+        self.assertEqual("2008-07-02T01:06:09.000Z", format_time(at))
+
+    def testImportingGnipDoesNotLoadIso8601(self):
+        script = "import sys; import gnip; print 'iso8601' in sys.modules"
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        output = subprocess.Popen([sys.executable, "-c", script], cwd=directory, stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual("False", output.strip())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+sys.path.append("../")
+from gnip import workers
+import unittest
+import threading
+
+class WorkersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = workers.WorkerPool(2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def testSubmitReturnsResult(self):
+        future = self.pool.submit(lambda x, y: x + y, 1, y=2)
+        self.assertEqual(3, future.result())
+        self.assertTrue(future.done())
+        self.assertEqual(None, future.exception())
+
+    def testExceptionIsReraised(self):
+        def fail():
+            raise ValueError("failed")
+        future = self.pool.submit(fail)
+        self.assertRaises(ValueError, future.result)
+        self.assertTrue(isinstance(future.exception(), ValueError))
+
+    def testPendingCallCanBeCancelled(self):
+        release = threading.Event()
+        blockers = [self.pool.submit(release.wait) for i in range(2)]
+        future = self.pool.submit(lambda: 1)
+        self.assertTrue(future.cancel())
+        self.assertRaises(workers.CancelledError, future.result)
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+            self.assertFalse(blocker.cancel())
+
+    def testAsCompleted(self):
+        release = threading.Event()
+        slow = self.pool.submit(release.wait)
+        fast = self.pool.submit(lambda: "fast")
+        completed = workers.as_completed([slow, fast])
+        self.assertTrue(completed.next() is fast)
+        release.set()
+        self.assertTrue(completed.next() is slow)
+
+    def testResultTimeout(self):
+        release = threading.Event()
+        future = self.pool.submit(release.wait)
+        self.assertRaises(workers.TimeoutError, future.result, 0.01)
+        release.set()
+        future.result()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import urllib
 sys.path.append("../")
 from gnip.xml_objects import *
 import unittest
+import pickle
 
 class XmlObjectsTest(unittest.TestCase):
 
@@ -67,6 +68,48 @@ class XmlObjectsTest(unittest.TestCase):
 
         self.assertNotEquals(tag1,tag2)
 
+    def testValuesAreHashable(self):
+        rules = set([Rule("actor", "joe"), Rule("actor", "joe"), Rule("to", "joe")])
+        self.assertEqual(2, len(rules))
+        self.assertTrue(Rule("to", "joe") in rules)
+
+        actors = set([Actor("joe", "1"), Actor("joe", "1"), Actor("joe", "2")])
+        self.assertEqual(2, len(actors))
+        self.assertEqual(Actor("joe", "1", "http://joe"), Actor("joe", "1", "http://joe"))
+        self.assertNotEqual(Actor("joe"), Actor("bob"))
+
+        values = {URL("http://a"): 1, Tag("a"): 2, To("a"): 3, Point(1.0, 2.0): 4}
+        self.assertEqual([1, 2, 3, 4], [values[URL("http://a")], values[Tag("a")], values[To("a")], values[Point(1.0, 2.0)]])
+
+        # Values of different types are never equal
+        self.assertNotEqual(Tag("a"), To("a"))
+        self.assertFalse(Rule("actor", "joe") == None)
+
+    def testValuesAreImmutable(self):
+        rule = Rule("actor", "joe")
+        self.assertRaises(AttributeError, setattr, rule, "value", "bob")
+        self.assertRaises(AttributeError, delattr, rule, "type")
+        self.assertRaises(AttributeError, setattr, Point(1.0, 2.0), "x", 3.0)
+        self.assertEqual(Rule("actor", "joe"), rule)
+
+    def testValuesPickle(self):
+        for value in [URL("http://a", "m"), Actor("joe", "1", "m"), Tag("a"), To("b", "m"), Point(1.0, 2.0), Rule("actor", "joe")]:
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                copy = pickle.loads(pickle.dumps(value, protocol))
+                self.assertEqual(value, copy)
+                self.assertRaises(AttributeError, setattr, copy, copy.__slots__[0], None)
+
+    def testSlotNames(self):
+        class Base(SlottedObject):
+            __slots__ = ("a", "__hidden")
+        class Derived(Base):
+            __slots__ = "b"
+        self.assertEqual(["b", "a", "_Base__hidden"], slot_names(Derived))
+        value = Derived()
+        value.a = 1
+        value.b = 2
+        self.assertEqual({'a': 1, 'b': 2}, value.__getstate__())
+
     def testResultObjectParses(self):
         result1 = Result()
         result1.from_xml("<result>Hello World!</result>")
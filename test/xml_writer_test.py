@@ -0,0 +1,62 @@
+import sys
+sys.path.append("../")
+from gnip import xml_writer
+from gnip.filter import Filter
+from gnip.xml_objects import Rule
+from elementtree.ElementTree import *
+import unittest
+
+def filter_with_tostring(a_filter):
+    filter_node = Element("filter")
+    filter_node.set("name", a_filter.name)
+    filter_node.set("fullData", str(a_filter.full_data).lower())
+    if a_filter.post_url is not None:
+        post_url_node = SubElement(filter_node, "postURL")
+        post_url_node.text = a_filter.post_url
+    for rule in a_filter.rules:
+        rule_node = SubElement(filter_node, "rule")
+        rule_node.text = rule.value
+        rule_node.set("type", rule.type)
+    return tostring(filter_node)
+
+class XmlWriterTestCase(unittest.TestCase):
+
+    def testElementMatchesTostring(self):
+        for text in [None, "", "plain", "a & b < c > d", "\"quoted\" 'single'", u"caf\xe9 \u2603", "two\nlines", "cr\r and\ttab"]:
+            node = Element("rule")
+            node.set("type", "actor")
+            node.set("value", text or "x")
+            node.text = text
+            self.assertEqual(tostring(node), xml_writer.element("rule", {"value": text or "x", "type": "actor"}, text))
+
+    def testEscaping(self):
+        self.assertEqual("a &amp; b &lt;c&gt; \"d\" 'e'", xml_writer.escape_text("a & b <c> \"d\" 'e'"))
+        self.assertEqual("a &amp; b &lt;c&gt; &quot;d&quot; 'e'", xml_writer.escape_attribute("a & b <c> \"d\" 'e'"))
+        self.assertEqual("caf&#233; &amp; &#9731;", xml_writer.escape_text(u"caf\xe9 & \u2603"))
+        self.assertTrue(isinstance(xml_writer.escape_text(u"plain"), str))
+        self.assertEqual("a\nb\rc\td", xml_writer.escape_text("a\nb\rc\td"))
+        self.assertEqual("a&#10;b\rc\td", xml_writer.escape_attribute("a\nb\rc\td"))
+
+    def testFilterMatchesTostring(self):
+        rules = [Rule("actor", "joe"), Rule("tag", "a&b"), Rule("to", u"\xfcber"), Rule("regarding", "")]
+        filters = [
+            Filter(name="empty"),
+            Filter(name="no-rules", post_url="http://example.com/?a=1&b=2"),
+            Filter(name="rules", full_data=False, rules=rules),
+            Filter(name="both", post_url="", rules=rules * 1000),
+            Filter(name="n", rules=[Rule("a\"b\n", "plain\r\t")]),
+        ]
+        for a_filter in filters:
+            self.assertEqual(filter_with_tostring(a_filter), a_filter.to_xml())
+            self.assertEqual(filter_with_tostring(a_filter), "".join(xml_writer.iter_filter_xml(a_filter, 100)))
+
+    def testRulesAreWrittenInChunks(self):
+        rules = [Rule("actor", "user%d" % i) for i in range(10000)]
+        chunks = list(xml_writer.iter_rules_xml(rules, chunk_size=4096))
+        self.assertEqual("<rules>" + "".join([rule.to_xml() for rule in rules]) + "</rules>", "".join(chunks))
+        self.assertTrue(len(chunks) > 10)
+        self.assertTrue(max([len(chunk) for chunk in chunks]) < 4096 + 100)
+        self.assertEqual(["<rules></rules>"], list(xml_writer.iter_rules_xml([])))
+
+if __name__ == '__main__':
+    unittest.main()